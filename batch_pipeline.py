@@ -0,0 +1,287 @@
+"""
+PitGPT - Season batch processing
+Discovers every track/race under a data root, builds the convert → preprocess → metrics → charts job graph
+and runs it on a bounded process pool, skipping jobs whose inputs and code are unchanged.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+STAGES = ['convert', 'preprocess', 'metrics', 'charts']
+STAGE_DEPENDENCIES = {'convert': [], 'preprocess': ['convert'], 'metrics': ['convert'], 'charts': ['metrics']}
+
+# Source files each stage's output depends on (a code change re-runs the stage)
+STAGE_CODE = {
+    'convert': ['telemetry_cache.py', 'telemetry_quality.py', 'telemetry_timestamps.py'],
+    'preprocess': ['preprocess_telemetry.py', 'frame_format.py', 'telemetry_pyramid.py', 'lap_table.py', 'incremental_build.py'],
+    'metrics': ['compute_metrics.py', 'lap_table.py', 'incremental_build.py'],
+    'charts': ['generate_chart_image.py'],
+}
+
+TELEMETRY_PATTERN = re.compile(r'^R(\d+)_(.+)_telemetry_data\.csv$', re.IGNORECASE)
+SKIP_DIRS = {'.telemetry_cache', 'node_modules', '.git'}
+
+def find_lap_times_csv(directory: Path, race_number: int):
+    """The AnalysisEndurance lap-time file for a race number, if there is one"""
+    pattern = re.compile(rf'AnalysisEndurance.*Race[ _]?{race_number}(?!\d).*\.csv$', re.IGNORECASE)
+    matches = sorted(path for path in directory.iterdir() if pattern.search(path.name))
+    return matches[0] if matches else None
+
+def discover_races(data_root: str) -> list:
+    """Every R<n>_<track>_telemetry_data.csv under data_root, paired with its lap-time file"""
+    races = []
+    for telemetry_csv in sorted(Path(data_root).rglob('*')):
+        match = TELEMETRY_PATTERN.match(telemetry_csv.name)
+        if not match or SKIP_DIRS.intersection(telemetry_csv.parts) or not telemetry_csv.is_file():
+            continue
+        race_number, track = int(match.group(1)), match.group(2)
+        lap_times_csv = find_lap_times_csv(telemetry_csv.parent, race_number)
+        races.append({
+            'name': f"{track}/R{race_number}",
+            'track': track,
+            'race': race_number,
+            'telemetry_csv': str(telemetry_csv),
+            'lap_times_csv': str(lap_times_csv) if lap_times_csv else None,
+        })
+    return races
+
+def stage_outputs(stage: str, race: dict, output_dir: Path) -> list:
+    if stage == 'convert':
+        from telemetry_cache import cache_dir_for
+        cache_dir = cache_dir_for(race['telemetry_csv'])
+        return [str(cache_dir / 'meta.json'), str(cache_dir / 'vehicle_spans.json')]
+    if stage == 'preprocess':
+        outputs = [str(output_dir / 'telemetry')]
+        return outputs + ([str(output_dir / 'lap_times.json')] if race['lap_times_csv'] else [])
+    if stage == 'metrics':
+        return [str(output_dir / 'race_metrics.csv')]
+    return [str(output_dir / 'PitGPT_Telemetry_Charts.png')]
+
+def run_stage(stage: str, race: dict, output_dir: str) -> dict:
+    """Run one job (in a worker process); returns its log tail"""
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        if stage == 'convert':
+            # The row index is built here too (caches from before it was part of the build), so the
+            # preprocess and metrics jobs that run in parallel after this only read it
+            from telemetry_cache import ensure_cache, vehicle_row_index
+            vehicle_row_index(ensure_cache(race['telemetry_csv']))
+        elif stage == 'preprocess':
+            from incremental_build import preprocess_incremental, preprocess_lap_times_if_changed
+            preprocess_incremental(race['telemetry_csv'], str(output_path / 'telemetry'))
+            if race['lap_times_csv']:
+                preprocess_lap_times_if_changed(race['lap_times_csv'], str(output_path / 'lap_times.json'))
+        elif stage == 'metrics':
+            import pandas as pd
+            from incremental_build import compute_metrics_incremental, write_if_changed
+            metrics = compute_metrics_incremental(race['telemetry_csv'], pd.read_csv(race['lap_times_csv'], sep=';'))
+            write_if_changed(output_path / 'race_metrics.csv', metrics.to_csv(index=False).encode('utf-8'))
+        elif stage == 'charts':
+            # Race overview plus one chart per driver; the batch already runs jobs in parallel
+            import pandas as pd
+            from generate_chart_image import render_charts
+            result = render_charts(pd.read_csv(output_path / 'race_metrics.csv'), str(output_path), drivers=[])
+            print(f"✓ {len(result['rendered'])} charts rendered, {len(result['skipped'])} unchanged")
+    return {'log': log.getvalue().strip().splitlines()[-3:]}
+
+def code_digest(stage: str) -> str:
+    digest = hashlib.sha256()
+    root = Path(__file__).resolve().parent
+    for name in STAGE_CODE[stage]:
+        digest.update((root / name).read_bytes())
+    return digest.hexdigest()
+
+def input_stats(paths: list) -> list:
+    stats = []
+    for path in paths:
+        if path:
+            stat = Path(path).stat()
+            stats.append([str(path), stat.st_size, stat.st_mtime_ns])
+    return stats
+
+class Job:
+    def __init__(self, race: dict, stage: str, output_dir: Path, deps: list):
+        self.race = race
+        self.stage = stage
+        self.name = f"{race['name']}:{stage}"
+        self.output_dir = output_dir
+        self.deps = deps
+        self.selected = True  # False for upstream jobs pulled in by --stages (never forced)
+        self.outputs = stage_outputs(stage, race, output_dir)
+        self.status = 'pending'
+        self.result = {}
+        self.fingerprint_value = None
+        self.started = None
+
+    def fingerprint(self, upstream: list) -> str:
+        """Hash of the raw inputs, the stage's code and its upstream fingerprints"""
+        inputs = [self.race['telemetry_csv']] + ([] if self.stage == 'convert' else [self.race['lap_times_csv']])
+        key = [self.stage, code_digest(self.stage), input_stats(inputs), upstream]
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+def with_upstream(stages: list) -> list:
+    """The selected stages plus every stage they depend on, in STAGES order"""
+    needed = set()
+    pending = list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage not in needed:
+            needed.add(stage)
+            pending.extend(STAGE_DEPENDENCIES[stage])
+    return [stage for stage in STAGES if stage in needed]
+
+def build_jobs(races: list, output_root: str, stages: list) -> dict:
+    """
+    Job graph: one job per (race, stage), wired by STAGE_DEPENDENCIES within the race. Upstream stages of the
+    selected ones are included too (they are skipped as usual when unchanged).
+    """
+    jobs = {}
+    for race in races:
+        output_dir = Path(output_root) / race['track'] / f"R{race['race']}"
+        for stage in with_upstream(stages):
+            if stage == 'metrics' and not race['lap_times_csv']:
+                continue
+            deps = [f"{race['name']}:{dep}" for dep in STAGE_DEPENDENCIES[stage]]
+            if all(dep in jobs for dep in deps):
+                job = jobs[f"{race['name']}:{stage}"] = Job(race, stage, output_dir, deps)
+                job.selected = stage in stages
+    for job in jobs.values():
+        job.fingerprint_value = job.fingerprint([jobs[dep].fingerprint_value for dep in job.deps])
+    return jobs
+
+def load_manifest(manifest_file: Path) -> dict:
+    if not manifest_file.exists():
+        return {}
+    with open(manifest_file) as f:
+        return json.load(f).get('jobs', {})
+
+def run_batch(data_root: str, output_root: str, stages: list = STAGES, jobs: int = 2, force: bool = False,
+              dry_run: bool = False) -> dict:
+    """Discover races, run the job graph and write <output_root>/manifest.json"""
+    races = discover_races(data_root)
+    print(f"Found {len(races)} races under {data_root}")
+    for race in races:
+        if not race['lap_times_csv']:
+            print(f"⚠️  {race['name']}: no lap-time file - metrics and charts skipped")
+
+    if 'charts' in stages and importlib.util.find_spec('matplotlib') is None:
+        print("⚠️  matplotlib not installed - charts skipped")
+        stages = [stage for stage in stages if stage != 'charts']
+
+    added = [stage for stage in with_upstream(stages) if stage not in stages]
+    if added:
+        print(f"Including upstream stages: {', '.join(added)}")
+    graph = build_jobs(races, output_root, stages)
+    if not graph:
+        raise ValueError(f"No jobs for stages {', '.join(stages) or '(none)'} under {data_root}")
+    manifest_file = Path(output_root) / 'manifest.json'
+    previous = load_manifest(manifest_file)
+
+    def unchanged(job: Job) -> bool:
+        before = previous.get(job.name, {})
+        return (not (force and job.selected) and before.get('status') in ('ok', 'skipped')
+                and before.get('fingerprint') == job.fingerprint_value
+                and all(Path(output).exists() for output in job.outputs))
+
+    if dry_run:
+        for job in graph.values():
+            print(f"  {'skip' if unchanged(job) else 'run ':<5} {job.name}")
+        return {}
+
+    start = time.time()
+    running = {}
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while True:
+            changed = False
+            for job in graph.values():
+                if job.status != 'pending':
+                    continue
+                dep_status = [graph[dep].status for dep in job.deps]
+                if any(status in ('failed', 'blocked') for status in dep_status):
+                    job.status = 'blocked'
+                    changed = True
+                elif all(status in ('ok', 'skipped') for status in dep_status):
+                    changed = True
+                    if unchanged(job):
+                        job.status = 'skipped'
+                        job.result = {'wall_time_s': 0.0}
+                        print(f"⏭️  {job.name} (unchanged)")
+                    else:
+                        job.status = 'running'
+                        job.started = time.time()
+                        running[pool.submit(run_stage, job.stage, job.race, str(job.output_dir))] = job
+                        print(f"▶️  {job.name}")
+
+            if not running:
+                if changed:
+                    continue  # skips/blocks may have made more jobs ready
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                wall_time = round(time.time() - job.started, 3)
+                try:
+                    job.result = {**future.result(), 'wall_time_s': wall_time}
+                    job.status = 'ok'
+                    print(f"✓ {job.name} ({wall_time:.1f}s)")
+                except Exception as error:
+                    job.result = {'error': f"{type(error).__name__}: {error}", 'wall_time_s': wall_time}
+                    job.status = 'failed'
+                    print(f"❌ {job.name}: {job.result['error']}")
+
+    manifest = {
+        'data_root': str(data_root),
+        'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'wall_time_s': round(time.time() - start, 3),
+        'races': races,
+        'jobs': {job.name: {
+            'race': job.race['name'],
+            'stage': job.stage,
+            'status': job.status,
+            'fingerprint': job.fingerprint_value,
+            'outputs': job.outputs,
+            'wall_time_s': job.result.get('wall_time_s'),
+            **({'error': job.result['error']} if 'error' in job.result else {}),
+        } for job in graph.values()},
+    }
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    counts = {}
+    for job in graph.values():
+        counts[job.status] = counts.get(job.status, 0) + 1
+    print(f"\n✅ Batch complete in {manifest['wall_time_s']:.1f}s: "
+          + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    print(f"   Manifest: {manifest_file}")
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process every track/race under a data root")
+    parser.add_argument("data_root", nargs="?", default=".", help="Directory containing track folders (e.g. barber/)")
+    parser.add_argument("--output-root", default="batch_output")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--jobs", type=int, default=2, help="Jobs run concurrently")
+    parser.add_argument("--force", action="store_true", help="Re-run jobs even if their inputs are unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Print the job plan without running it")
+    args = parser.parse_args()
+
+    try:
+        manifest = run_batch(args.data_root, args.output_root, args.stages, args.jobs, args.force, args.dry_run)
+    except ValueError as error:
+        print(f"❌ {error}")
+        sys.exit(1)
+    if any(job['status'] in ('failed', 'blocked') for job in manifest.get('jobs', {}).values()):
+        sys.exit(1)
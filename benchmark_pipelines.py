@@ -0,0 +1,176 @@
+"""
+PitGPT - Pipeline benchmarks on synthetic race data
+Times each stage in a fresh process and reports rows/sec, wall time and peak RSS as JSON
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from synthetic_telemetry import LAP_TIMES_FILE, TELEMETRY_FILE, car_ids, generate_race
+
+DEFAULT_SCALES = [1, 10, 100]
+STAGES = ['telemetry_cache', 'preprocess_telemetry', 'compute_all_metrics',
+          'quick_sample_telemetry', 'preprocess_lap_times']
+CACHE_MODES = ['cold', 'warm']  # every stage starts without a telemetry cache, or with a built one
+REGRESSION_TOLERANCE = 0.2  # flag stages more than 20% slower (rows/sec) than the baseline
+
+def prepare_cache(race_dir: str, cache: str):
+    """Put the race's telemetry cache in the given state: removed (cold) or freshly built (warm)"""
+    from telemetry_cache import cache_dir_for, ensure_cache
+    telemetry_csv = str(Path(race_dir) / TELEMETRY_FILE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        shutil.rmtree(cache_dir_for(telemetry_csv), ignore_errors=True)
+        if cache == 'warm':
+            ensure_cache(telemetry_csv)
+
+def run_stage(stage: str, race_dir: str) -> dict:
+    """Run one stage on a generated race (called in a fresh worker process)"""
+    from preprocess_telemetry import preprocess_lap_times, preprocess_telemetry
+    from compute_metrics import compute_all_metrics
+    from quick_sample_telemetry import quick_sample_telemetry
+    from telemetry_cache import ensure_cache
+
+    race_path = Path(race_dir)
+    telemetry_csv = str(race_path / TELEMETRY_FILE)
+    output_dir = race_path / 'bench_output'
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stage == 'telemetry_cache':
+            ensure_cache(telemetry_csv)
+        elif stage == 'preprocess_telemetry':
+            preprocess_telemetry(telemetry_csv, str(output_dir / 'telemetry'))
+        elif stage == 'compute_all_metrics':
+            compute_all_metrics(race_dir)
+        elif stage == 'quick_sample_telemetry':
+            drivers = [vehicle_id for vehicle_id, _ in car_ids(4)]
+            quick_sample_telemetry(telemetry_csv, str(output_dir / 'sample'), drivers=drivers)
+        elif stage == 'preprocess_lap_times':
+            output_dir.mkdir(parents=True, exist_ok=True)
+            preprocess_lap_times(str(race_path / LAP_TIMES_FILE), str(output_dir / 'lap_times.json'))
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+    wall_time = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+    return {'wall_time_s': round(wall_time, 4), 'peak_rss_mb': round(peak_rss_mb, 1)}
+
+def measure_stage(stage: str, race_dir: str, cache: str = 'cold') -> dict:
+    """
+    Run a stage in its own spawned process so peak RSS belongs to that stage alone. The cache state is set
+    first in another process, so no stage's timing depends on which stages ran before it.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        executor.submit(prepare_cache, race_dir, cache).result()
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(run_stage, stage, race_dir).result()
+
+def prepare_race(data_dir: str, scale: float, seed: int) -> tuple:
+    """Generate (or reuse) the race for a scale; returns (race dir, row counts)"""
+    race_dir = Path(data_dir) / f"scale_{scale:g}_seed_{seed}"
+    counts_file = race_dir / 'counts.json'
+    if counts_file.exists():
+        with open(counts_file) as f:
+            return race_dir, json.load(f)
+
+    start = time.perf_counter()
+    counts = generate_race(race_dir, scale=scale, seed=seed)
+    counts['generate_time_s'] = round(time.perf_counter() - start, 2)
+    with open(counts_file, 'w') as f:
+        json.dump(counts, f)
+    return race_dir, counts
+
+def run_benchmarks(scales: list = DEFAULT_SCALES, stages: list = STAGES, data_dir: str = "bench_data",
+                   seed: int = 0, repeat: int = 1, cache: str = 'cold') -> dict:
+    """Benchmark every stage at every scale; the fastest of `repeat` runs is kept"""
+    results = []
+    for scale in scales:
+        race_dir, counts = prepare_race(data_dir, scale, seed)
+        print(f"\n🏁 Scale {scale:g}x: {counts['telemetry_rows']:,} telemetry rows, {counts['lap_rows']} laps")
+
+        for stage in stages:
+            runs = [measure_stage(stage, str(race_dir), cache) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run['wall_time_s'])
+            rows = counts['lap_rows'] if stage == 'preprocess_lap_times' else counts['telemetry_rows']
+            result = {
+                'scale': scale,
+                'stage': stage,
+                'rows': rows,
+                'wall_time_s': best['wall_time_s'],
+                'rows_per_s': round(rows / best['wall_time_s'], 1) if best['wall_time_s'] else None,
+                'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+            }
+            results.append(result)
+            print(f"  {stage:<24} {result['wall_time_s']:>9.2f}s {result['rows_per_s'] or 0:>14,.0f} rows/s "
+                  f"{result['peak_rss_mb']:>9.1f} MB")
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'cache': cache,
+        'results': results,
+    }
+
+def find_regressions(report: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE) -> list:
+    """Stages whose rows/sec fell more than tolerance below the baseline run"""
+    previous = {(r['scale'], r['stage']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['scale'], result['stage']))
+        if before and before['rows_per_s'] and result['rows_per_s'] is not None:
+            change = result['rows_per_s'] / before['rows_per_s'] - 1
+            if change < -tolerance:
+                regressions.append({**result, 'baseline_rows_per_s': before['rows_per_s'], 'change': round(change, 3)})
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the telemetry pipelines on synthetic data")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES,
+                        help="Race scales to run (1 = 20 cars x 25 laps)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--data-dir", default="bench_data", help="Where generated races are kept between runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--cache", choices=CACHE_MODES, default="cold",
+                        help="Telemetry cache state every stage starts from (cold = rebuilt inside the stage)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Baselines from before --cache existed measured the cache build cold
+        if baseline.get('cache', 'cold') != args.cache:
+            parser.error(f"{args.baseline} was run with --cache {baseline.get('cache', 'cold')}; "
+                         f"timings only compare with the same cache state")
+
+    print("⏱️  Benchmarking telemetry pipelines...")
+    report = run_benchmarks(args.scales, args.stages, args.data_dir, args.seed, args.repeat, args.cache)
+
+    if baseline is not None:
+        report['regressions'] = find_regressions(report, baseline)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Saved to {args.output}")
+
+    for regression in report.get('regressions', []):
+        print(f"⚠️  {regression['stage']} at {regression['scale']:g}x: "
+              f"{regression['change']:+.0%} rows/s vs baseline")
+    if report.get('regressions'):
+        sys.exit(1)
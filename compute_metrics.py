@@ -3,222 +3,332 @@ PitGPT - Compute Race Strategy Metrics
 Simple formulas only - no overbuilding
 """
 
+import argparse
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from lap_table import LapTable, find_column
+from pipeline_trace import (absorb, collect, enable as enable_trace, memory_mark, stage,
+                            traced_chunks)
+from telemetry_cache import (ensure_cache, iter_telemetry_chunks, load_telemetry, open_vehicle_rows,
+                             shard_spans, vehicle_row_index)
 
-def parse_lap_time(time_str: str) -> float:
-    """Convert MM:SS.mmm to seconds"""
-    if pd.isna(time_str) or time_str == '':
-        return np.nan
-    parts = time_str.split(':')
-    if len(parts) == 2:
-        return float(parts[0]) * 60 + float(parts[1])
-    return float(time_str)
+def compute_lap_aggregates(lap_times_df: pd.DataFrame) -> pd.DataFrame:
+    """Per car NUMBER: lap counts, improving laps and the last-5-lap slope inputs"""
+    return LapTable(lap_times_df).aggregates()
 
-def compute_tire_stress_index(telemetry_df: pd.DataFrame, driver_id: str) -> float:
+METRIC_CHANNELS = ['aps', 'pbrake_f', 'Steering_Angle', 'accy_can']
+BRAKE_TAIL = 100  # pbrake_f samples used for the pit-window brake trend
+TELEMETRY_COLUMNS = ['vehicle_id', 'vehicle_number', 'telemetry_name', 'telemetry_value']
+
+class TelemetryAggregator:
     """
-    Tire Stress Index = High brake pressure + steering + lateral G spikes
-    Simple: (brake_pressure_mean * 0.4) + (steering_abs_mean * 0.3) + (lateral_g_max * 0.3)
+    Running per-driver telemetry aggregates for the five metrics.
+    Feed chunks in file order; memory depends on the number of drivers, not rows.
     """
-    driver_data = telemetry_df[telemetry_df['vehicle_id'] == driver_id]
-    
-    # Get brake pressure (front + rear)
-    brake_f = driver_data[driver_data['telemetry_name'] == 'pbrake_f']['telemetry_value'].astype(float)
-    brake_r = driver_data[driver_data['telemetry_name'] == 'pbrake_r']['telemetry_value'].astype(float)
-    brake_total = (brake_f.fillna(0) + brake_r.fillna(0)).mean()
-    
-    # Get steering angle (absolute)
-    steering = driver_data[driver_data['telemetry_name'] == 'Steering_Angle']['telemetry_value'].astype(float).abs().mean()
-    
-    # Get lateral G (accy_can - max spike)
-    lateral_g = driver_data[driver_data['telemetry_name'] == 'accy_can']['telemetry_value'].astype(float).abs().max()
-    
-    if pd.isna(brake_total):
-        brake_total = 0
-    if pd.isna(steering):
-        steering = 0
-    if pd.isna(lateral_g):
-        lateral_g = 0
-    
-    return (brake_total * 0.4) + (steering * 0.3) + (lateral_g * 0.3)
 
-def compute_attack_window(lap_times_df: pd.DataFrame, telemetry_df: pd.DataFrame, driver_id: str, vehicle_number: int) -> float:
+    SUM_COLUMNS = ['throttle_samples', 'throttle_high', 'throttle_low', 'steering_sum', 'steering_count']
+    MAX_COLUMNS = ['steering_max', 'lateral_g_max']
+
+    def __init__(self, brake_tail: int = BRAKE_TAIL):
+        self.brake_tail = brake_tail
+        self.totals = pd.DataFrame(columns=self.SUM_COLUMNS + self.MAX_COLUMNS, dtype='float64')
+        self.brake_tails = {}
+        self.drivers = {}  # (vehicle_id, vehicle_number) -> None, in first-seen order
+
+    def update(self, telemetry_df: pd.DataFrame):
+        """Fold a chunk of long-format telemetry rows into the running aggregates"""
+        for vehicle_id, vehicle_number in telemetry_df[['vehicle_id', 'vehicle_number']].drop_duplicates().itertuples(index=False):
+            self.drivers.setdefault((vehicle_id, None if pd.isna(vehicle_number) else vehicle_number), None)
+
+        tel = telemetry_df.loc[telemetry_df['telemetry_name'].isin(METRIC_CHANNELS), ['vehicle_id', 'telemetry_name']]
+        tel['value'] = telemetry_df.loc[tel.index, 'telemetry_value'].astype(float)
+        tel['abs_value'] = tel['value'].abs()
+        tel['high'] = tel['value'] > 70
+        tel['low'] = tel['value'] < 30
+
+        grouped = tel.groupby(['vehicle_id', 'telemetry_name'], sort=False, observed=True).agg(
+            samples=('value', 'size'),
+            abs_sum=('abs_value', 'sum'),
+            abs_count=('abs_value', 'count'),
+            abs_max=('abs_value', 'max'),
+            high=('high', 'sum'),
+            low=('low', 'sum'),
+        ).unstack('telemetry_name')
+        grouped.index = grouped.index.astype(object)
+
+        def channel(stat, name, fill):
+            if (stat, name) in grouped.columns:
+                return grouped[(stat, name)].astype('float64').fillna(fill)
+            return pd.Series(fill, index=grouped.index, dtype='float64')
+
+        partial = pd.DataFrame({
+            'throttle_samples': channel('samples', 'aps', 0),
+            'throttle_high': channel('high', 'aps', 0),
+            'throttle_low': channel('low', 'aps', 0),
+            'steering_sum': channel('abs_sum', 'Steering_Angle', 0),
+            'steering_count': channel('abs_count', 'Steering_Angle', 0),
+            'steering_max': channel('abs_max', 'Steering_Angle', np.nan),
+            'lateral_g_max': channel('abs_max', 'accy_can', np.nan),
+        })
+        self._fold_totals(partial)
+
+        # Keep only the last brake_tail non-null pbrake_f samples per car
+        brake = tel.loc[tel['telemetry_name'] == 'pbrake_f', ['vehicle_id', 'value']].dropna()
+        brake = brake[brake.groupby('vehicle_id', observed=True).cumcount(ascending=False) < self.brake_tail]
+        for vehicle_id, values in brake.groupby('vehicle_id', sort=False, observed=True)['value']:
+            self._append_brake_tail(vehicle_id, values.to_numpy())
+
+    def _fold_totals(self, partial: pd.DataFrame):
+        combined = pd.concat([self.totals, partial]) if len(self.totals) else partial
+        aggregations = {column: 'sum' for column in self.SUM_COLUMNS}
+        aggregations.update({column: 'max' for column in self.MAX_COLUMNS})
+        self.totals = combined.groupby(level=0, sort=False).agg(aggregations)
+
+    def _append_brake_tail(self, vehicle_id, values: np.ndarray):
+        previous = self.brake_tails.get(vehicle_id)
+        if previous is not None:
+            values = np.concatenate([previous, values])
+        self.brake_tails[vehicle_id] = values[-self.brake_tail:]
+
+    def merge(self, other: 'TelemetryAggregator'):
+        """Fold in another aggregator that saw later rows (or other drivers)"""
+        if len(other.totals):
+            self._fold_totals(other.totals)
+        for vehicle_id, values in other.brake_tails.items():
+            self._append_brake_tail(vehicle_id, values)
+        for driver in other.drivers:
+            self.drivers.setdefault(driver, None)
+
+    def driver_info(self) -> pd.DataFrame:
+        """Unique (vehicle_id, vehicle_number) pairs in first-seen order"""
+        return pd.DataFrame(list(self.drivers), columns=['vehicle_id', 'vehicle_number'])
+
+    def aggregates(self) -> pd.DataFrame:
+        """Per vehicle_id: every telemetry aggregate the five metrics need"""
+        totals = self.totals
+        aggregates = pd.DataFrame({
+            'steering_mean': (totals['steering_sum'] / totals['steering_count']).where(totals['steering_count'] > 0),
+            'steering_max': totals['steering_max'],
+            'lateral_g_max': totals['lateral_g_max'],
+            'throttle_samples': totals['throttle_samples'],
+            'throttle_high': totals['throttle_high'],
+            'throttle_low': totals['throttle_low'],
+        })
+
+        # Brake trend: the tail split in halves
+        brake = pd.DataFrame(
+            [(vehicle_id, len(tail), tail[:len(tail) // 2].mean() if len(tail) > 1 else np.nan, tail[len(tail) // 2:].mean())
+             for vehicle_id, tail in self.brake_tails.items()],
+            columns=['vehicle_id', 'brake_count', 'brake_first_half', 'brake_second_half'],
+        ).set_index('vehicle_id')
+        aggregates = aggregates.join(brake, how='outer')
+        aggregates['brake_count'] = aggregates['brake_count'].fillna(0)
+        return aggregates
+
+def compute_telemetry_aggregates(telemetry_df: pd.DataFrame) -> pd.DataFrame:
+    """Per vehicle_id: every telemetry aggregate the five metrics need, from one groupby"""
+    aggregator = TelemetryAggregator()
+    aggregator.update(telemetry_df)
+    return aggregator.aggregates()
+
+def metrics_from_aggregates(driver_info: pd.DataFrame, telemetry_aggregates: pd.DataFrame,
+                            lap_aggregates: pd.DataFrame) -> pd.DataFrame:
+    """Evaluate the 5 metric formulas for every driver from precomputed aggregates"""
+    driver_info = driver_info[driver_info['vehicle_number'].notna()]
+
+    tel = telemetry_aggregates.reindex(driver_info['vehicle_id'].astype(object).values).astype('float64')
+    laps = lap_aggregates.reindex(driver_info['vehicle_number'].values).astype('float64')
+    tel.index = laps.index = pd.RangeIndex(len(driver_info))
+    tel['throttle_samples'] = tel['throttle_samples'].fillna(0)
+    tel['brake_count'] = tel['brake_count'].fillna(0)
+
+    # Tire stress: pbrake_f and pbrake_r never share a row in long format, so the
+    # original index-aligned brake sum was always empty (term = 0)
+    tire_stress = tel['steering_mean'].fillna(0) * 0.3 + tel['lateral_g_max'].fillna(0) * 0.3
+
+    # Attack window
+    has_throttle = tel['throttle_samples'] > 0
+    high_throttle_ratio = (tel['throttle_high'] / tel['throttle_samples']).where(has_throttle, 0.0)
+    compared_laps = laps['timed_laps'] - 1
+    improving_ratio = (laps['improving_laps'] / compared_laps).where(compared_laps > 0, 0.0)
+    attack_window = (improving_ratio * high_throttle_ratio).clip(upper=1.0)
+    attack_window = attack_window.where((laps['lap_rows'] >= 2) & (laps['timed_laps'] >= 2) & has_throttle, 0.0)
+
+    # Fuel conservation
+    fuel_conservation = (tel['throttle_low'] / tel['throttle_samples']).where(has_throttle, 0.0)
+
+    # Overtake risk
+    overtake_risk = (tel['steering_max'].fillna(0) / 180.0).clip(upper=1.0)
+
+    # Ideal pit window
+    lap_time_slope = (laps['last5_last'] - laps['last5_first']) / laps['last5_count']
+    normalized_lap_slope = (lap_time_slope / 10.0).clip(upper=1.0).where(lap_time_slope > 0, 0.0)
+    mid = tel['brake_count'] // 2
+    tire_stress_slope = ((tel['brake_second_half'] - tel['brake_first_half']) / mid).where(tel['brake_count'] >= 10, 0.0)
+    normalized_stress_slope = (tire_stress_slope / 100.0).clip(upper=1.0).where(tire_stress_slope > 0, 0.0)
+    pit_window = (normalized_stress_slope * 0.5 + normalized_lap_slope * 0.5).clip(upper=1.0)
+    pit_window = pit_window.where(laps['last5_count'] >= 2, 0.0)
+
+    return pd.DataFrame({
+        'driver_id': driver_info['vehicle_id'].astype(object).values,
+        'vehicle_number': driver_info['vehicle_number'].astype(int).values,
+        'tire_stress_index': tire_stress.round(3),
+        'attack_window': attack_window.round(3),
+        'fuel_conservation_mode': fuel_conservation.round(3),
+        'overtake_risk': overtake_risk.round(3),
+        'ideal_pit_window': pit_window.round(3),
+    })
+
+def compute_metrics_table(telemetry_df: pd.DataFrame, lap_times_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Attack Window = When lap time is decreasing while throttle > 70%
-    Simple: % of laps where lap time decreased AND throttle > 70%
+    Compute all 5 metrics for every driver in one vectorized pass.
+    Same formulas as the original per-driver loop (kept in tests/test_metrics_parity.py).
     """
-    # Get lap times for driver (match by NUMBER which is car number)
-    driver_laps = lap_times_df[lap_times_df['NUMBER'] == vehicle_number].copy()
-    
-    if len(driver_laps) < 2:
-        return 0.0
-    
-    # Calculate lap time changes (column has leading space)
-    lap_times = driver_laps[' LAP_TIME'].apply(parse_lap_time).dropna().sort_index()
-    if len(lap_times) < 2:
-        return 0.0
-    
-    # Count laps where time decreased (improved)
-    time_decreasing = (lap_times.diff() < 0).sum()
-    total_laps = len(lap_times) - 1  # exclude first lap (no diff)
-    
-    # Get throttle data
-    throttle_data = telemetry_df[
-        (telemetry_df['vehicle_id'] == driver_id) & 
-        (telemetry_df['telemetry_name'] == 'aps')
-    ]['telemetry_value'].astype(float)
-    
-    if len(throttle_data) == 0:
-        return 0.0
-    
-    high_throttle_count = (throttle_data > 70).sum()
-    high_throttle_ratio = high_throttle_count / len(throttle_data)
-    
-    # Simple: if lap time decreasing and throttle high, that's attack window
-    improving_lap_ratio = time_decreasing / total_laps if total_laps > 0 else 0.0
-    attack_percentage = improving_lap_ratio * high_throttle_ratio
-    
-    return min(attack_percentage, 1.0)
+    aggregator = TelemetryAggregator()
+    with stage('aggregate', rows=len(telemetry_df)):
+        aggregator.update(telemetry_df)
+    return finish_metrics(aggregator.driver_info(), aggregator.aggregates(), lap_times_df)
 
-def compute_fuel_conservation_mode(telemetry_df: pd.DataFrame, driver_id: str) -> float:
+def finish_metrics(driver_info: pd.DataFrame, telemetry_aggregates: pd.DataFrame, lap_times_df: pd.DataFrame) -> pd.DataFrame:
+    """Final metrics from the telemetry aggregates and the lap-time file"""
+    with stage('lap_aggregates', rows=len(lap_times_df)):
+        lap_aggregates = compute_lap_aggregates(lap_times_df)
+    with stage('metrics'):
+        return metrics_from_aggregates(driver_info, telemetry_aggregates, lap_aggregates)
+
+def compute_metrics_streaming(telemetry_csv: str, lap_times_df: pd.DataFrame, chunk_size: int = 1000000) -> pd.DataFrame:
     """
-    Fuel Conservation Mode = Low throttle + long braking coast
-    Simple: % of time throttle < 30% AND brake > 0 (coasting/braking)
+    Same metrics as compute_metrics_table, reading the telemetry in chunks.
+    Only per-driver running aggregates are kept, so peak memory doesn't grow with file size.
     """
-    driver_data = telemetry_df[telemetry_df['vehicle_id'] == driver_id]
-    
-    throttle = driver_data[driver_data['telemetry_name'] == 'aps']['telemetry_value'].astype(float)
-    brake_f = driver_data[driver_data['telemetry_name'] == 'pbrake_f']['telemetry_value'].astype(float).fillna(0)
-    brake_r = driver_data[driver_data['telemetry_name'] == 'pbrake_r']['telemetry_value'].astype(float).fillna(0)
-    brake_total = brake_f + brake_r
-    
-    # Align indices (use timestamp as key)
-    throttle_ts = driver_data[driver_data['telemetry_name'] == 'aps'][['timestamp', 'telemetry_value']].rename(columns={'telemetry_value': 'throttle'})
-    brake_ts = driver_data[driver_data['telemetry_name'] == 'pbrake_f'][['timestamp', 'telemetry_value']].rename(columns={'telemetry_value': 'brake'})
-    
-    if len(throttle_ts) == 0:
-        return 0.0
-    
-    # Simple: count samples where throttle low AND brake applied
-    low_throttle = (throttle < 30).sum()
-    
-    # For simplicity, approximate: low throttle = conservation mode
-    return low_throttle / len(throttle) if len(throttle) > 0 else 0.0
+    aggregator = TelemetryAggregator()
+    chunks = traced_chunks(iter_telemetry_chunks(telemetry_csv, chunk_size, columns=TELEMETRY_COLUMNS))
+    for chunk_num, chunk in enumerate(chunks):
+        print(f"Aggregating chunk {chunk_num + 1}...")
+        with stage('aggregate', rows=len(chunk)):
+            aggregator.update(chunk)
+        memory_mark()
+    return finish_metrics(aggregator.driver_info(), aggregator.aggregates(), lap_times_df)
 
-def compute_overtake_risk(telemetry_df: pd.DataFrame, driver_id: str, all_drivers: list) -> float:
+def aggregate_vehicle_shard(cache_dir, spans: list):
+    """Worker: aggregate the rows of a few vehicles, read straight from the memory-mapped cache"""
+    aggregator = TelemetryAggregator()
+    first_rows = []
+    for vehicle_id, start, stop in spans:
+        with stage('read', vehicle_id=vehicle_id):
+            rows = open_vehicle_rows(cache_dir, start, stop, TELEMETRY_COLUMNS)
+        with stage('aggregate', rows=len(rows)):
+            aggregator.update(rows)
+        first = rows[['vehicle_id', 'vehicle_number']].drop_duplicates()
+        first_rows.extend(zip(first.index, first['vehicle_id'].astype(object), first['vehicle_number']))
+        memory_mark()
+    return aggregator, first_rows, collect()
+
+def compute_metrics_parallel(telemetry_csv: str, lap_times_df: pd.DataFrame, workers: int) -> pd.DataFrame:
     """
-    Overtake Risk = High steering + low speed gap
-    Simple: (steering_max * 0.5) + (1 / (speed_gap + 1) * 0.5)
+    Same metrics as compute_metrics_table, sharded by vehicle_id across a process pool.
+    Workers memory-map their own vehicles' rows from the telemetry cache (no DataFrame pickling);
+    results are merged in file order, so the output doesn't depend on scheduling.
     """
-    driver_data = telemetry_df[telemetry_df['vehicle_id'] == driver_id]
-    
-    # Get max steering angle
-    steering = driver_data[driver_data['telemetry_name'] == 'Steering_Angle']['telemetry_value'].astype(float).abs().max()
-    
-    # Get driver speed (need to extract from telemetry or use section data)
-    # For simplicity, use steering as proxy for risk
-    if pd.isna(steering):
-        steering = 0
-    
-    # Normalize steering (assume max ~180 degrees)
-    steering_norm = min(steering / 180.0, 1.0)
-    
-    # Speed gap simplified (would need position data for real calculation)
-    # For now, use steering as primary indicator
-    return steering_norm
+    cache_dir = ensure_cache(telemetry_csv)
+    _, spans = vehicle_row_index(cache_dir)
+    shards = shard_spans(spans, workers)
+    print(f"Aggregating {len(spans)} drivers in {len(shards)} worker shards...")
+
+    aggregator = TelemetryAggregator()
+    first_rows = []
+    with ProcessPoolExecutor(max_workers=len(shards) or 1) as pool:
+        for shard_aggregator, shard_first_rows, shard_trace in pool.map(aggregate_vehicle_shard, [cache_dir] * len(shards), shards):
+            aggregator.merge(shard_aggregator)
+            first_rows.extend(shard_first_rows)
+            absorb(shard_trace)
 
-def compute_ideal_pit_window(lap_times_df: pd.DataFrame, telemetry_df: pd.DataFrame, driver_id: str, vehicle_number: int) -> float:
+    first_rows.sort(key=lambda row: row[0])
+    driver_info = pd.DataFrame([row[1:] for row in first_rows], columns=['vehicle_id', 'vehicle_number'])
+    return finish_metrics(driver_info, aggregator.aggregates(), lap_times_df)
+
+# Frame field -> telemetry_name, for metrics computed from preprocessed frames
+FRAME_CHANNELS = {'throttle': 'aps', 'brake_f': 'pbrake_f', 'steering': 'Steering_Angle', 'accy': 'accy_can'}
+
+def vehicle_number_from_id(vehicle_id: str) -> int:
+    """Car number from a GR86-<chassis>-<number> vehicle_id"""
+    return int(vehicle_id.rsplit('-', 1)[-1])
+
+def frames_to_long(frames: pd.DataFrame, vehicle_number: int) -> pd.DataFrame:
+    """Melt wide frames back to long-format rows for the metric channels"""
+    long_df = frames[['vehicle_id'] + list(FRAME_CHANNELS)].melt(
+        id_vars='vehicle_id', var_name='telemetry_name', value_name='telemetry_value')
+    long_df['telemetry_name'] = long_df['telemetry_name'].map(FRAME_CHANNELS)
+    long_df['vehicle_number'] = vehicle_number
+    return long_df
+
+def compute_window_metrics(store, lap_times_df: pd.DataFrame, first_lap: int, last_lap: int) -> pd.DataFrame:
     """
-    Ideal Pit Window = Tire Stress ↑ & Lap Time ↑ combined slope
-    Simple: (tire_stress_slope * 0.5) + (lap_time_slope * 0.5) where both positive
+    The 5 metrics over laps first_lap..last_lap, queried from a TelemetryStore.
+    Frames are dense, so a channel missing at a timestamp counts as 0 here (as on the dashboard).
     """
-    # Get last 5 laps for trend
-    driver_laps = lap_times_df[lap_times_df['NUMBER'] == vehicle_number].copy()
-    lap_times = driver_laps[' LAP_TIME'].apply(parse_lap_time).dropna().tail(5).sort_index()
-    
-    if len(lap_times) < 2:
-        return 0.0
-    
-    # Lap time slope (increasing = worse = pit needed)
-    lap_time_slope = (lap_times.iloc[-1] - lap_times.iloc[0]) / len(lap_times)
-    
-    # Tire stress over last laps (simplified: use brake pressure trend)
-    driver_data = telemetry_df[telemetry_df['vehicle_id'] == driver_id]
-    brake_f = driver_data[driver_data['telemetry_name'] == 'pbrake_f']['telemetry_value'].astype(float).dropna().tail(100)
-    
-    if len(brake_f) < 10:
-        tire_stress_slope = 0
-    else:
-        # Split into two halves and compare
-        mid = len(brake_f) // 2
-        first_half = brake_f[:mid].mean()
-        second_half = brake_f[mid:].mean()
-        tire_stress_slope = (second_half - first_half) / mid if mid > 0 else 0
-    
-    # Combined: both increasing = pit window
-    # Normalize lap_time_slope (1 second increase = 0.1 score)
-    normalized_lap_slope = min(lap_time_slope / 10.0, 1.0) if lap_time_slope > 0 else 0
-    normalized_stress_slope = min(tire_stress_slope / 100.0, 1.0) if tire_stress_slope > 0 else 0
-    
-    combined = (normalized_stress_slope * 0.5) + (normalized_lap_slope * 0.5)
-    
-    return min(combined, 1.0)
+    aggregator = TelemetryAggregator()
+    for vehicle_id in store.vehicles():
+        window = store.laps(vehicle_id, first_lap, last_lap)
+        if len(window):
+            aggregator.update(frames_to_long(window, vehicle_number_from_id(window['vehicle_id'].iloc[0])))
+
+    lap_column = find_column(lap_times_df, 'LAP_NUMBER')
+    if lap_column is not None:
+        lap_times_df = lap_times_df[lap_times_df[lap_column].between(first_lap, last_lap)]
 
-def compute_all_metrics(data_dir: str = "barber") -> pd.DataFrame:
-    """Compute all 5 metrics for all drivers"""
+    return metrics_from_aggregates(aggregator.driver_info(), aggregator.aggregates(),
+                                   compute_lap_aggregates(lap_times_df))
+
+def compute_all_metrics(data_dir: str = "barber", streaming: bool = False, chunk_size: int = 1000000,
+                        workers: int = 1, telemetry_csv: str = None, lap_times_csv: str = None) -> pd.DataFrame:
+    """Compute all 5 metrics for all drivers (input files default to Race 1 in data_dir)"""
     
-    # Load data
-    telemetry_df = pd.read_csv(f"{data_dir}/R1_barber_telemetry_data.csv")
-    lap_times_df = pd.read_csv(f"{data_dir}/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV", sep=';')
-    weather_df = pd.read_csv(f"{data_dir}/26_Weather_Race 1_Anonymized.CSV", sep=';')
+    telemetry_csv = telemetry_csv or f"{data_dir}/R1_barber_telemetry_data.csv"
+    lap_times_csv = lap_times_csv or f"{data_dir}/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV"
+    lap_times_df = pd.read_csv(lap_times_csv, sep=';')
     
-    # Get unique drivers with their vehicle numbers
-    driver_info = telemetry_df[['vehicle_id', 'vehicle_number']].drop_duplicates()
+    if workers > 1:
+        return compute_metrics_parallel(telemetry_csv, lap_times_df, workers)
     
-    results = []
+    if streaming:
+        print(f"Streaming telemetry in chunks of {chunk_size} rows...")
+        return compute_metrics_streaming(telemetry_csv, lap_times_df, chunk_size)
     
-    for _, row in driver_info.iterrows():
-        driver_id = row['vehicle_id']
-        vehicle_number = int(row['vehicle_number']) if pd.notna(row['vehicle_number']) else None
-        
-        if vehicle_number is None:
-            continue
-            
-        print(f"Computing metrics for {driver_id} (vehicle #{vehicle_number})...")
-        
-        try:
-            tire_stress = compute_tire_stress_index(telemetry_df, driver_id)
-            attack_window = compute_attack_window(lap_times_df, telemetry_df, driver_id, vehicle_number)
-            fuel_conservation = compute_fuel_conservation_mode(telemetry_df, driver_id)
-            overtake_risk = compute_overtake_risk(telemetry_df, driver_id, driver_info['vehicle_id'].unique())
-            pit_window = compute_ideal_pit_window(lap_times_df, telemetry_df, driver_id, vehicle_number)
-            
-            results.append({
-                'driver_id': driver_id,
-                'vehicle_number': vehicle_number,
-                'tire_stress_index': round(tire_stress, 3),
-                'attack_window': round(attack_window, 3),
-                'fuel_conservation_mode': round(fuel_conservation, 3),
-                'overtake_risk': round(overtake_risk, 3),
-                'ideal_pit_window': round(pit_window, 3)
-            })
-        except Exception as e:
-            print(f"Error processing {driver_id}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
+    # Load data
+    with stage('read'):
+        telemetry_df = load_telemetry(telemetry_csv, columns=TELEMETRY_COLUMNS)
+    memory_mark()
     
-    return pd.DataFrame(results)
+    print(f"Computing metrics for {telemetry_df['vehicle_id'].nunique()} drivers...")
+    return compute_metrics_table(telemetry_df, lap_times_df)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute race strategy metrics")
+    parser.add_argument("--data-dir", default="barber")
+    parser.add_argument("--telemetry-csv", help="Telemetry CSV (default: Race 1 in --data-dir)")
+    parser.add_argument("--lap-times-csv", help="Lap-time CSV (default: Race 1 in --data-dir)")
+    parser.add_argument("--output", default="race_metrics.csv")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Read telemetry in chunks with bounded memory")
+    parser.add_argument("--chunk-size", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process drivers in parallel across N worker processes")
+    parser.add_argument("--trace", help="Write a stage timing trace (Chrome trace JSON) to this file")
+    args = parser.parse_args()
+    enable_trace(args.trace)
+    
     print("🏎️  Computing Race Strategy Metrics...")
-    results_df = compute_all_metrics()
+    results_df = compute_all_metrics(args.data_dir, streaming=args.streaming, chunk_size=args.chunk_size,
+                                     workers=args.workers, telemetry_csv=args.telemetry_csv,
+                                     lap_times_csv=args.lap_times_csv)
     
     print("\n📊 Results:")
     print(results_df.to_string(index=False))
     
     # Save results
-    results_df.to_csv("race_metrics.csv", index=False)
-    print(f"\n✅ Saved to race_metrics.csv")
+    results_df.to_csv(args.output, index=False)
+    print(f"\n✅ Saved to {args.output}")
 
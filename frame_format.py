@@ -0,0 +1,81 @@
+"""
+Compact binary per-driver frame files (struct-of-arrays)
+Replaces the indented JSON frames: typed columns behind a small header, optionally gzip-compressed
+"""
+
+import gzip
+import struct
+import numpy as np
+import pandas as pd
+
+MAGIC = b'PGTF'
+FORMAT_VERSION = 1
+FLAG_GZIP = 1
+
+# magic, version, flags, row count, vehicle_id length (little-endian)
+HEADER = struct.Struct('<4sBBIH')
+
+# Body column order: widest dtype first, so every column starts aligned for typed-array views
+FRAME_COLUMNS = [
+    ('timestamp', '<i8'),
+    ('throttle', '<f4'),
+    ('brake_f', '<f4'),
+    ('brake_r', '<f4'),
+    ('steering', '<f4'),
+    ('accx', '<f4'),
+    ('accy', '<f4'),
+    ('lap', '<u2'),
+    ('rpm', '<u2'),
+    ('gear', '<u1'),
+]
+
+def encode_frames(frames: pd.DataFrame, vehicle_id: str, compress: bool = True):
+    """Encode one driver's frames; returns (file bytes, uncompressed size)"""
+    body = bytearray()
+    for name, dtype in FRAME_COLUMNS:
+        values = frames[name].to_numpy()
+        if np.dtype(dtype).kind == 'u':
+            info = np.iinfo(dtype)
+            values = np.clip(values, info.min, info.max)
+        body += values.astype(dtype).tobytes()
+
+    id_bytes = vehicle_id.encode('utf-8')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_GZIP if compress else 0, len(frames), len(id_bytes)) + id_bytes
+    header += b'\0' * (-len(header) % 8)
+
+    raw_size = len(header) + len(body)
+    if compress:
+        # mtime=0 keeps the output byte-identical for identical frames
+        body = gzip.compress(bytes(body), compresslevel=6, mtime=0)
+    return header + bytes(body), raw_size
+
+def decode_frames(data: bytes):
+    """Decode a frame file; returns (vehicle_id, frames DataFrame)"""
+    magic, version, flags, rows, id_length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Not a version {FORMAT_VERSION} PitGPT frame file")
+
+    offset = HEADER.size
+    vehicle_id = data[offset:offset + id_length].decode('utf-8')
+    offset += id_length
+    offset += -offset % 8
+
+    body = data[offset:]
+    if flags & FLAG_GZIP:
+        body = gzip.decompress(body)
+
+    columns = {}
+    position = 0
+    for name, dtype in FRAME_COLUMNS:
+        size = rows * np.dtype(dtype).itemsize
+        columns[name] = np.frombuffer(body, dtype=dtype, count=rows, offset=position)
+        position += size
+
+    frames = pd.DataFrame(columns)
+    frames.insert(1, 'vehicle_id', vehicle_id)
+    return vehicle_id, frames
+
+def read_frames_binary(input_file):
+    """Read a frame file written from encode_frames"""
+    with open(input_file, 'rb') as f:
+        return decode_frames(f.read())
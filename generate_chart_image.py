@@ -1,129 +1,228 @@
 """
-Generate PitGPT Telemetry Charts PNG
-Visual proof of metrics calculation
+PitGPT - Telemetry chart rendering
+Race and per-driver chart sets drawn from the metrics engine's aggregates (race_metrics.csv rows).
+Figures render in a process pool, charts whose inputs are unchanged are skipped, and --preview
+writes low-DPI WebP for dashboard thumbnails.
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import pandas as pd
 
-# Set style
-plt.style.use('dark_background')
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-fig.suptitle('PitGPT - Real-Time Telemetry Analysis\nToyota GR Cup Barber Motorsports Park', 
-             fontsize=20, fontweight='bold', color='white')
-
-# Load real data
 try:
-    metrics_df = pd.read_csv('race_metrics.csv')
-    telemetry_df = pd.read_csv('barber/R1_barber_telemetry_data.csv', nrows=5000)
-except FileNotFoundError as e:
-    print(f"Data file not found: {e}")
-    print("Creating sample visualization...")
-    # Create sample data
-    import numpy as np
-    np.random.seed(42)
-    metrics_df = pd.DataFrame({
-        'driver_id': [f'GR86-{i:03d}-{j}' for i, j in [(2,0), (6,7), (22,13), (47,21), (60,2)]],
-        'tire_stress_index': [9.085, 9.123, 8.772, 9.125, 9.878],
-        'attack_window': [0.0, 0.298, 0.352, 0.372, 0.307],
-        'fuel_conservation_mode': [0.301, 0.326, 0.294, 0.309, 0.3],
-        'overtake_risk': [1.0, 0.861, 0.793, 1.0, 0.818],
-        'ideal_pit_window': [0.0, 0.004, 0.005, 0.004, 0.004]
-    })
-
-# Chart 1: Tire Stress Index by Driver
-ax1 = axes[0, 0]
-drivers_sample = metrics_df.head(8)
-bars1 = ax1.barh(range(len(drivers_sample)), 
-                 drivers_sample['tire_stress_index'],
-                 color=['#ef4444' if x > 9.5 else '#f59e0b' if x > 9.0 else '#10b981' 
-                       for x in drivers_sample['tire_stress_index']])
-ax1.set_yticks(range(len(drivers_sample)))
-ax1.set_yticklabels([f"#{int(v)}" for v in drivers_sample['vehicle_number']], fontsize=10)
-ax1.set_xlabel('Tire Stress Index', fontsize=12, fontweight='bold')
-ax1.set_title('Tire Stress Index by Driver\n(Higher = More Wear)', fontsize=14, fontweight='bold')
-ax1.grid(axis='x', alpha=0.3)
-ax1.axvline(x=9.0, color='yellow', linestyle='--', alpha=0.5, label='Threshold')
-ax1.legend()
-
-# Chart 2: Attack Window Distribution
-ax2 = axes[0, 1]
-attack_windows = metrics_df['attack_window'].values
-colors_attack = ['#10b981' if x > 0.3 else '#f59e0b' if x > 0.2 else '#6b7280' 
-                for x in attack_windows]
-bars2 = ax2.bar(range(len(metrics_df)), attack_windows, color=colors_attack)
-ax2.set_xlabel('Driver', fontsize=12, fontweight='bold')
-ax2.set_ylabel('Attack Window Score', fontsize=12, fontweight='bold')
-ax2.set_title('Attack Window Opportunities\n(Higher = More Aggressive Windows)', fontsize=14, fontweight='bold')
-ax2.set_xticks(range(0, len(metrics_df), 5))
-ax2.set_xticklabels([f"#{int(n)}" for n in metrics_df['vehicle_number'].iloc[::5]], fontsize=9)
-ax2.grid(axis='y', alpha=0.3)
-ax2.axhline(y=0.3, color='green', linestyle='--', alpha=0.5, label='High Attack')
-ax2.legend()
-
-# Chart 3: Metrics Comparison (Radar-style bars)
-ax3 = axes[1, 0]
-driver_id = 'GR86-022-13'
-driver_data = metrics_df[metrics_df['driver_id'] == driver_id].iloc[0]
-metrics_names = ['Tire\nStress', 'Attack\nWindow', 'Fuel\nConserve', 'Overtake\nRisk', 'Pit\nWindow']
-metrics_values = [
-    driver_data['tire_stress_index'] / 10,  # Normalize to 0-1
-    driver_data['attack_window'],
-    driver_data['fuel_conservation_mode'],
-    driver_data['overtake_risk'],
-    driver_data['ideal_pit_window']
-]
-bars3 = ax3.bar(metrics_names, metrics_values, 
-                color=['#ef4444', '#10b981', '#3b82f6', '#f59e0b', '#8b5cf6'])
-ax3.set_ylabel('Normalized Score (0-1)', fontsize=12, fontweight='bold')
-ax3.set_title(f'Strategic Metrics: Driver #{int(driver_data["vehicle_number"])}\n{driver_id}', 
-              fontsize=14, fontweight='bold')
-ax3.set_ylim(0, 1.0)
-ax3.grid(axis='y', alpha=0.3)
-for i, (name, val) in enumerate(zip(metrics_names, metrics_values)):
-    ax3.text(i, val + 0.05, f'{val:.3f}', ha='center', fontsize=9, fontweight='bold')
-
-# Chart 4: Fuel Conservation vs Attack Window (Scatter)
-ax4 = axes[1, 1]
-ax4.scatter(metrics_df['fuel_conservation_mode'], 
-           metrics_df['attack_window'],
-           s=metrics_df['tire_stress_index'] * 50,  # Size by tire stress
-           c=metrics_df['overtake_risk'],
-           cmap='RdYlGn',
-           alpha=0.7,
-           edgecolors='white',
-           linewidth=1)
-ax4.set_xlabel('Fuel Conservation Mode', fontsize=12, fontweight='bold')
-ax4.set_ylabel('Attack Window', fontsize=12, fontweight='bold')
-ax4.set_title('Strategy Profile Analysis\n(Size = Tire Stress, Color = Overtake Risk)', 
-              fontsize=14, fontweight='bold')
-ax4.grid(alpha=0.3)
-cbar = plt.colorbar(ax4.collections[0], ax=ax4)
-cbar.set_label('Overtake Risk', fontsize=10, fontweight='bold')
-
-# Add annotations
-for idx, row in metrics_df.head(5).iterrows():
-    ax4.annotate(f"#{int(row['vehicle_number'])}", 
-                (row['fuel_conservation_mode'], row['attack_window']),
-                fontsize=8, alpha=0.8)
-
-# Add data source text
-fig.text(0.5, 0.02, 
-         'Data Source: Toyota GR Cup - Barber Motorsports Park Race 1 | '
-         f'Total Drivers Analyzed: {len(metrics_df)} | '
-         'Real Telemetry Data from CSV Processing',
-         ha='center', fontsize=10, style='italic', alpha=0.7)
-
-plt.tight_layout(rect=[0, 0.03, 1, 0.98])
-
-# Save as PNG
-output_path = 'PitGPT_Telemetry_Charts.png'
-plt.savefig(output_path, dpi=300, bbox_inches='tight', facecolor='black')
-print(f"✅ Chart saved to: {output_path}")
-print(f"   Dimensions: 16x12 inches @ 300 DPI")
-print(f"   Drivers analyzed: {len(metrics_df)}")
-
-plt.close()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+except ImportError:
+    matplotlib = plt = FigureCanvasAgg = None
+
+RACE_CHART = 'PitGPT_Telemetry_Charts.png'
+DRIVER_DIR = 'drivers'
+MANIFEST = '.chart_manifest.json'
+FULL_DPI = 300
+PREVIEW_DPI = 72
+HIGHLIGHT_DRIVER = 'GR86-022-13'
+METRIC_COLUMNS = ['tire_stress_index', 'attack_window', 'fuel_conservation_mode', 'overtake_risk', 'ideal_pit_window']
+METRIC_LABELS = ['Tire\nStress', 'Attack\nWindow', 'Fuel\nConserve', 'Overtake\nRisk', 'Pit\nWindow']
+METRIC_COLORS = ['#ef4444', '#10b981', '#3b82f6', '#f59e0b', '#8b5cf6']
+
+# Shown when race_metrics.csv is missing
+SAMPLE_METRICS = pd.DataFrame({
+    'driver_id': [f'GR86-{i:03d}-{j}' for i, j in [(2, 0), (6, 7), (22, 13), (47, 21), (60, 2)]],
+    'vehicle_number': [0, 7, 13, 21, 2],
+    'tire_stress_index': [9.085, 9.123, 8.772, 9.125, 9.878],
+    'attack_window': [0.0, 0.298, 0.352, 0.372, 0.307],
+    'fuel_conservation_mode': [0.301, 0.326, 0.294, 0.309, 0.3],
+    'overtake_risk': [1.0, 0.861, 0.793, 1.0, 0.818],
+    'ideal_pit_window': [0.0, 0.004, 0.005, 0.004, 0.004],
+})
+
+def normalized_metrics(row: dict) -> list:
+    """A driver's five strategic metrics on a 0-1 scale (tire stress is out of 10)"""
+    return [row['tire_stress_index'] / 10] + [row[column] for column in METRIC_COLUMNS[1:]]
+
+def tire_stress_panel(ax, metrics: pd.DataFrame):
+    drivers_sample = metrics.head(8)
+    ax.barh(range(len(drivers_sample)), drivers_sample['tire_stress_index'],
+            color=['#ef4444' if x > 9.5 else '#f59e0b' if x > 9.0 else '#10b981'
+                   for x in drivers_sample['tire_stress_index']])
+    ax.set_yticks(range(len(drivers_sample)))
+    ax.set_yticklabels([f"#{int(v)}" for v in drivers_sample['vehicle_number']], fontsize=10)
+    ax.set_xlabel('Tire Stress Index', fontsize=12, fontweight='bold')
+    ax.set_title('Tire Stress Index by Driver\n(Higher = More Wear)', fontsize=14, fontweight='bold')
+    ax.grid(axis='x', alpha=0.3)
+    ax.axvline(x=9.0, color='yellow', linestyle='--', alpha=0.5, label='Threshold')
+    ax.legend()
+
+def attack_window_panel(ax, metrics: pd.DataFrame):
+    attack_windows = metrics['attack_window'].values
+    ax.bar(range(len(metrics)), attack_windows,
+           color=['#10b981' if x > 0.3 else '#f59e0b' if x > 0.2 else '#6b7280' for x in attack_windows])
+    ax.set_xlabel('Driver', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Attack Window Score', fontsize=12, fontweight='bold')
+    ax.set_title('Attack Window Opportunities\n(Higher = More Aggressive Windows)', fontsize=14, fontweight='bold')
+    ax.set_xticks(range(0, len(metrics), 5))
+    ax.set_xticklabels([f"#{int(n)}" for n in metrics['vehicle_number'].iloc[::5]], fontsize=9)
+    ax.grid(axis='y', alpha=0.3)
+    ax.axhline(y=0.3, color='green', linestyle='--', alpha=0.5, label='High Attack')
+    ax.legend()
+
+def driver_metrics_panel(ax, row: dict, field_median: list = None):
+    """One driver's normalized metrics, next to the field median when given"""
+    values = normalized_metrics(row)
+    positions = range(len(METRIC_LABELS))
+    if field_median is not None:
+        ax.bar([p + 0.2 for p in positions], field_median, width=0.4, color='#6b7280', label='Field median')
+        positions = [p - 0.2 for p in positions]
+    ax.bar(positions, values, width=0.4 if field_median is not None else 0.8, color=METRIC_COLORS)
+    ax.set_xticks(range(len(METRIC_LABELS)))
+    ax.set_xticklabels(METRIC_LABELS)
+    ax.set_ylabel('Normalized Score (0-1)', fontsize=12, fontweight='bold')
+    ax.set_title(f'Strategic Metrics: Driver #{int(row["vehicle_number"])}\n{row["driver_id"]}',
+                 fontsize=14, fontweight='bold')
+    ax.set_ylim(0, 1.0)
+    ax.grid(axis='y', alpha=0.3)
+    for position, value in zip(positions, values):
+        ax.text(position, value + 0.05, f'{value:.3f}', ha='center', fontsize=9, fontweight='bold')
+    if field_median is not None:
+        ax.legend()
+
+def strategy_profile_panel(ax, metrics: pd.DataFrame):
+    scatter = ax.scatter(metrics['fuel_conservation_mode'], metrics['attack_window'],
+                         s=metrics['tire_stress_index'] * 50,  # Size by tire stress
+                         c=metrics['overtake_risk'], cmap='RdYlGn', alpha=0.7, edgecolors='white', linewidth=1)
+    ax.set_xlabel('Fuel Conservation Mode', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Attack Window', fontsize=12, fontweight='bold')
+    ax.set_title('Strategy Profile Analysis\n(Size = Tire Stress, Color = Overtake Risk)', fontsize=14, fontweight='bold')
+    ax.grid(alpha=0.3)
+    cbar = plt.colorbar(scatter, ax=ax)
+    cbar.set_label('Overtake Risk', fontsize=10, fontweight='bold')
+    for row in metrics.head(5).to_dict('records'):
+        ax.annotate(f"#{int(row['vehicle_number'])}", (row['fuel_conservation_mode'], row['attack_window']),
+                    fontsize=8, alpha=0.8)
+
+def race_figure(metrics: pd.DataFrame, highlight_driver: str = HIGHLIGHT_DRIVER):
+    """The four-panel race overview"""
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('PitGPT - Real-Time Telemetry Analysis\nToyota GR Cup Barber Motorsports Park',
+                 fontsize=20, fontweight='bold', color='white')
+    highlighted = metrics[metrics['driver_id'] == highlight_driver]
+    tire_stress_panel(axes[0, 0], metrics)
+    attack_window_panel(axes[0, 1], metrics)
+    driver_metrics_panel(axes[1, 0], (highlighted if len(highlighted) else metrics).iloc[0].to_dict())
+    strategy_profile_panel(axes[1, 1], metrics)
+    fig.text(0.5, 0.02,
+             'Data Source: Toyota GR Cup - Barber Motorsports Park Race 1 | '
+             f'Total Drivers Analyzed: {len(metrics)} | '
+             'Real Telemetry Data from CSV Processing',
+             ha='center', fontsize=10, style='italic', alpha=0.7)
+    fig.tight_layout(rect=[0, 0.03, 1, 0.98])
+    return fig
+
+def driver_figure(row: dict, field_median: list):
+    """One driver's metrics against the field median"""
+    fig, ax = plt.subplots(figsize=(8, 6))
+    driver_metrics_panel(ax, row, field_median)
+    fig.tight_layout()
+    return fig
+
+def render_chart(spec: dict) -> str:
+    """Draw and save one chart (runs in a worker process)"""
+    plt.style.use('dark_background')
+    if spec['kind'] == 'race':
+        fig = race_figure(pd.DataFrame(spec['metrics']), spec['highlight'])
+    else:
+        fig = driver_figure(spec['row'], spec['field_median'])
+    fig.savefig(spec['output'], dpi=spec['dpi'], bbox_inches='tight', facecolor='black')
+    plt.close(fig)
+    return spec['output']
+
+def chart_key(spec: dict) -> str:
+    """Hash of a chart's input data, render options and this module's code"""
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    digest.update(json.dumps({k: v for k, v in spec.items() if k != 'output'}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def chart_specs(metrics: pd.DataFrame, output_dir: Path, drivers: list = None, preview: bool = False,
+                highlight_driver: str = HIGHLIGHT_DRIVER, extension: str = None) -> list:
+    """
+    One spec per chart, each carrying only the aggregates it draws: the race overview gets every row,
+    a driver chart its own row and the field medians (so other drivers' changes don't redraw it)
+    """
+    extension = extension or ('webp' if preview else 'png')
+    dpi = PREVIEW_DPI if preview else FULL_DPI
+    columns = ['driver_id', 'vehicle_number'] + METRIC_COLUMNS
+    records = metrics[columns].round(6).to_dict('records')
+    race_output = output_dir / Path(RACE_CHART).with_suffix(f'.{extension}').name
+    specs = [{'kind': 'race', 'metrics': records, 'highlight': highlight_driver, 'dpi': dpi, 'output': str(race_output)}]
+    if drivers is not None:
+        field_median = [round(float(value), 6) for value in
+                        pd.DataFrame([normalized_metrics(row) for row in records]).median().tolist()]
+        for row in records:
+            if drivers and row['driver_id'] not in drivers:
+                continue
+            output = output_dir / DRIVER_DIR / f"{row['driver_id'].replace('/', '_')}.{extension}"
+            specs.append({'kind': 'driver', 'row': row, 'field_median': field_median, 'dpi': dpi, 'output': str(output)})
+    return specs
+
+def render_charts(metrics: pd.DataFrame, output_dir: str = '.', drivers: list = None, preview: bool = False,
+                  workers: int = 1, force: bool = False, highlight_driver: str = HIGHLIGHT_DRIVER) -> dict:
+    """
+    Render the race chart and (drivers=[] for all, or a list of driver_ids) per-driver charts into output_dir.
+    Returns {'rendered': [...], 'skipped': [...]}.
+    """
+    if plt is None:
+        raise ImportError("matplotlib is required for charts (pip install matplotlib)")
+    output_path = Path(output_dir)
+    (output_path / DRIVER_DIR if drivers is not None else output_path).mkdir(parents=True, exist_ok=True)
+    extension = None
+    if preview and 'webp' not in FigureCanvasAgg.get_supported_filetypes():
+        print("⚠️  WebP not supported by this matplotlib - preview charts saved as PNG")
+        extension = 'png'
+    specs = chart_specs(metrics, output_path, drivers, preview, highlight_driver, extension)
+
+    # Manifest: chart path (relative to output_dir) -> chart_key of what it was last drawn from
+    manifest_file = output_path / MANIFEST
+    manifest = json.loads(manifest_file.read_text()) if manifest_file.exists() else {}
+    keys = {Path(spec['output']).relative_to(output_path).as_posix(): chart_key(spec) for spec in specs}
+    pending = [spec for spec, (name, key) in zip(specs, keys.items())
+               if force or manifest.get(name) != key or not Path(spec['output']).exists()]
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            rendered = list(pool.map(render_chart, pending))
+    else:
+        rendered = [render_chart(spec) for spec in pending]
+
+    manifest.update(keys)
+    manifest_file.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return {'rendered': rendered, 'skipped': [spec['output'] for spec in specs if spec not in pending]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render race and per-driver metric charts")
+    parser.add_argument("--metrics", default="race_metrics.csv")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--drivers", nargs="*", help="Also render per-driver charts (no ids = every driver)")
+    parser.add_argument("--highlight", default=HIGHLIGHT_DRIVER, help="Driver shown in the race overview's metrics panel")
+    parser.add_argument("--preview", action="store_true", help=f"{PREVIEW_DPI}-DPI WebP for dashboard previews")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="Redraw charts even if their inputs are unchanged")
+    args = parser.parse_args()
+
+    try:
+        metrics_df = pd.read_csv(args.metrics)
+    except FileNotFoundError as e:
+        print(f"Data file not found: {e}")
+        print("Creating sample visualization...")
+        metrics_df = SAMPLE_METRICS
 
+    result = render_charts(metrics_df, args.output_dir, args.drivers, args.preview, args.workers, args.force, args.highlight)
+    for output in result['rendered']:
+        print(f"✓ {output}")
+    print(f"\n✅ {len(result['rendered'])} charts rendered, {len(result['skipped'])} unchanged "
+          f"({PREVIEW_DPI if args.preview else FULL_DPI} DPI, drivers analyzed: {len(metrics_df)})")
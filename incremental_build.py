@@ -0,0 +1,218 @@
+"""
+Content-addressed incremental rebuilds
+Each vehicle's slice of the telemetry cache is hashed together with the code version; outputs are stored
+under those keys, so only vehicles whose inputs changed are regenerated and unchanged files are never rewritten.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from compute_metrics import TelemetryAggregator, TELEMETRY_COLUMNS, finish_metrics
+from lap_table import LapTable
+from preprocess_telemetry import encode_driver_frames, merge_frames, pivot_chunk
+from telemetry_cache import CACHE_COLUMNS, column_memmap, ensure_cache, open_vehicle_rows, read_meta, vehicle_row_index
+from telemetry_pyramid import encode_driver_pyramid
+from telemetry_timestamps import TimestampDecoder
+
+BUILD_DIRNAME = '.pitgpt_build'
+ROOT = Path(__file__).resolve().parent
+OUTPUT_SUFFIXES = ['_telemetry.bin', '_telemetry.json', '_pyramid.bin']  # per-driver files preprocess owns
+
+# Source files whose changes invalidate each kind of artifact
+PREPROCESS_CODE = ['preprocess_telemetry.py', 'frame_format.py', 'telemetry_pyramid.py', 'telemetry_cache.py', 'telemetry_quality.py', 'telemetry_timestamps.py']
+METRICS_CODE = ['compute_metrics.py', 'telemetry_cache.py', 'telemetry_quality.py', 'telemetry_timestamps.py']
+
+def code_version(files: list) -> str:
+    digest = hashlib.sha256()
+    for name in files:
+        digest.update(name.encode('utf-8'))
+        digest.update((ROOT / name).read_bytes())
+    return digest.hexdigest()
+
+def build_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ArtifactStore:
+    """
+    objects/<sha256 of content> holds artifact bytes; keys/<build key> names the object built from those inputs.
+    Identical outputs from different inputs share one object.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        (self.root / 'objects').mkdir(parents=True, exist_ok=True)
+        (self.root / 'keys').mkdir(parents=True, exist_ok=True)
+
+    def get_object(self, content_hash: str):
+        object_file = self.root / 'objects' / content_hash
+        return object_file.read_bytes() if object_file.exists() else None
+
+    def put_object(self, data: bytes) -> str:
+        content_hash = hashlib.sha256(data).hexdigest()
+        object_file = self.root / 'objects' / content_hash
+        if not object_file.exists():
+            atomic_write(object_file, data)
+        return content_hash
+
+    def get(self, key: str):
+        """Bytes built for a key, or None"""
+        key_file = self.root / 'keys' / key
+        if not key_file.exists():
+            return None
+        return self.get_object(key_file.read_text().strip())
+
+    def put(self, key: str, data: bytes):
+        atomic_write(self.root / 'keys' / key, self.put_object(data).encode('ascii'))
+
+def atomic_write(path: Path, data: bytes):
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Write only when the file is missing or its bytes differ (keeps mtimes stable for deploy syncs)"""
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    atomic_write(path, data)
+    return True
+
+def vehicle_slice_digests(cache_dir: Path) -> list:
+    """(vehicle_id, start, stop, digest) per vehicle: a hash of that vehicle's rows in every cached column"""
+    meta = read_meta(cache_dir)
+    order, spans = vehicle_row_index(cache_dir)
+    columns = {name: column_memmap(cache_dir, meta, name) for name in CACHE_COLUMNS}
+    names = meta['categories']['telemetry_name']
+
+    digests = []
+    for vehicle_id, start, stop in spans:
+        rows = np.asarray(order[start:stop])
+        digest = hashlib.sha256(str(vehicle_id).encode('utf-8'))
+        # Channel codes are file-wide, so hash this vehicle's names with codes local to it: a channel that only
+        # another car has (or a reordered category list) leaves the digest alone
+        used, local_codes = np.unique(columns['telemetry_name'][rows], return_inverse=True)
+        digest.update(json.dumps([names[code] if code >= 0 else None for code in used.tolist()]).encode('utf-8'))
+        digest.update(local_codes.astype('int32').tobytes())
+        for name in CACHE_COLUMNS:
+            if name not in ('vehicle_id', 'telemetry_name'):
+                digest.update(np.ascontiguousarray(columns[name][rows]).tobytes())
+        digests.append((vehicle_id, start, stop, digest.hexdigest()))
+    return digests
+
+def preprocess_incremental(input_csv: str, output_dir: str, output_format: str = 'binary', compress: bool = True,
+                           build_dir: str = None) -> dict:
+    """
+    Same per-driver frame files as preprocess_telemetry, rebuilding only vehicles whose rows changed.
+    Returns counts of vehicles built, reused from the store and files actually written.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    store = ArtifactStore(build_dir or Path(input_csv).parent / BUILD_DIRNAME)
+    cache_dir = ensure_cache(input_csv)
+    version = code_version(PREPROCESS_CODE)
+
+    built = reused = written = 0
+    produced = set()
+    decoder = TimestampDecoder()
+    for vehicle_id, start, stop, digest in vehicle_slice_digests(cache_dir):
+        key = build_key('frames', version, output_format, compress, digest)
+        cached = store.get(key)
+        outputs = json.loads(cached) if cached is not None else None
+        if outputs is not None and all(store.get_object(content_hash) is not None for content_hash in outputs.values()):
+            reused += 1
+        else:
+            frames = merge_frames([pivot_chunk(open_vehicle_rows(cache_dir, start, stop), decoder)])
+            outputs = {}
+            for frame_vehicle_id, vehicle_frames in frames.groupby('vehicle_id', sort=False):
+                file_name, data, _ = encode_driver_frames(frame_vehicle_id, vehicle_frames, output_format, compress)
+                outputs[file_name] = store.put_object(data)
+                pyramid_name, pyramid_data = encode_driver_pyramid(frame_vehicle_id, vehicle_frames, compress)
+                outputs[pyramid_name] = store.put_object(pyramid_data)
+            store.put(key, json.dumps(outputs).encode('utf-8'))
+            built += 1
+
+        for file_name, content_hash in outputs.items():
+            produced.add(file_name)
+            if write_if_changed(output_path / file_name, store.get_object(content_hash)):
+                written += 1
+                print(f"✓ Wrote {output_path / file_name}")
+
+    # Drivers no longer in the input (or an old output format) would otherwise keep being deployed
+    removed = 0
+    for path in sorted(output_path.iterdir()):
+        if path.is_file() and path.name.endswith(tuple(OUTPUT_SUFFIXES)) and path.name not in produced:
+            path.unlink()
+            removed += 1
+            print(f"✓ Removed stale {path}")
+
+    decoder.report()
+    print(f"\n✅ {built} drivers rebuilt, {reused} unchanged; {written} files written, {removed} removed in {output_dir}")
+    return {'built': built, 'reused': reused, 'written': written, 'removed': removed}
+
+def preprocess_lap_times_if_changed(input_csv: str, output_file: str) -> bool:
+    """preprocess_lap_times, leaving output_file untouched when the JSON would be identical"""
+    data = json.dumps(LapTable.from_csv(input_csv).by_car(), indent=2).encode('utf-8')
+    return write_if_changed(Path(output_file), data)
+
+def compute_metrics_incremental(telemetry_csv: str, lap_times_df: pd.DataFrame, build_dir: str = None) -> pd.DataFrame:
+    """
+    Same table as compute_metrics_table: per-vehicle telemetry aggregates are cached by input hash,
+    so only changed drivers are re-aggregated. Lap aggregates and the formulas are cheap and always re-run.
+    """
+    store = ArtifactStore(build_dir or Path(telemetry_csv).parent / BUILD_DIRNAME)
+    cache_dir = ensure_cache(telemetry_csv)
+    order, _ = vehicle_row_index(cache_dir)
+    version = code_version(METRICS_CODE)
+
+    aggregates, first_rows = [], []
+    rebuilt = 0
+    for vehicle_id, start, stop, digest in vehicle_slice_digests(cache_dir):
+        key = build_key('aggregates', version, digest)
+        cached = store.get(key)
+        if cached is None:
+            rows = open_vehicle_rows(cache_dir, start, stop, TELEMETRY_COLUMNS)
+            aggregator = TelemetryAggregator()
+            aggregator.update(rows)
+            first = rows[['vehicle_id', 'vehicle_number']].drop_duplicates()
+            cached = json.dumps({
+                'aggregates': {str(vid): values for vid, values in aggregator.aggregates().to_dict('index').items()},
+                # Position within the vehicle's rows, so the entry stays valid if other vehicles change
+                'first_rows': [[int(np.searchsorted(order[start:stop], position)), str(vid), number]
+                               for position, vid, number in zip(first.index, first['vehicle_id'].astype(object),
+                                                                first['vehicle_number'])],
+            }).encode('utf-8')
+            store.put(key, cached)
+            rebuilt += 1
+
+        entry = json.loads(cached)
+        aggregates.extend(entry['aggregates'].items())
+        first_rows.extend((int(order[start + offset]), vid, number) for offset, vid, number in entry['first_rows'])
+
+    print(f"Aggregated {rebuilt} changed drivers, reused {len(aggregates) - rebuilt}")
+    first_rows.sort(key=lambda row: row[0])
+    driver_info = pd.DataFrame([row[1:] for row in first_rows], columns=['vehicle_id', 'vehicle_number'])
+    telemetry_aggregates = pd.DataFrame.from_dict(dict(aggregates), orient='index')
+    return finish_metrics(driver_info, telemetry_aggregates, lap_times_df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild only the drivers whose telemetry changed")
+    parser.add_argument("target", choices=["preprocess", "metrics"])
+    parser.add_argument("--telemetry-csv", default="barber/R1_barber_telemetry_data.csv")
+    parser.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    parser.add_argument("--output-dir", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber")
+    parser.add_argument("--output", default="race_metrics.csv", help="Metrics CSV (metrics target)")
+    parser.add_argument("--format", choices=["binary", "json"], default="binary")
+    args = parser.parse_args()
+
+    if args.target == 'preprocess':
+        preprocess_incremental(args.telemetry_csv, f"{args.output_dir}/telemetry", args.format)
+        if os.path.exists(args.lap_times_csv):
+            preprocess_lap_times_if_changed(args.lap_times_csv, f"{args.output_dir}/lap_times.json")
+    else:
+        results_df = compute_metrics_incremental(args.telemetry_csv, pd.read_csv(args.lap_times_csv, sep=';'))
+        write_if_changed(Path(args.output), results_df.to_csv(index=False).encode('utf-8'))
+        print(f"\n✅ Saved to {args.output}")
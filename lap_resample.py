@@ -0,0 +1,214 @@
+"""
+PitGPT - Lap-aligned resampling
+Each channel is aligned to a fixed N-Hz grid per lap (forward-fill or linear interpolation) from the raw
+samples, so laps and drivers compare on dense arrays instead of sparse frames with zero placeholders.
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from pipeline_trace import enable as enable_trace, memory_mark, stage
+from preprocess_telemetry import FRAME_FIELDS, INT_FIELDS, TELEMETRY_FIELDS, write_driver_frames
+from telemetry_cache import ensure_cache, open_vehicle_rows, vehicle_row_index
+from telemetry_quality import sorted_lap_key
+from telemetry_timestamps import TimestampDecoder
+
+RESAMPLE_HZ = 10
+RESAMPLE_METHODS = ['linear', 'ffill']
+MAX_GAP_MS = 1000     # grid points further than this from the channel's last sample are NaN
+MAX_LAP_MS = 30 * 60 * 1000  # a lap's grid stops here, so one outlier timestamp can't allocate millions of points
+STEP_FIELDS = ['gear']  # discrete channels are always forward-filled
+
+class ResampledLaps:
+    """
+    One vehicle's channels on a fixed-rate grid, lap by lap.
+    Lap laps[i] owns grid rows offsets[i]:offsets[i + 1] of timestamp and every channel array (NaN = no data).
+    """
+
+    def __init__(self, vehicle_id: str, hz: float, laps: np.ndarray, offsets: np.ndarray,
+                 timestamp: np.ndarray, channels: dict):
+        self.vehicle_id = vehicle_id
+        self.hz = hz
+        self.laps = laps
+        self.offsets = offsets
+        self.timestamp = timestamp
+        self.channels = channels
+        self.lap_index = np.repeat(np.arange(len(laps)), np.diff(offsets))
+
+    def lap_rows(self, lap: int) -> slice:
+        i = np.searchsorted(self.laps, lap)
+        if i == len(self.laps) or self.laps[i] != lap:
+            return slice(0, 0)
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def lap(self, lap: int) -> pd.DataFrame:
+        """One lap's grid: elapsed seconds since the lap started plus every channel"""
+        rows = self.lap_rows(lap)
+        elapsed = np.arange(rows.stop - rows.start) / self.hz
+        return pd.DataFrame({'elapsed_s': elapsed, **{field: values[rows] for field, values in self.channels.items()}})
+
+    def stack(self, field: str, laps: list = None) -> np.ndarray:
+        """laps x samples matrix of one channel, NaN-padded to the longest lap"""
+        laps = self.laps if laps is None else np.asarray(laps)
+        lap_values = [self.channels[field][self.lap_rows(lap)] for lap in laps]
+        matrix = np.full((len(laps), max((len(values) for values in lap_values), default=0)), np.nan)
+        for row, values in enumerate(lap_values):
+            matrix[row, :len(values)] = values
+        return matrix
+
+    def lap_summary(self) -> pd.DataFrame:
+        """Per lap: duration and the mean and max of every channel over the aligned grid"""
+        counts = np.diff(self.offsets)
+        starts = self.offsets[:-1][counts > 0]
+        summary = pd.DataFrame({'lap': self.laps[counts > 0], 'duration_s': counts[counts > 0] / self.hz})
+        for field, values in self.channels.items():
+            present = (~np.isnan(values)).astype('int64')
+            n = np.add.reduceat(present, starts) if len(starts) else np.zeros(0)
+            total = np.add.reduceat(np.where(present, values, 0.0), starts) if len(starts) else np.zeros(0)
+            summary[f"{field}_mean"] = np.where(n > 0, total / np.maximum(n, 1), np.nan)
+            summary[f"{field}_max"] = np.fmax.reduceat(values, starts) if len(starts) else np.zeros(0)
+        return summary
+
+    def to_frames(self) -> pd.DataFrame:
+        """Dense frames in the preprocess_telemetry layout (NaN as 0, same clamping), for the frame writers"""
+        frames = pd.DataFrame({
+            'vehicle_id': self.vehicle_id,
+            'timestamp': self.timestamp,
+            'lap': self.laps[self.lap_index],
+        })
+        for field in FRAME_FIELDS:
+            frames[field] = np.nan_to_num(self.channels[field], nan=0.0)
+        frames['throttle'] = frames['throttle'].clip(0, 100)
+        frames['steering'] = frames['steering'].abs()
+        frames['accy'] = frames['accy'].abs()
+        for field in INT_FIELDS:
+            frames[field] = frames[field].round().astype('int64')
+        return frames
+
+def lap_delta(a: ResampledLaps, lap_a: int, b: ResampledLaps, lap_b: int, field: str) -> np.ndarray:
+    """b - a for one channel over two laps, aligned by time since the lap started (shorter lap's length)"""
+    values_a = a.channels[field][a.lap_rows(lap_a)]
+    values_b = b.channels[field][b.lap_rows(lap_b)]
+    n = min(len(values_a), len(values_b))
+    return values_b[:n] - values_a[:n]
+
+def lap_grid(timestamps: np.ndarray, lap_key: np.ndarray, hz: float) -> tuple:
+    """
+    Grid timestamps for sorted samples: each lap runs from its first sample to the next lap's first sample,
+    at most MAX_LAP_MS. Returns (laps, offsets, grid timestamps).
+    """
+    laps, starts = np.unique(lap_key, return_index=True)
+    start_ms = timestamps[starts]
+    stop_ms = np.append(start_ms[1:], timestamps[-1] + 1)
+    step_ms = 1000.0 / hz
+    counts = np.minimum(np.ceil((stop_ms - start_ms) / step_ms), np.ceil(MAX_LAP_MS / step_ms)).astype('int64')
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+    grid = np.repeat(start_ms, counts) + np.round(within * step_ms).astype('int64')
+    return laps, offsets, grid
+
+def resample_channel(sample_ms: np.ndarray, values: np.ndarray, grid: np.ndarray, method: str,
+                     max_gap_ms: int = MAX_GAP_MS) -> np.ndarray:
+    """One channel's sorted samples on the grid; NaN before the first sample or after a gap"""
+    # Same-timestamp duplicates: the last sample wins, as in the pivot
+    keep = np.append(sample_ms[1:] != sample_ms[:-1], True)
+    sample_ms, values = sample_ms[keep], values[keep]
+    previous = np.searchsorted(sample_ms, grid, side='right') - 1
+    stale = (previous < 0) | (grid - sample_ms[np.maximum(previous, 0)] > max_gap_ms)
+    if method == 'linear':
+        resampled = np.interp(grid, sample_ms, values)
+    else:
+        resampled = values[np.maximum(previous, 0)]
+    resampled[stale] = np.nan
+    return resampled
+
+def resample_vehicle(rows: pd.DataFrame, hz: float = RESAMPLE_HZ, method: str = 'linear',
+                     max_gap_ms: int = MAX_GAP_MS, decoder: TimestampDecoder = None) -> ResampledLaps:
+    """Resample one vehicle's long-format rows (vehicle_id, lap, timestamp, telemetry_name, telemetry_value)"""
+    decoder = decoder or TimestampDecoder()
+    vehicle_id = str(rows['vehicle_id'].iloc[0]).strip() if len(rows) else ''
+    timestamps, valid = decoder.decode(rows['timestamp'])
+    samples = pd.DataFrame({
+        'timestamp': timestamps,
+        'lap': pd.to_numeric(rows['lap'], errors='coerce').to_numpy(dtype='float64'),
+        'field': rows['telemetry_name'].astype(str).str.strip().map(TELEMETRY_FIELDS).to_numpy(),
+        'value': pd.to_numeric(rows['telemetry_value'], errors='coerce').to_numpy(dtype='float64'),
+    })[valid]
+    samples = samples.sort_values('timestamp', kind='stable')
+    if samples.empty:
+        empty = np.zeros(0)
+        return ResampledLaps(vehicle_id, hz, np.zeros(0, dtype='int64'), np.zeros(1, dtype='int64'),
+                             np.zeros(0, dtype='int64'), {field: empty for field in FRAME_FIELDS})
+
+    # Laps stay contiguous if the lap counter briefly goes backwards or glitches
+    sample_ms = samples['timestamp'].to_numpy()
+    lap_key = sorted_lap_key(samples['lap'].to_numpy())
+    laps, offsets, grid = lap_grid(sample_ms, lap_key, hz)
+
+    channels = {}
+    samples = samples.dropna(subset=['field', 'value'])
+    by_field = dict(tuple(samples.groupby('field', sort=False)))
+    for field in FRAME_FIELDS:
+        field_samples = by_field.get(field)
+        if field_samples is None:
+            channels[field] = np.full(len(grid), np.nan)
+            continue
+        channels[field] = resample_channel(field_samples['timestamp'].to_numpy(), field_samples['value'].to_numpy(),
+                                           grid, 'ffill' if field in STEP_FIELDS else method, max_gap_ms)
+    return ResampledLaps(vehicle_id, hz, laps, offsets, grid, channels)
+
+def resample_race(telemetry_csv: str, hz: float = RESAMPLE_HZ, method: str = 'linear', vehicles: list = None):
+    """Yield a ResampledLaps per vehicle, reading each vehicle's rows from the telemetry cache"""
+    cache_dir = ensure_cache(telemetry_csv)
+    _, spans = vehicle_row_index(cache_dir)
+    decoder = TimestampDecoder()
+    for vehicle_id, start, stop in spans:
+        if vehicles and vehicle_id not in vehicles:
+            continue
+        with stage('resample', vehicle_id=vehicle_id, rows=stop - start):
+            resampled = resample_vehicle(open_vehicle_rows(cache_dir, start, stop), hz, method, decoder=decoder)
+        memory_mark()
+        yield resampled
+    decoder.report()
+
+def save_resampled(resampled: ResampledLaps, output_path: Path) -> Path:
+    """Write the per-lap arrays as <vehicle_id>_laps_<hz>hz.npz"""
+    safe_id = resampled.vehicle_id.replace('/', '_').replace('\\', '_')
+    output_file = output_path / f"{safe_id}_laps_{resampled.hz:g}hz.npz"
+    np.savez_compressed(output_file, laps=resampled.laps, offsets=resampled.offsets,
+                        timestamp=resampled.timestamp, **resampled.channels)
+    return output_file
+
+def load_resampled(input_file: str, vehicle_id: str = None, hz: float = RESAMPLE_HZ) -> ResampledLaps:
+    """Read a file written by save_resampled"""
+    with np.load(input_file) as data:
+        channels = {field: data[field] for field in FRAME_FIELDS if field in data}
+        return ResampledLaps(vehicle_id or Path(input_file).name.split('_laps_')[0], hz,
+                             data['laps'], data['offsets'], data['timestamp'], channels)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resample telemetry onto a fixed-rate grid per lap")
+    parser.add_argument("--telemetry-csv", default="barber/R1_barber_telemetry_data.csv")
+    parser.add_argument("--output-dir", default="resampled")
+    parser.add_argument("--hz", type=float, default=RESAMPLE_HZ)
+    parser.add_argument("--method", choices=RESAMPLE_METHODS, default="linear",
+                        help="Continuous channels: linear interpolation or forward-fill (gear is always forward-filled)")
+    parser.add_argument("--format", choices=["npz", "binary", "json"], default="npz",
+                        help="npz lap arrays, or dense dashboard frame files")
+    parser.add_argument("--drivers", nargs="*", help="vehicle_ids to resample (default all)")
+    parser.add_argument("--trace", help="Write a stage timing trace (Chrome trace JSON) to this file")
+    args = parser.parse_args()
+    enable_trace(args.trace)
+
+    output_path = Path(args.output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    drivers = 0
+    for resampled in resample_race(args.telemetry_csv, args.hz, args.method, args.drivers):
+        if args.format == 'npz':
+            print(f"✓ {resampled.vehicle_id}: {len(resampled.laps)} laps, {len(resampled.timestamp):,} samples "
+                  f"→ {save_resampled(resampled, output_path)}")
+        else:
+            write_driver_frames(resampled.vehicle_id, resampled.to_frames(), output_path, args.format)
+        drivers += 1
+    print(f"\n✅ Resampled {drivers} drivers at {args.hz:g} Hz to {args.output_dir}")
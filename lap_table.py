@@ -0,0 +1,120 @@
+"""
+PitGPT - Lap-time table
+The LAP_TIME column is parsed once with vectorized string ops and grouped per car,
+with lap-to-lap diffs and rolling slopes precomputed for every consumer.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+SLOPE_WINDOW = 5  # laps in the pit-window lap-time trend
+
+def find_column(df: pd.DataFrame, name: str):
+    """Column whose name matches once stripped (the lap-time file pads names with a space)"""
+    return next((column for column in df.columns if column.strip() == name), None)
+
+def sector_columns(df: pd.DataFrame) -> list:
+    """Sector time columns in order: S1_SECONDS.. when present, else S1, S2, .."""
+    for pattern in (r'^S(\d+)_SECONDS$', r'^S(\d+)$'):
+        found = sorted((int(match.group(1)), column) for column in df.columns
+                       if (match := re.match(pattern, column.strip(), re.IGNORECASE)))
+        if found:
+            return [column for _, column in found]
+    return []
+
+def parse_lap_times(lap_times: pd.Series) -> pd.Series:
+    """Seconds from M:SS.mmm, H:MM:SS.mmm or bare seconds (NaN where unparseable)"""
+    text = lap_times.astype(object).where(lap_times.notna(), '').astype(str).str.strip()
+    parts = text.str.split(':', expand=True).reindex(columns=range(3))
+    values = [pd.to_numeric(parts[i], errors='coerce').to_numpy(dtype='float64') for i in range(3)]
+    n_parts = text.str.count(':').to_numpy() + 1
+    seconds = np.select(
+        [n_parts == 1, n_parts == 2, n_parts == 3],
+        [values[0], values[0] * 60 + values[1], values[0] * 3600 + values[1] * 60 + values[2]],
+        np.nan,
+    )
+    return pd.Series(seconds, index=lap_times.index, dtype='float64')
+
+class LapTable:
+    """
+    Every car's timed laps in race (file) order, grouped by car.
+    Car i owns rows offsets[i]:offsets[i + 1] of times, lap_numbers, diffs, slopes and sectors.
+    """
+
+    def __init__(self, lap_times_df: pd.DataFrame, slope_window: int = SLOPE_WINDOW):
+        time_column = find_column(lap_times_df, 'LAP_TIME')
+        lap_column = find_column(lap_times_df, 'LAP_NUMBER')
+        numbers = lap_times_df['NUMBER']
+        times = parse_lap_times(lap_times_df[time_column]) if time_column else pd.Series(np.nan, index=lap_times_df.index)
+        timed = numbers.notna() & times.notna()
+
+        # Cars ordered by their first timed lap, then cars with rows but no timed laps
+        codes, cars = pd.factorize(pd.concat([numbers[timed], numbers[numbers.notna() & ~timed]]))
+        self.numbers = np.asarray(cars)
+        self.index = {number: i for i, number in enumerate(self.numbers)}
+        self.lap_rows = np.bincount(codes, minlength=len(cars))
+
+        timed_codes = codes[:int(timed.sum())]
+        order = np.argsort(timed_codes, kind='stable')
+        car_codes = timed_codes[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(car_codes, minlength=len(cars)))])
+        self.times = times[timed].to_numpy()[order]
+        self.lap_numbers = (pd.to_numeric(lap_times_df.loc[timed, lap_column], errors='coerce').to_numpy(dtype='float64')[order]
+                            if lap_column else np.full(len(order), np.nan))
+        # Sector times (seconds), one column per sector; empty when the file has no sections
+        sectors = sector_columns(lap_times_df)
+        self.sector_names = [f"s{i + 1}" for i in range(len(sectors))]
+        self.sectors = np.column_stack(
+            [parse_lap_times(lap_times_df.loc[timed, column]).to_numpy()[order] for column in sectors]
+        ) if sectors else np.empty((len(order), 0))
+
+        # Position of each lap within its car, then the diff and slope over the trailing window
+        self.car_codes = car_codes
+        position = np.arange(len(car_codes)) - self.offsets[car_codes]
+        self.diffs = np.full(len(car_codes), np.nan)
+        self.diffs[position > 0] = np.diff(self.times)[position[1:] > 0] if len(car_codes) else []
+        self.window_counts = np.minimum(position, slope_window - 1) + 1
+        self.window_first = self.times[np.arange(len(car_codes)) - self.window_counts + 1]
+        self.slopes = (self.times - self.window_first) / self.window_counts
+
+    @classmethod
+    def from_csv(cls, lap_times_csv: str, nrows: int = None) -> 'LapTable':
+        return cls(pd.read_csv(lap_times_csv, sep=';', nrows=nrows))
+
+    def car(self, vehicle_number) -> pd.DataFrame:
+        """One car's timed laps: lap_number, lap_time, diff, slope and s1.. sector times (empty if unknown)"""
+        i = self.index.get(vehicle_number)
+        rows = slice(self.offsets[i], self.offsets[i + 1]) if i is not None else slice(0, 0)
+        return pd.DataFrame({
+            'lap_number': self.lap_numbers[rows],
+            'lap_time': self.times[rows],
+            'diff': self.diffs[rows],
+            'slope': self.slopes[rows],
+            **{name: self.sectors[rows, j] for j, name in enumerate(self.sector_names)},
+        })
+
+    def aggregates(self) -> pd.DataFrame:
+        """Per car NUMBER: lap counts, improving laps and the last-window slope inputs"""
+        timed_laps = np.diff(self.offsets)
+        improving = np.bincount(self.car_codes, weights=self.diffs < 0, minlength=len(self.numbers))
+        has_laps = timed_laps > 0
+        last = np.maximum(self.offsets[1:] - 1, 0)
+
+        def at_last(values, fill=np.nan):
+            return np.where(has_laps, values[last], fill) if len(values) else np.full(len(self.numbers), fill)
+
+        return pd.DataFrame({
+            'lap_rows': self.lap_rows,
+            'timed_laps': timed_laps,
+            'improving_laps': improving,
+            'last5_first': at_last(self.window_first),
+            'last5_last': at_last(self.times),
+            'last5_count': at_last(self.window_counts, 0),
+        }, index=pd.Index(self.numbers, name='NUMBER'))
+
+    def by_car(self) -> dict:
+        """{car number: [lap seconds, ...]} for cars with timed laps (car 0 is the file's placeholder)"""
+        return {int(number): self.times[self.offsets[i]:self.offsets[i + 1]].tolist()
+                for i, number in enumerate(self.numbers)
+                if self.offsets[i + 1] > self.offsets[i] and int(number) != 0}
@@ -0,0 +1,106 @@
+"""
+PitGPT - Incremental race metrics for live sessions
+Appended telemetry rows and lap times update the 5 metrics without recomputing the race
+"""
+
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+from compute_metrics import TelemetryAggregator, metrics_from_aggregates
+from lap_table import parse_lap_times
+
+class LapTimeTracker:
+    """Running lap aggregates for one car (same inputs as compute_lap_aggregates)"""
+
+    def __init__(self, vehicle_number: int):
+        self.vehicle_number = vehicle_number
+        self.lap_rows = 0
+        self.timed_laps = 0
+        self.improving_laps = 0
+        self.last5 = deque(maxlen=5)
+
+    def add_lap_times(self, lap_times):
+        """Append raw LAP_TIME values (MM:SS.mmm strings or seconds) in race order"""
+        parsed = parse_lap_times(pd.Series(list(lap_times), dtype=object))
+        self.lap_rows += len(parsed)
+        for lap_time in parsed.dropna():
+            if self.last5 and lap_time < self.last5[-1]:
+                self.improving_laps += 1
+            self.timed_laps += 1
+            self.last5.append(lap_time)
+
+    def aggregates(self) -> pd.DataFrame:
+        """One-row lap aggregates indexed by vehicle number"""
+        return pd.DataFrame({
+            'lap_rows': [self.lap_rows],
+            'timed_laps': [self.timed_laps],
+            'improving_laps': [self.improving_laps],
+            'last5_first': [self.last5[0] if self.last5 else np.nan],
+            'last5_last': [self.last5[-1] if self.last5 else np.nan],
+            'last5_count': [len(self.last5)],
+        }, index=[self.vehicle_number])
+
+class LiveDriverMetrics:
+    """
+    Incremental metrics for one driver.
+    Each update costs O(new rows); metrics() can be read at any moment.
+    """
+
+    def __init__(self, driver_id: str, vehicle_number: int, laps: LapTimeTracker = None):
+        self.driver_id = driver_id
+        self.vehicle_number = vehicle_number
+        self.telemetry = TelemetryAggregator()
+        self.laps = laps or LapTimeTracker(vehicle_number)
+
+    def add_telemetry(self, rows: pd.DataFrame):
+        """Append long-format telemetry rows for this driver"""
+        self.telemetry.update(rows)
+
+    def add_lap_times(self, lap_times):
+        """Append raw LAP_TIME values for this car"""
+        self.laps.add_lap_times(lap_times)
+
+    def metrics(self) -> dict:
+        """Current values, in the same shape as a race_metrics.csv row"""
+        driver_info = pd.DataFrame({'vehicle_id': [self.driver_id], 'vehicle_number': [self.vehicle_number]})
+        table = metrics_from_aggregates(driver_info, self.telemetry.aggregates(), self.laps.aggregates())
+        return table.iloc[0].to_dict()
+
+class LiveRaceMetrics:
+    """Live metrics for the whole field: routes appended rows to per-driver updaters"""
+
+    def __init__(self):
+        self.drivers = {}
+        self.laps = {}
+
+    def lap_tracker(self, vehicle_number: int) -> LapTimeTracker:
+        if vehicle_number not in self.laps:
+            self.laps[vehicle_number] = LapTimeTracker(vehicle_number)
+        return self.laps[vehicle_number]
+
+    def add_telemetry(self, rows: pd.DataFrame):
+        """Append long-format telemetry rows for any drivers"""
+        rows = rows[rows['vehicle_number'].notna()]
+        for (driver_id, vehicle_number), driver_rows in rows.groupby(['vehicle_id', 'vehicle_number'], sort=False, observed=True):
+            key = (driver_id, int(vehicle_number))
+            if key not in self.drivers:
+                self.drivers[key] = LiveDriverMetrics(driver_id, int(vehicle_number), self.lap_tracker(int(vehicle_number)))
+            self.drivers[key].add_telemetry(driver_rows)
+
+    def add_lap_times(self, lap_times_df: pd.DataFrame):
+        """Append rows of the lap-time file (NUMBER and ' LAP_TIME' columns)"""
+        for vehicle_number, car_laps in lap_times_df.groupby('NUMBER', sort=False):
+            self.lap_tracker(int(vehicle_number)).add_lap_times(car_laps[' LAP_TIME'])
+
+    def snapshot(self) -> pd.DataFrame:
+        """Current metrics for every driver seen so far"""
+        columns = ['driver_id', 'vehicle_number', 'tire_stress_index', 'attack_window',
+                   'fuel_conservation_mode', 'overtake_risk', 'ideal_pit_window']
+        return pd.DataFrame([driver.metrics() for driver in self.drivers.values()], columns=columns)
+
+    def write_csv(self, output_file: str = "race_metrics.csv"):
+        """Atomically rewrite race_metrics.csv so dashboard polls never see a partial file"""
+        tmp_file = f"{output_file}.tmp"
+        self.snapshot().to_csv(tmp_file, index=False)
+        os.replace(tmp_file, output_file)
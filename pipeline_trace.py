@@ -0,0 +1,175 @@
+"""
+Stage-level instrumentation for the telemetry pipelines
+Timers, row counts, drops by reason and memory high-water marks, written as a Chrome trace JSON
+(open in chrome://tracing, ui.perfetto.dev or speedscope). Every hook is a no-op while tracing is off.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENV = 'PITGPT_TRACE'
+
+# Worker processes inherit the environment, so they trace whenever the parent does
+_enabled = bool(os.environ.get(TRACE_ENV))
+_events = []
+_counts = defaultdict(int)
+_drops = defaultdict(int)
+_NULL_STAGE = nullcontext()
+
+def enabled() -> bool:
+    return _enabled
+
+def enable(output_file: str = None):
+    """
+    Turn tracing on for this process and its workers.
+    The trace is written to output_file (or $PITGPT_TRACE) when the process exits.
+    """
+    global _enabled
+    output_file = output_file or os.environ.get(TRACE_ENV)
+    if not output_file:
+        return
+    _enabled = True
+    os.environ[TRACE_ENV] = output_file
+    atexit.register(write_trace, output_file)
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+class _Stage:
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        _events.append({
+            'name': self.name, 'ph': 'X', 'ts': self.start, 'dur': _now_us() - self.start,
+            'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.args,
+        })
+        return False
+
+def stage(name: str, **args):
+    """Time a block as a named stage: `with stage('pivot', chunk=3): ...`"""
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, args)
+
+def traced_chunks(chunks, name: str = 'read'):
+    """Wrap a chunk iterator so time spent producing each chunk is recorded as a stage"""
+    if not _enabled:
+        return chunks
+    return _traced_chunks(iter(chunks), name)
+
+def _traced_chunks(chunks, name: str):
+    chunk_num = 0
+    while True:
+        with stage(name, chunk=chunk_num):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        count(f"{name}_rows", len(chunk))
+        yield chunk
+        chunk_num += 1
+
+def count(name: str, n: int = 1):
+    """Add to a named row/item counter"""
+    if _enabled:
+        _counts[name] += int(n)
+
+def drop(reason: str, n: int):
+    """Record n rows dropped for a reason"""
+    if _enabled and n:
+        _drops[reason] += int(n)
+
+def _rss_mb():
+    """(current RSS, peak RSS) in MB; current is None where /proc isn't available"""
+    current = None
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 2**20 if os.uname().sysname == 'Darwin' else peak / 1024
+    return current, peak
+
+def memory_mark(label: str = 'memory'):
+    """Record current and high-water RSS as a counter sample on the timeline"""
+    if not _enabled:
+        return
+    current, peak = _rss_mb()
+    values = {'peak_rss_mb': round(peak, 1)} if peak is not None else {}
+    if current is not None:
+        values['rss_mb'] = round(current, 1)
+    _events.append({'name': label, 'ph': 'C', 'ts': _now_us(), 'pid': os.getpid(), 'args': values})
+
+def _reset():
+    _events.clear()
+    _counts.clear()
+    _drops.clear()
+
+# Forked workers start with an empty trace instead of a copy of the parent's
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+def collect() -> dict:
+    """Take (and clear) this process's trace state, for shipping back from a worker"""
+    if not _enabled:
+        return None
+    memory_mark()
+    state = {'events': list(_events), 'counts': dict(_counts), 'drops': dict(_drops)}
+    _reset()
+    return state
+
+def absorb(state: dict):
+    """Merge trace state collected in a worker process"""
+    if not state:
+        return
+    _events.extend(state['events'])
+    for name, n in state['counts'].items():
+        _counts[name] += n
+    for reason, n in state['drops'].items():
+        _drops[reason] += n
+
+def summary() -> dict:
+    """Totals per stage, counters, drops and the highest RSS seen"""
+    stages = {}
+    peak = 0.0
+    for event in _events:
+        if event['ph'] == 'X':
+            totals = stages.setdefault(event['name'], {'calls': 0, 'total_ms': 0.0})
+            totals['calls'] += 1
+            totals['total_ms'] += event['dur'] / 1000
+        else:
+            peak = max(peak, event['args'].get('peak_rss_mb', 0))
+    for totals in stages.values():
+        totals['total_ms'] = round(totals['total_ms'], 3)
+    return {'stages': stages, 'counts': dict(_counts), 'drops': dict(_drops), 'peak_rss_mb': peak}
+
+def write_trace(output_file: str):
+    """Write the trace (Chrome trace event format) plus the summary"""
+    memory_mark()
+    report = summary()
+    with open(output_file, 'w') as f:
+        json.dump({'traceEvents': _events, 'displayTimeUnit': 'ms', 'otherData': report}, f)
+
+    print(f"\n🔍 Trace written to {output_file}")
+    for name, totals in sorted(report['stages'].items(), key=lambda item: -item[1]['total_ms']):
+        print(f"  {name:<20} {totals['total_ms'] / 1000:>9.2f}s  ({totals['calls']} calls)")
+    for reason, n in report['drops'].items():
+        print(f"  dropped {n:,} rows: {reason}")
@@ -26,8 +26,7 @@ export interface DriverMetrics {
 let cachedMetrics: DriverMetrics[] | null = null;
 
 /**
- * Load race metrics from CSV file
- * In production, this would fetch from an API endpoint
+ * Load race metrics from the strategy API (strategy_api.py), falling back to the static CSV file
  */
 export async function loadRaceMetrics(): Promise<DriverMetrics[]> {
   if (cachedMetrics) {
@@ -35,8 +34,12 @@ export async function loadRaceMetrics(): Promise<DriverMetrics[]> {
   }
 
   try {
-    // Fetch the CSV file (assuming it's served from the public directory)
-    const response = await fetch('/race_metrics.csv');
+    // API first; no-cache revalidates with the ETag, so unchanged polls are a 304
+    let response = await fetch('/api/metrics?format=csv', { cache: 'no-cache' }).catch(() => null);
+    if (!response?.ok || !response.headers.get('content-type')?.includes('text/csv')) {
+      // Fetch the CSV file (assuming it's served from the public directory)
+      response = await fetch('/race_metrics.csv', { cache: 'no-cache' });
+    }
     
     if (!response.ok) {
       console.warn('Could not load race_metrics.csv, using fallback');
@@ -150,3 +153,11 @@ export function clearMetricsCache(): void {
   cachedMetrics = null;
 }
 
+
+/**
+ * Re-fetch metrics during a live session (live_metrics.py rewrites race_metrics.csv as laps complete)
+ */
+export async function refreshRaceMetrics(): Promise<DriverMetrics[]> {
+  clearMetricsCache();
+  return loadRaceMetrics();
+}
@@ -59,8 +59,162 @@ async function loadWeatherData(): Promise<void> {
   }
 }
 
+// Binary frame files written by preprocess_telemetry.py (see frame_format.py)
+const FRAME_MAGIC = 'PGTF';
+const FRAME_FLAG_GZIP = 1;
+const FRAME_HEADER_SIZE = 12;
+const FRAME_COLUMNS: Array<[keyof ParsedTelemetryFrame, 'i8' | 'f4' | 'u2' | 'u1']> = [
+  ['timestamp', 'i8'],
+  ['throttle', 'f4'],
+  ['brake_f', 'f4'],
+  ['brake_r', 'f4'],
+  ['steering', 'f4'],
+  ['accx', 'f4'],
+  ['accy', 'f4'],
+  ['lap', 'u2'],
+  ['rpm', 'u2'],
+  ['gear', 'u1'],
+];
+const FRAME_COLUMN_SIZES = { i8: 8, f4: 4, u2: 2, u1: 1 };
+
+/**
+ * Decode a binary frame file (struct-of-arrays); returns null if it isn't one
+ */
+async function decodeBinaryFrames(buffer: ArrayBuffer): Promise<ParsedTelemetryFrame[] | null> {
+  if (buffer.byteLength < FRAME_HEADER_SIZE) return null;
+  const header = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== FRAME_MAGIC || header.getUint8(4) !== 1) return null;
+
+  const flags = header.getUint8(5);
+  const rows = header.getUint32(6, true);
+  const idLength = header.getUint16(10, true);
+  const vehicleId = new TextDecoder().decode(new Uint8Array(buffer, FRAME_HEADER_SIZE, idLength));
+  const bodyOffset = Math.ceil((FRAME_HEADER_SIZE + idLength) / 8) * 8;
+
+  let body = buffer.slice(bodyOffset);
+  if (flags & FRAME_FLAG_GZIP) {
+    const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream('gzip'));
+    body = await new Response(stream).arrayBuffer();
+  }
+
+  const view = new DataView(body);
+  const columns: Partial<Record<keyof ParsedTelemetryFrame, number[]>> = {};
+  let offset = 0;
+  for (const [name, type] of FRAME_COLUMNS) {
+    const values = new Array<number>(rows);
+    for (let i = 0; i < rows; i++) {
+      const at = offset + i * FRAME_COLUMN_SIZES[type];
+      if (type === 'i8') {
+        values[i] = view.getUint32(at, true) + view.getInt32(at + 4, true) * 2 ** 32;
+      } else if (type === 'f4') {
+        values[i] = view.getFloat32(at, true);
+      } else if (type === 'u2') {
+        values[i] = view.getUint16(at, true);
+      } else {
+        values[i] = view.getUint8(at);
+      }
+    }
+    columns[name] = values;
+    offset += rows * FRAME_COLUMN_SIZES[type];
+  }
+
+  const frames: ParsedTelemetryFrame[] = new Array(rows);
+  for (let i = 0; i < rows; i++) {
+    frames[i] = {
+      timestamp: columns.timestamp![i],
+      vehicle_id: vehicleId,
+      lap: columns.lap![i],
+      throttle: columns.throttle![i],
+      brake_f: columns.brake_f![i],
+      brake_r: columns.brake_r![i],
+      steering: columns.steering![i],
+      accx: columns.accx![i],
+      accy: columns.accy![i],
+      gear: columns.gear![i],
+      rpm: columns.rpm![i],
+    };
+  }
+  return frames;
+}
+
+/**
+ * Fetch a driver's binary frame file; null if missing (e.g. JSON-only deploys)
+ */
+async function fetchBinaryFrames(safeId: string): Promise<ParsedTelemetryFrame[] | null> {
+  try {
+    const response = await fetch(`/barber/telemetry/${safeId}_telemetry.bin`);
+    if (!response.ok) return null;
+    // SPA fallbacks serve index.html for missing files; the magic check rejects it
+    return await decodeBinaryFrames(await response.arrayBuffer());
+  } catch (error) {
+    console.warn(`Could not decode binary telemetry for ${safeId}:`, error);
+    return null;
+  }
+}
+
+// Frames per request when paging through the strategy API (strategy_api.py)
+const API_PAGE_SIZE = 5000;
+// Wait this long before retrying a page request that failed
+const API_PAGE_RETRY_MS = 2000;
+// Next API page offset per driver (null once everything is loaded)
+let nextPageOffsets: Map<string, number | null> = new Map();
+// Drivers with a page request in flight, and when a failed page may be retried
+let pageRequestsInFlight: Set<string> = new Set();
+let pageRetryAt: Map<string, number> = new Map();
+
+/**
+ * Fetch one page of a driver's frames from the strategy API; null if the API isn't running
+ */
+async function fetchApiFramePage(
+  vehicleId: string,
+  offset: number
+): Promise<{ frames: ParsedTelemetryFrame[]; nextOffset: number | null } | null> {
+  try {
+    const response = await fetch(
+      `/api/telemetry/${encodeURIComponent(vehicleId)}?format=binary&offset=${offset}&limit=${API_PAGE_SIZE}`
+    );
+    if (!response.ok) return null;
+    const frames = await decodeBinaryFrames(await response.arrayBuffer());
+    if (!frames) return null;
+    const nextOffset = response.headers.get('X-Next-Offset');
+    return { frames, nextOffset: nextOffset ? parseInt(nextOffset) : null };
+  } catch (error) {
+    return null;
+  }
+}
+
 /**
- * Load pre-processed telemetry JSON for a specific driver
+ * Append the next API page to a driver's cached frames; returns false when there's nothing more
+ */
+async function loadNextFramePage(vehicleId: string): Promise<boolean> {
+  const offset = nextPageOffsets.get(vehicleId);
+  const frames = telemetryCache.get(vehicleId);
+  if (offset == null || !frames || pageRequestsInFlight.has(vehicleId)) return false;
+  if (Date.now() < (pageRetryAt.get(vehicleId) ?? 0)) return false;
+
+  pageRequestsInFlight.add(vehicleId); // one request in flight per driver
+  try {
+    const page = await fetchApiFramePage(vehicleId, offset);
+    if (!page) {
+      // Keep the offset so the stream asks for the same page again after a short wait
+      pageRetryAt.set(vehicleId, Date.now() + API_PAGE_RETRY_MS);
+      return false;
+    }
+    for (const frame of page.frames) {
+      frames.push({ ...frame, speed: frame.speed || calculateSpeedFromAccel(frame.accx) });
+    }
+    nextPageOffsets.set(vehicleId, page.nextOffset);
+    pageRetryAt.delete(vehicleId);
+    return true;
+  } finally {
+    pageRequestsInFlight.delete(vehicleId);
+  }
+}
+
+/**
+ * Load pre-processed telemetry for a specific driver: the first API page when the strategy API
+ * is running, else the whole binary frame file, falling back to JSON
  */
 async function loadTelemetryForDriver(vehicleId: string): Promise<ParsedTelemetryFrame[]> {
   if (telemetryCache.has(vehicleId)) {
@@ -68,26 +222,32 @@ async function loadTelemetryForDriver(vehicleId: string): Promise<ParsedTelemetr
   }
 
   try {
-    // Load from pre-processed JSON file
     const safeId = vehicleId.replace('/', '_').replace('\\', '_');
-    const response = await fetch(`/barber/telemetry/${safeId}_telemetry.json`);
-    
-    if (!response.ok) {
-      console.warn(`Telemetry file not found for ${vehicleId} (${response.status}). This is OK - will use calculated values.`);
-      return [];
-    }
-
-    // Check if response is actually JSON (not HTML error page)
-    const contentType = response.headers.get('content-type');
-    if (!contentType || !contentType.includes('application/json')) {
-      const text = await response.text();
-      if (text.trim().startsWith('<!DOCTYPE')) {
-        console.warn(`Got HTML response instead of JSON for ${vehicleId}. File may not exist yet.`);
+    const page = await fetchApiFramePage(vehicleId, 0);
+    nextPageOffsets.set(vehicleId, page ? page.nextOffset : null);
+    let frames = page ? page.frames : await fetchBinaryFrames(safeId);
+
+    if (!frames) {
+      // Load from pre-processed JSON file
+      const response = await fetch(`/barber/telemetry/${safeId}_telemetry.json`);
+      
+      if (!response.ok) {
+        console.warn(`Telemetry file not found for ${vehicleId} (${response.status}). This is OK - will use calculated values.`);
         return [];
       }
-    }
 
-    const frames: ParsedTelemetryFrame[] = await response.json();
+      // Check if response is actually JSON (not HTML error page)
+      const contentType = response.headers.get('content-type');
+      if (!contentType || !contentType.includes('application/json')) {
+        const text = await response.text();
+        if (text.trim().startsWith('<!DOCTYPE')) {
+          console.warn(`Got HTML response instead of JSON for ${vehicleId}. File may not exist yet.`);
+          return [];
+        }
+      }
+
+      frames = await response.json();
+    }
     
     if (!Array.isArray(frames) || frames.length === 0) {
       console.warn(`Empty or invalid telemetry data for ${vehicleId}`);
@@ -254,8 +414,16 @@ export class RealTelemetryStreamer {
       return null;
     }
 
-    // If we have real frames, use them
-    if (this.frames.length > 0) {
+    if (this.frames.length === 0) {
+      // Fallback: No real data available, return null
+      // App.tsx will handle gracefully
+      return null;
+    }
+
+    if (this.currentIndex >= this.frames.length - API_PAGE_SIZE / 2) {
+      // Fetch the next API page well before the stream reaches it (no-op without the API)
+      void loadNextFramePage(this.vehicleId);
+    }
 
     if (this.currentIndex >= this.frames.length) {
       // Loop back to beginning for continuous streaming
@@ -349,11 +517,6 @@ export class RealTelemetryStreamer {
 
     this.currentIndex++;
     return telemetryPoint;
-    } else {
-      // Fallback: No real data available, return null
-      // App.tsx will handle gracefully
-      return null;
-    }
   }
 
   /**
@@ -8,6 +8,8 @@ export default defineConfig(({ mode }) => {
       server: {
         port: 3000,
         host: '0.0.0.0',
+        // Forward /api to strategy_api.py when PITGPT_API_URL is set (e.g. http://127.0.0.1:8765)
+        proxy: env.PITGPT_API_URL ? { '/api': env.PITGPT_API_URL } : undefined,
       },
       plugins: [react()],
       define: {
@@ -1,24 +1,190 @@
 """
-Pre-process large telemetry CSV into smaller JSON files per driver
+Pre-process large telemetry CSV into smaller per-driver frame files (binary or JSON)
 This makes it fast to load in the browser
 """
 
+import argparse
 import pandas as pd
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from frame_format import encode_frames
+from lap_table import LapTable
+from pipeline_trace import (absorb, collect, count, drop, enable as enable_trace, enabled as tracing_enabled,
+                            memory_mark, stage, traced_chunks)
+from telemetry_cache import ensure_cache, iter_telemetry_chunks, open_vehicle_rows, shard_spans, vehicle_row_index
+from telemetry_pyramid import encode_driver_pyramid
+from telemetry_timestamps import TimestampDecoder
 
-def parse_time_str(time_str):
-    """Parse MM:SS.mmm format to seconds"""
-    if pd.isna(time_str) or time_str == '':
-        return None
-    parts = str(time_str).split(':')
-    if len(parts) == 2:
-        return float(parts[0]) * 60 + float(parts[1])
-    return None
+# telemetry_name -> frame field
+TELEMETRY_FIELDS = {
+    'aps': 'throttle',
+    'pbrake_f': 'brake_f',
+    'pbrake_r': 'brake_r',
+    'Steering_Angle': 'steering',
+    'accx_can': 'accx',
+    'accy_can': 'accy',
+    'gear': 'gear',
+    'nmot': 'rpm',
+}
+FRAME_FIELDS = ['throttle', 'brake_f', 'brake_r', 'steering', 'accx', 'accy', 'gear', 'rpm']
+INT_FIELDS = ['gear', 'rpm']
 
-def preprocess_telemetry(input_csv: str, output_dir: str):
-    """Pre-process telemetry CSV into per-driver JSON files"""
+def pivot_chunk(chunk: pd.DataFrame, decoder: TimestampDecoder = None) -> pd.DataFrame:
+    """
+    Pivot a chunk of long-format telemetry rows into wide frames.
+    One row per (vehicle_id, timestamp); channels not seen in the chunk are NaN.
+    """
+    if decoder is None:
+        decoder = TimestampDecoder()
+
+    with stage('parse_timestamps', rows=len(chunk)):
+        timestamps, valid_timestamps = decoder.decode(chunk['timestamp'])
+
+    with stage('pivot', rows=len(chunk)):
+        return _pivot_rows(chunk, timestamps, valid_timestamps)
+
+def _pivot_rows(chunk: pd.DataFrame, timestamps, valid_timestamps) -> pd.DataFrame:
+    """pivot_chunk once the timestamps are decoded"""
+    vehicle_id = chunk['vehicle_id'].astype(str).str.strip()
+    has_vehicle = chunk['vehicle_id'].notna() & (vehicle_id != '')
+    valid = has_vehicle & valid_timestamps
+
+    long_df = pd.DataFrame({
+        'vehicle_id': vehicle_id,
+        'timestamp': timestamps,
+        'lap': pd.to_numeric(chunk['lap'], errors='coerce').fillna(0).astype('int64'),
+        'field': chunk['telemetry_name'].astype(str).str.strip().map(TELEMETRY_FIELDS),
+        'value': pd.to_numeric(chunk['telemetry_value'], errors='coerce').fillna(0.0),
+    })
+    long_df = long_df[valid]
+    if tracing_enabled():
+        drop('missing_vehicle_id', (~has_vehicle).sum())
+        drop('bad_timestamp', (has_vehicle & ~valid_timestamps).sum())
+        drop('unmapped_channel', long_df['field'].isna().sum())
+
+    # Every valid row opens a frame (even unmapped channels); its first row sets the lap
+    frames = long_df.drop_duplicates(['vehicle_id', 'timestamp'])[['vehicle_id', 'timestamp', 'lap']]
+
+    # Later samples for the same channel overwrite earlier ones
+    channels = (long_df.dropna(subset=['field'])
+                .groupby(['vehicle_id', 'timestamp', 'field'], sort=False)['value'].last()
+                .unstack('field'))
+    channels = channels.reindex(columns=FRAME_FIELDS)
+
+    return frames.join(channels, on=['vehicle_id', 'timestamp'])
+
+def merge_frames(pivots: list) -> pd.DataFrame:
+    """Combine per-chunk pivots into final frames with clamping applied"""
+    if not pivots:
+        return pd.DataFrame(columns=['vehicle_id', 'timestamp', 'lap'] + FRAME_FIELDS)
+
+    with stage('merge', pivots=len(pivots)):
+        combined = pd.concat(pivots, ignore_index=True)
+        aggregations = {'lap': 'first'}
+        aggregations.update({field: 'last' for field in FRAME_FIELDS})
+        frames = combined.groupby(['vehicle_id', 'timestamp'], sort=False).agg(aggregations).reset_index()
+
+        frames[FRAME_FIELDS] = frames[FRAME_FIELDS].fillna(0.0)
+        frames['throttle'] = frames['throttle'].clip(0, 100)
+        frames['steering'] = frames['steering'].abs()
+        frames['accy'] = frames['accy'].abs()
+        for field in INT_FIELDS:
+            frames[field] = frames[field].astype('int64')
+
+    with stage('sort', frames=len(frames)):
+        return frames.sort_values(['vehicle_id', 'timestamp'], kind='stable').reset_index(drop=True)
+
+def frames_to_records(vehicle_frames: pd.DataFrame) -> list:
+    """
+    Convert one vehicle's frames into the JSON frame dicts the dashboard loads.
+    Same values as the old row loop, but channels are always floats (0.0 where it wrote 0); gear and rpm stay ints.
+    """
+    columns = ['timestamp', 'vehicle_id', 'lap'] + FRAME_FIELDS
+    return vehicle_frames[columns].to_dict('records')
+
+def encode_driver_frames(vehicle_id: str, vehicle_frames: pd.DataFrame, output_format: str = 'binary',
+                         compress: bool = True) -> tuple:
+    """One driver's frame file in memory; returns (file name, file bytes, uncompressed size)"""
+    # Clean vehicle_id for filename
+    safe_id = vehicle_id.replace('/', '_').replace('\\', '_')
+    
+    with stage('serialize', vehicle_id=vehicle_id):
+        if output_format == 'json':
+            data = json.dumps(frames_to_records(vehicle_frames), indent=2).encode('utf-8')
+            return f"{safe_id}_telemetry.json", data, len(data)
+        data, raw_size = encode_frames(vehicle_frames, vehicle_id, compress)
+        return f"{safe_id}_telemetry.bin", data, raw_size
+
+def write_driver_frames(vehicle_id: str, vehicle_frames: pd.DataFrame, output_path: Path,
+                        output_format: str = 'binary', compress: bool = True) -> int:
+    """Save one driver's frames as a binary frame file or JSON, plus its chart pyramid; returns frame bytes written"""
+    print(f"Saving {len(vehicle_frames)} frames for {vehicle_id}...")
+    
+    count('frames_written', len(vehicle_frames))
+    file_name, data, raw_size = encode_driver_frames(vehicle_id, vehicle_frames, output_format, compress)
+    output_file = output_path / file_name
+    with stage('pyramid', vehicle_id=vehicle_id):
+        pyramid_name, pyramid_data = encode_driver_pyramid(vehicle_id, vehicle_frames, compress)
+    with stage('write', vehicle_id=vehicle_id):
+        with open(output_file, 'wb') as f:
+            f.write(data)
+        with open(output_path / pyramid_name, 'wb') as f:
+            f.write(pyramid_data)
+    
+    if output_format == 'json':
+        print(f"✓ Saved to {output_file} ({len(data):,} bytes)")
+    else:
+        print(f"✓ Saved to {output_file} ({len(data):,} bytes, {raw_size / len(data):.1f}x compression)")
+    
+    return len(data)
+
+def preprocess_vehicle_shard(cache_dir, spans: list, output_dir: str, output_format: str, compress: bool):
+    """Worker: pivot and save a few vehicles, reading their rows from the memory-mapped cache"""
+    decoder = TimestampDecoder()
+    drivers, total_bytes = 0, 0
+    for vehicle_id, start, stop in spans:
+        frames = merge_frames([pivot_chunk(open_vehicle_rows(cache_dir, start, stop), decoder)])
+        for frame_vehicle_id, vehicle_frames in frames.groupby('vehicle_id', sort=False):
+            total_bytes += write_driver_frames(frame_vehicle_id, vehicle_frames, Path(output_dir), output_format, compress)
+            drivers += 1
+        memory_mark()
+    return drivers, total_bytes, decoder.rows, decoder.cached_empty, collect()
+
+def preprocess_telemetry_parallel(input_csv: str, output_dir: str, workers: int,
+                                  output_format: str = 'binary', compress: bool = True):
+    """
+    Pre-process with one process per shard of vehicles.
+    Each worker memory-maps only its own vehicles' rows from the telemetry cache.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    cache_dir = ensure_cache(input_csv)
+    _, spans = vehicle_row_index(cache_dir)
+    shards = shard_spans(spans, workers)
+    print(f"Processing {len(spans)} drivers in {len(shards)} worker shards...")
+    
+    drivers, total_bytes, rows, missing = 0, 0, 0, 0
+    with ProcessPoolExecutor(max_workers=len(shards) or 1) as pool:
+        jobs = [pool.submit(preprocess_vehicle_shard, cache_dir, shard, output_dir, output_format, compress)
+                for shard in shards]
+        for job in jobs:
+            shard_drivers, shard_bytes, shard_rows, shard_missing, shard_trace = job.result()
+            absorb(shard_trace)
+            drivers += shard_drivers
+            total_bytes += shard_bytes
+            rows += shard_rows
+            missing += shard_missing
+    
+    if missing:
+        print(f"⚠️  Skipped {missing} of {rows} rows with missing or unparseable timestamps")
+    print(f"\n✅ Pre-processing complete! Saved {drivers} driver files ({total_bytes:,} bytes) to {output_dir}")
+
+def preprocess_telemetry(input_csv: str, output_dir: str, chunk_size: int = 100000,
+                         output_format: str = 'binary', compress: bool = True):
+    """Pre-process telemetry CSV into per-driver frame files (binary, or JSON with output_format='json')"""
     
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -27,122 +193,33 @@ def preprocess_telemetry(input_csv: str, output_dir: str):
     print("This may take a minute for large files...")
     
     # Read in chunks to handle large files
-    chunk_size = 100000
-    all_frames = {}
+    pivots = []
+    decoder = TimestampDecoder()
     
-    for chunk_num, chunk in enumerate(pd.read_csv(input_csv, chunksize=chunk_size)):
+    for chunk_num, chunk in enumerate(traced_chunks(iter_telemetry_chunks(input_csv, chunk_size))):
         print(f"Processing chunk {chunk_num + 1}...")
-        
-        # Filter and process chunk
-        for _, row in chunk.iterrows():
-            vehicle_id = str(row.get('vehicle_id', '')).strip()
-            if not vehicle_id or pd.isna(vehicle_id):
-                continue
-            
-            timestamp_str = str(row.get('timestamp', ''))
-            if pd.isna(timestamp_str) or timestamp_str == '':
-                continue
-            
-            # Parse timestamp
-            try:
-                from dateutil import parser as date_parser
-                timestamp = int(date_parser.parse(timestamp_str).timestamp() * 1000)
-            except:
-                continue
-            
-            lap = int(row.get('lap', 0)) if pd.notna(row.get('lap')) else 0
-            telemetry_name = str(row.get('telemetry_name', '')).strip()
-            telemetry_value = row.get('telemetry_value', 0)
-            
-            # Initialize driver if needed
-            if vehicle_id not in all_frames:
-                all_frames[vehicle_id] = {}
-            
-            # Group by timestamp
-            timestamp_key = str(timestamp)
-            if timestamp_key not in all_frames[vehicle_id]:
-                all_frames[vehicle_id][timestamp_key] = {
-                    'timestamp': timestamp,
-                    'vehicle_id': vehicle_id,
-                    'lap': lap,
-                    'throttle': 0,
-                    'brake_f': 0,
-                    'brake_r': 0,
-                    'steering': 0,
-                    'accx': 0,
-                    'accy': 0,
-                    'gear': 0,
-                    'rpm': 0
-                }
-            
-            frame = all_frames[vehicle_id][timestamp_key]
-            value = float(telemetry_value) if pd.notna(telemetry_value) else 0
-            
-            # Map telemetry fields
-            if telemetry_name == 'aps':
-                frame['throttle'] = min(100, max(0, value))
-            elif telemetry_name == 'pbrake_f':
-                frame['brake_f'] = value
-            elif telemetry_name == 'pbrake_r':
-                frame['brake_r'] = value
-            elif telemetry_name == 'Steering_Angle':
-                frame['steering'] = abs(value)
-            elif telemetry_name == 'accx_can':
-                frame['accx'] = value
-            elif telemetry_name == 'accy_can':
-                frame['accy'] = abs(value)
-            elif telemetry_name == 'gear':
-                frame['gear'] = int(value) if pd.notna(value) else 0
-            elif telemetry_name == 'nmot':
-                frame['rpm'] = int(value) if pd.notna(value) else 0
-    
-    print(f"\nProcessed {len(all_frames)} drivers")
-    
-    # Convert to arrays and save per driver
-    for vehicle_id, frames_dict in all_frames.items():
-        # Convert dict to sorted array
-        frames = list(frames_dict.values())
-        frames.sort(key=lambda x: x['timestamp'])
-        
-        # Clean vehicle_id for filename
-        safe_id = vehicle_id.replace('/', '_').replace('\\', '_')
-        output_file = output_path / f"{safe_id}_telemetry.json"
-        
-        print(f"Saving {len(frames)} frames for {vehicle_id}...")
-        
-        with open(output_file, 'w') as f:
-            json.dump(frames, f, indent=2)
-        
-        print(f"✓ Saved to {output_file}")
-    
-    print(f"\n✅ Pre-processing complete! Saved {len(all_frames)} driver files to {output_dir}")
+        pivots.append(pivot_chunk(chunk, decoder))
+        memory_mark()
+    
+    decoder.report()
+    all_frames = merge_frames(pivots)
+    vehicle_ids = all_frames['vehicle_id'].unique()
+    
+    print(f"\nProcessed {len(vehicle_ids)} drivers")
+    
+    # Save per driver (frames are already sorted by timestamp)
+    total_bytes = 0
+    for vehicle_id, vehicle_frames in all_frames.groupby('vehicle_id', sort=False):
+        total_bytes += write_driver_frames(vehicle_id, vehicle_frames, output_path, output_format, compress)
+    
+    print(f"\n✅ Pre-processing complete! Saved {len(vehicle_ids)} driver files ({total_bytes:,} bytes) to {output_dir}")
 
 def preprocess_lap_times(input_csv: str, output_file: str):
     """Pre-process lap times CSV into JSON"""
     
     print(f"\nLoading lap times: {input_csv}...")
     
-    df = pd.read_csv(input_csv, sep=';')
-    
-    lap_times_by_driver = {}
-    
-    for _, row in df.iterrows():
-        driver_num = int(row.get('NUMBER', 0)) if pd.notna(row.get('NUMBER')) else 0
-        if driver_num == 0:
-            continue
-        
-        lap_time_str = str(row.get(' LAP_TIME', ''))
-        if pd.isna(lap_time_str) or lap_time_str == '':
-            continue
-        
-        lap_time_seconds = parse_time_str(lap_time_str)
-        if lap_time_seconds is None:
-            continue
-        
-        if driver_num not in lap_times_by_driver:
-            lap_times_by_driver[driver_num] = []
-        
-        lap_times_by_driver[driver_num].append(lap_time_seconds)
+    lap_times_by_driver = LapTable.from_csv(input_csv).by_car()
     
     # Save to JSON
     with open(output_file, 'w') as f:
@@ -151,17 +228,36 @@ def preprocess_lap_times(input_csv: str, output_file: str):
     print(f"✓ Saved lap times for {len(lap_times_by_driver)} drivers to {output_file}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-process telemetry into per-driver frame files")
+    parser.add_argument("--format", choices=["binary", "json"], default="binary",
+                        help="binary frame files (default) or the legacy indented JSON")
+    parser.add_argument("--no-compress", action="store_true", help="Write binary frame files without gzip")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Pivot and save drivers in parallel across N worker processes")
+    parser.add_argument("--trace", help="Write a stage timing trace (Chrome trace JSON) to this file")
+    parser.add_argument("--telemetry-csv", default="barber/R1_barber_telemetry_data.csv")
+    parser.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    parser.add_argument("--output-dir", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber",
+                        help="Frame files go to <output-dir>/telemetry, lap times to <output-dir>/lap_times.json")
+    args = parser.parse_args()
+    enable_trace(args.trace)
+    
     # Input files
-    telemetry_csv = "barber/R1_barber_telemetry_data.csv"
-    lap_times_csv = "barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV"
+    telemetry_csv = args.telemetry_csv
+    lap_times_csv = args.lap_times_csv
     
     # Output directories
-    telemetry_output = "pitgpt---toyota-gr-cup-ai-engineer/public/barber/telemetry"
-    lap_times_output = "pitgpt---toyota-gr-cup-ai-engineer/public/barber/lap_times.json"
+    telemetry_output = f"{args.output_dir}/telemetry"
+    lap_times_output = f"{args.output_dir}/lap_times.json"
     
     # Pre-process telemetry
     if os.path.exists(telemetry_csv):
-        preprocess_telemetry(telemetry_csv, telemetry_output)
+        if args.workers > 1:
+            preprocess_telemetry_parallel(telemetry_csv, telemetry_output, args.workers,
+                                          output_format=args.format, compress=not args.no_compress)
+        else:
+            preprocess_telemetry(telemetry_csv, telemetry_output,
+                                 output_format=args.format, compress=not args.no_compress)
     else:
         print(f"⚠️  Telemetry CSV not found: {telemetry_csv}")
     
@@ -1,131 +1,125 @@
 """
-QUICK: Sample telemetry data for just a few drivers
-Much faster than processing entire dataset
+QUICK: Sample telemetry data for a few drivers
+Reservoir, per-lap or time-decimated sampling in a single bounded pass
 """
 
+import argparse
 import pandas as pd
 import json
 from pathlib import Path
+from lap_table import LapTable
+from pipeline_trace import enable as enable_trace, memory_mark, stage, traced_chunks
+from preprocess_telemetry import merge_frames, pivot_chunk, write_driver_frames
+from telemetry_cache import iter_telemetry_chunks
+from telemetry_timestamps import TimestampDecoder
 
-# Only process these drivers (faster)
+# Default demo drivers (None = every driver in the file)
 SAMPLE_DRIVERS = ['GR86-022-13', 'GR86-060-2', 'GR86-047-21', 'GR86-065-5']
-SAMPLE_SIZE = 5000  # Only first 5000 rows per driver
+SAMPLE_MODES = ['reservoir', 'lap', 'decimate']
+SAMPLE_SIZE = 2000     # reservoir: frames kept per driver
+FRAMES_PER_LAP = 100   # lap: frames kept per driver per lap
+SAMPLE_HZ = 10         # decimate: target rate per driver
 
-def quick_sample_telemetry(input_csv: str, output_dir: str):
-    """Quickly sample telemetry for demo drivers only"""
+def select_frames(candidates: pd.DataFrame, mode: str, budget: int, hz: float, hash_key: str) -> pd.DataFrame:
+    """
+    Keep the sampled frames among candidates (partial frames from pivot_chunk).
+    Selection depends only on each (vehicle_id, timestamp) key, so re-running it on
+    kept + new rows after every chunk gives one consistent single-pass sample, and a
+    frame split across chunks is kept or dropped as a whole.
+    """
+    keys = candidates[['vehicle_id', 'timestamp', 'lap']].drop_duplicates(['vehicle_id', 'timestamp'])
+
+    if mode == 'decimate':
+        # Earliest frame in each 1/hz bucket
+        keys = keys.assign(bucket=keys['timestamp'] // int(1000 / hz))
+        keys = keys.sort_values('timestamp', kind='stable').drop_duplicates(['vehicle_id', 'bucket'])
+    else:
+        # Bottom-k by a hash of the key = uniform sample without replacement (per driver, or per driver-lap)
+        groups = ['vehicle_id'] if mode == 'reservoir' else ['vehicle_id', 'lap']
+        priority = pd.util.hash_pandas_object(keys[['vehicle_id', 'timestamp']], index=False, hash_key=hash_key)
+        keys = keys.assign(priority=priority.to_numpy()).sort_values('priority', kind='stable')
+        keys = keys[keys.groupby(groups, sort=False).cumcount() < budget]
+
+    return candidates.merge(keys[['vehicle_id', 'timestamp']], on=['vehicle_id', 'timestamp'])
+
+def quick_sample_telemetry(input_csv: str, output_dir: str, drivers: list = SAMPLE_DRIVERS,
+                           mode: str = 'reservoir', budget: int = None, hz: float = SAMPLE_HZ,
+                           max_rows: int = None, seed: int = 0, output_format: str = 'binary',
+                           chunk_size: int = 50000):
+    """
+    Sample telemetry frames for demo drivers in one pass with bounded memory.
+    mode: 'reservoir' (budget frames per driver), 'lap' (budget frames per lap) or 'decimate' (hz per driver).
+    max_rows optionally caps how many CSV rows are read.
+    """
+    if mode not in SAMPLE_MODES:
+        raise ValueError(f"Unknown sampling mode: {mode}")
+    if budget is None:
+        budget = FRAMES_PER_LAP if mode == 'lap' else SAMPLE_SIZE
     
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    print(f"Quick sampling telemetry for {len(SAMPLE_DRIVERS)} drivers...")
+    driver_label = 'all' if drivers is None else len(drivers)
+    print(f"Quick sampling telemetry for {driver_label} drivers ({mode})...")
     
-    # Read only first chunk to find our drivers
-    chunk_size = 50000
-    frames_by_driver = {driver: {} for driver in SAMPLE_DRIVERS}
+    # Stream chunks (from the binary cache if it's warm)
     rows_processed = 0
+    kept = None
+    decoder = TimestampDecoder()
+    hash_key = f"{seed:016d}"[-16:]
     
-    for chunk in pd.read_csv(input_csv, chunksize=chunk_size):
-        for _, row in chunk.iterrows():
-            rows_processed += 1
-            if rows_processed > SAMPLE_SIZE * len(SAMPLE_DRIVERS):
-                break
-            
-            vehicle_id = str(row.get('vehicle_id', '')).strip()
-            if vehicle_id not in SAMPLE_DRIVERS:
-                continue
-            
-            timestamp_str = str(row.get('timestamp', ''))
-            if pd.isna(timestamp_str) or timestamp_str == '':
-                continue
-            
-            try:
-                from dateutil import parser as date_parser
-                timestamp = int(date_parser.parse(timestamp_str).timestamp() * 1000)
-            except:
-                continue
-            
-            lap = int(row.get('lap', 0)) if pd.notna(row.get('lap')) else 0
-            telemetry_name = str(row.get('telemetry_name', '')).strip()
-            telemetry_value = row.get('telemetry_value', 0)
-            
-            timestamp_key = str(timestamp)
-            if timestamp_key not in frames_by_driver[vehicle_id]:
-                frames_by_driver[vehicle_id][timestamp_key] = {
-                    'timestamp': timestamp,
-                    'vehicle_id': vehicle_id,
-                    'lap': lap,
-                    'throttle': 0, 'brake_f': 0, 'brake_r': 0,
-                    'steering': 0, 'accx': 0, 'accy': 0, 'gear': 0, 'rpm': 0
-                }
-            
-            frame = frames_by_driver[vehicle_id][timestamp_key]
-            value = float(telemetry_value) if pd.notna(telemetry_value) else 0
-            
-            if telemetry_name == 'aps':
-                frame['throttle'] = min(100, max(0, value))
-            elif telemetry_name == 'pbrake_f':
-                frame['brake_f'] = value
-            elif telemetry_name == 'pbrake_r':
-                frame['brake_r'] = value
-            elif telemetry_name == 'Steering_Angle':
-                frame['steering'] = abs(value)
-            elif telemetry_name == 'accx_can':
-                frame['accx'] = value
-            elif telemetry_name == 'accy_can':
-                frame['accy'] = abs(value)
-            elif telemetry_name == 'gear':
-                frame['gear'] = int(value) if pd.notna(value) else 0
-            elif telemetry_name == 'nmot':
-                frame['rpm'] = int(value) if pd.notna(value) else 0
+    for chunk in traced_chunks(iter_telemetry_chunks(input_csv, chunk_size, build_cache=False)):
+        if max_rows is not None:
+            chunk = chunk.iloc[:max_rows - rows_processed]
+        rows_processed += len(chunk)
         
-        if rows_processed > SAMPLE_SIZE * len(SAMPLE_DRIVERS):
+        if drivers is not None:
+            chunk = chunk[chunk['vehicle_id'].astype(str).str.strip().isin(drivers)]
+        candidates = pivot_chunk(chunk, decoder)
+        if kept is not None:
+            candidates = pd.concat([kept, candidates], ignore_index=True)
+        with stage('select', rows=len(candidates)):
+            kept = select_frames(candidates, mode, budget, hz, hash_key)
+        memory_mark()
+        
+        if max_rows is not None and rows_processed >= max_rows:
             break
     
+    decoder.report()
+    print(f"Read {rows_processed} rows")
+    
     # Save files
-    for vehicle_id, frames_dict in frames_by_driver.items():
-        frames = list(frames_dict.values())
-        frames.sort(key=lambda x: x['timestamp'])
-        
-        safe_id = vehicle_id.replace('/', '_').replace('\\', '_')
-        output_file = output_path / f"{safe_id}_telemetry.json"
-        
-        print(f"Saving {len(frames)} frames for {vehicle_id}...")
-        with open(output_file, 'w') as f:
-            json.dump(frames[:2000], f)  # Limit to 2000 frames
-        print(f"✓ {output_file}")
+    frames = merge_frames([kept] if kept is not None else [])
+    for vehicle_id, vehicle_frames in frames.groupby('vehicle_id', sort=False):
+        write_driver_frames(vehicle_id, vehicle_frames, output_path, output_format)
 
 def quick_lap_times(input_csv: str, output_file: str):
     """Quick lap times extraction"""
     print(f"\nLoading lap times...")
-    df = pd.read_csv(input_csv, sep=';', nrows=500)
-    
-    lap_times_by_driver = {}
-    for _, row in df.iterrows():
-        driver_num = int(row.get('NUMBER', 0)) if pd.notna(row.get('NUMBER')) else 0
-        if driver_num == 0:
-            continue
-        
-        lap_time_str = str(row.get(' LAP_TIME', ''))
-        if pd.isna(lap_time_str) or lap_time_str == '':
-            continue
-        
-        time_parts = lap_time_str.split(':')
-        if len(time_parts) == 2:
-            minutes = int(time_parts[0])
-            seconds = float(time_parts[1])
-            total_seconds = minutes * 60 + seconds
-            
-            if driver_num not in lap_times_by_driver:
-                lap_times_by_driver[driver_num] = []
-            lap_times_by_driver[driver_num].append(total_seconds)
+    lap_times_by_driver = LapTable.from_csv(input_csv, nrows=500).by_car()
     
     with open(output_file, 'w') as f:
         json.dump(lap_times_by_driver, f)
     print(f"✓ {output_file}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sample telemetry frames for the demo")
+    parser.add_argument("--drivers", nargs="*", default=SAMPLE_DRIVERS,
+                        help="vehicle_ids to sample (pass with no values for all drivers)")
+    parser.add_argument("--mode", choices=SAMPLE_MODES, default="reservoir")
+    parser.add_argument("--budget", type=int, help="Frames per driver (reservoir) or per lap (lap)")
+    parser.add_argument("--hz", type=float, default=SAMPLE_HZ, help="Target rate for decimate mode")
+    parser.add_argument("--max-rows", type=int, help="Stop after reading this many CSV rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["binary", "json"], default="binary")
+    parser.add_argument("--trace", help="Write a stage timing trace (Chrome trace JSON) to this file")
+    args = parser.parse_args()
+    enable_trace(args.trace)
+    
     telemetry_output = "pitgpt---toyota-gr-cup-ai-engineer/public/barber/telemetry"
-    quick_sample_telemetry("barber/R1_barber_telemetry_data.csv", telemetry_output)
+    quick_sample_telemetry("barber/R1_barber_telemetry_data.csv", telemetry_output,
+                           drivers=args.drivers or None, mode=args.mode, budget=args.budget, hz=args.hz,
+                           max_rows=args.max_rows, seed=args.seed, output_format=args.format)
     quick_lap_times("barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV", 
                     "pitgpt---toyota-gr-cup-ai-engineer/public/barber/lap_times.json")
     print("\n✅ Quick sampling complete!")
@@ -0,0 +1,296 @@
+"""
+PitGPT - Live telemetry replay server
+Pushes every car's frames over Server-Sent Events or WebSocket at real time or N× speed.
+Each tick's batch is encoded once and fanned out to all subscribers; slow clients skip ticks instead of queueing.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from preprocess_telemetry import merge_frames, pivot_chunk
+from strategy_api import ApiError, encode_response, read_request
+from telemetry_cache import iter_telemetry_chunks
+from telemetry_store import TelemetryStore
+from telemetry_timestamps import TimestampDecoder
+
+REPLAY_COLUMNS = ['timestamp', 'lap', 'throttle', 'brake_f', 'brake_r', 'steering', 'accx', 'accy', 'gear', 'rpm']
+TICK_MS = 100               # wall-clock batch interval
+HIGH_WATER_BYTES = 256 * 1024  # a client with more than this unsent is skipped for the tick
+MAX_SPEED = 1000
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+class ReplayTimeline:
+    """All cars' frames merged into one timestamp-sorted array, sliced per tick with searchsorted"""
+
+    def __init__(self, frames: pd.DataFrame):
+        frames = frames.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        codes, self.vehicles = pd.factorize(frames['vehicle_id'].astype(str), sort=True)
+        self.vehicles = list(self.vehicles)
+        self.codes = codes
+        self.timestamps = frames['timestamp'].to_numpy(dtype='int64')
+        self.values = frames[REPLAY_COLUMNS].to_numpy(dtype='float64').round(3)
+        self.start = int(self.timestamps[0]) if len(frames) else 0
+        self.end = int(self.timestamps[-1]) + 1 if len(frames) else 0
+
+    @classmethod
+    def from_store(cls, frames_dir: str) -> 'ReplayTimeline':
+        store = TelemetryStore(frames_dir)
+        frames = [store.frames(vehicle_id) for vehicle_id in store.vehicles()]
+        return cls(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['vehicle_id'] + REPLAY_COLUMNS))
+
+    @classmethod
+    def from_csv(cls, telemetry_csv: str, chunk_size: int = 1000000) -> 'ReplayTimeline':
+        decoder = TimestampDecoder()
+        pivots = [pivot_chunk(chunk, decoder) for chunk in iter_telemetry_chunks(telemetry_csv, chunk_size)]
+        decoder.report()
+        return cls(merge_frames(pivots))
+
+    def batch(self, start_ms: int, end_ms: int, vehicle_codes: np.ndarray = None) -> dict:
+        """Frames with start_ms <= timestamp < end_ms, grouped by vehicle as row lists"""
+        first = np.searchsorted(self.timestamps, start_ms, side='left')
+        last = np.searchsorted(self.timestamps, end_ms, side='left')
+        codes = self.codes[first:last]
+        rows = self.values[first:last]
+        if vehicle_codes is not None:
+            keep = np.isin(codes, vehicle_codes)
+            codes, rows = codes[keep], rows[keep]
+
+        batch = {}
+        for code, row in zip(codes.tolist(), rows.tolist()):
+            batch.setdefault(self.vehicles[code], []).append(row)
+        return batch
+
+class Subscriber:
+    """One connected client; send() never blocks the tick loop"""
+
+    def __init__(self, writer: asyncio.StreamWriter, websocket: bool):
+        self.writer = writer
+        self.websocket = websocket
+        self.dropped = 0
+        self.closed = asyncio.Event()
+
+    def frame(self, payload: bytes) -> bytes:
+        if not self.websocket:
+            return b'data: ' + payload + b'\n\n'
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x81, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x81, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x81, 127, length)
+        return header + payload
+
+    def backlogged(self) -> bool:
+        transport = self.writer.transport
+        return transport.is_closing() or transport.get_write_buffer_size() > HIGH_WATER_BYTES
+
+    def send(self, payload: bytes):
+        if not self.writer.transport.is_closing():
+            self.writer.write(self.frame(payload))
+
+class ReplayChannel:
+    """
+    A replay clock shared by every client with the same speed and vehicle filter.
+    Runs while it has subscribers; each tick is encoded once and written to all of them.
+    """
+
+    def __init__(self, timeline: ReplayTimeline, speed: float, vehicles: tuple, loop_replay: bool):
+        self.timeline = timeline
+        self.speed = speed
+        self.vehicles = vehicles
+        self.vehicle_codes = (np.array([timeline.vehicles.index(v) for v in vehicles if v in timeline.vehicles])
+                              if vehicles else None)
+        self.loop_replay = loop_replay
+        self.subscribers = set()
+        self.task = None
+        self.cursor = timeline.start
+
+    def hello(self) -> bytes:
+        return json.dumps({
+            'type': 'hello', 'columns': REPLAY_COLUMNS,
+            'vehicles': list(self.vehicles) or self.timeline.vehicles,
+            'speed': self.speed, 'tick_ms': TICK_MS,
+            'start': self.timeline.start, 'end': self.timeline.end, 'position': self.cursor,
+        }).encode('utf-8')
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        # Race time advances as a float so speeds below 1 ms per tick still move; ticks cover whole ms
+        step = TICK_MS * self.speed
+        position = float(self.cursor)
+        next_tick = loop.time()
+        while self.subscribers:
+            if self.cursor >= self.timeline.end:
+                if not self.loop_replay:
+                    self.broadcast({'type': 'end'})
+                    for subscriber in list(self.subscribers):
+                        subscriber.closed.set()
+                    return
+                self.cursor = self.timeline.start
+                position = float(self.cursor)
+
+            position += step
+            frames = self.timeline.batch(self.cursor, int(position), self.vehicle_codes)
+            self.broadcast({'type': 'frames', 't': self.cursor, 'frames': frames})
+            self.cursor = int(position)
+
+            # Schedule against the loop clock so ticks don't drift with encoding time
+            next_tick += TICK_MS / 1000
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    def broadcast(self, message: dict):
+        payload = None
+        for subscriber in list(self.subscribers):
+            if subscriber.backlogged():
+                # Slow client: drop this tick rather than queue it
+                subscriber.dropped += 1
+                continue
+            if subscriber.dropped:
+                subscriber.send(json.dumps({**message, 'dropped': subscriber.dropped}).encode('utf-8'))
+                subscriber.dropped = 0
+                continue
+            if payload is None:
+                payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+            subscriber.send(payload)
+
+    def subscribe(self, subscriber: Subscriber):
+        subscriber.send(self.hello())
+        self.subscribers.add(subscriber)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+class ReplayServer:
+    def __init__(self, timeline: ReplayTimeline, loop_replay: bool = True):
+        self.timeline = timeline
+        self.loop_replay = loop_replay
+        self.channels = {}  # (speed, vehicles) -> ReplayChannel, while it has subscribers
+
+    def channel(self, query: dict) -> ReplayChannel:
+        try:
+            speed = float(query.get('speed', ['1'])[0])
+        except ValueError:
+            raise ApiError(400, "speed must be a number")
+        if not 0 < speed <= MAX_SPEED:
+            raise ApiError(400, f"speed must be in (0, {MAX_SPEED}]")
+        vehicles = tuple(sorted(v for v in query.get('vehicles', [''])[0].split(',') if v))
+        unknown = [v for v in vehicles if v not in self.timeline.vehicles]
+        if unknown:
+            raise ApiError(404, f"No telemetry for {', '.join(unknown)}")
+
+        key = (speed, vehicles)
+        channel = self.channels.get(key)
+        if channel is None:
+            channel = self.channels[key] = ReplayChannel(self.timeline, speed, vehicles, self.loop_replay)
+        return channel
+
+    def release(self, channel: ReplayChannel):
+        """Forget a channel once its last subscriber has left (its run loop exits on its own)"""
+        key = (channel.speed, channel.vehicles)
+        if not channel.subscribers and self.channels.get(key) is channel:
+            del self.channels[key]
+
+    async def stream(self, reader, writer, channel: ReplayChannel, headers: dict):
+        """Upgrade to WebSocket or start an event stream, then hold the connection until the client leaves"""
+        websocket = headers.get('upgrade', '').lower() == 'websocket'
+        if websocket:
+            key = headers.get('sec-websocket-key')
+            if not key:
+                raise ApiError(400, "Missing Sec-WebSocket-Key")
+            accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+            writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                          f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode('latin-1'))
+        else:
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                         b'Access-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\n')
+
+        subscriber = Subscriber(writer, websocket)
+        channel.subscribe(subscriber)
+        loop = asyncio.get_running_loop()
+        waits = [loop.create_task(read_websocket(reader, writer) if websocket else read_until_eof(reader)),
+                 loop.create_task(subscriber.closed.wait())]
+        try:
+            await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            channel.unsubscribe(subscriber)
+            for task in waits:
+                task.cancel()
+            if websocket and not writer.transport.is_closing():
+                writer.write(b'\x88\x00')  # close frame
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, target, version, headers = request
+            url = urlsplit(target)
+            if method != 'GET':
+                raise ApiError(405, f"{method} not allowed")
+            if url.path.rstrip('/') not in ('/replay', '/replay/sse', '/replay/ws'):
+                raise ApiError(404, f"Unknown path {url.path}")
+            channel = self.channel(parse_qs(url.query))
+            try:
+                await self.stream(reader, writer, channel, headers)
+            finally:
+                self.release(channel)
+        except ApiError as error:
+            body = json.dumps({'error': str(error)}).encode('utf-8')
+            writer.write(encode_response(error.status, {'Content-Type': 'application/json'}, body, False, False))
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+async def read_until_eof(reader: asyncio.StreamReader):
+    """SSE clients don't send anything; EOF means they went away"""
+    while await reader.read(4096):
+        pass
+
+async def read_websocket(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Consume client frames: answer pings, return on close or disconnect"""
+    while True:
+        head = await reader.readexactly(2)
+        opcode, length = head[0] & 0x0F, head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+        mask = await reader.readexactly(4) if head[1] & 0x80 else b'\0\0\0\0'
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+        if opcode == 0x8:
+            return
+        if opcode == 0x9:
+            writer.write(struct.pack('!BB', 0x8A, len(payload)) + payload)
+
+async def serve(server: ReplayServer, host: str = '127.0.0.1', port: int = 8766):
+    tcp_server = await asyncio.start_server(server.handle, host, port)
+    print(f"📡 Replay server: {len(server.timeline.vehicles)} cars, "
+          f"{(server.timeline.end - server.timeline.start) / 1000:.0f}s of race")
+    print(f"   SSE: http://{host}:{port}/replay/sse?speed=1   WebSocket: ws://{host}:{port}/replay/ws?speed=1")
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay telemetry to dashboards over SSE or WebSocket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--frames-dir", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber/telemetry")
+    parser.add_argument("--csv", help="Replay straight from a raw telemetry CSV instead of the frame files")
+    parser.add_argument("--no-loop", action="store_true", help="End streams at the end of the race")
+    args = parser.parse_args()
+
+    timeline = ReplayTimeline.from_csv(args.csv) if args.csv else ReplayTimeline.from_store(args.frames_dir)
+    try:
+        asyncio.run(serve(ReplayServer(timeline, loop_replay=not args.no_loop), args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n✅ Replay server stopped")
@@ -0,0 +1,388 @@
+"""
+PitGPT - Local strategy API
+asyncio HTTP server for metrics, lap times and paginated / lap-windowed telemetry from the preprocessed store.
+Responses carry ETags (304 on repeat polls) and are gzip/brotli compressed when the client accepts it.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+import pandas as pd
+from frame_format import encode_frames
+from telemetry_pyramid import PYRAMID_CHANNELS, STATS, build_pyramid, frame_window
+from telemetry_store import TelemetryStore
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_LIMIT = 5000
+DEFAULT_CHART_WIDTH = 800  # pixels (buckets) per chart request
+MAX_LIMIT = 50000
+MIN_COMPRESS_SIZE = 1024
+BODY_CACHE_SIZE = 256
+REFRESH_INTERVAL = 1.0    # seconds between frame directory rescans
+MAX_HEADER_BYTES = 16384
+
+STATUS_TEXT = {200: 'OK', 204: 'No Content', 304: 'Not Modified', 400: 'Bad Request',
+               404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'If-None-Match',
+    'Access-Control-Expose-Headers': 'ETag, X-Total-Count, X-Next-Offset',
+}
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class Resource:
+    """A resolved request: its ETag is known before the (possibly expensive) body is built"""
+
+    def __init__(self, etag: str, content_type: str, build, headers: dict = None):
+        self.etag = etag
+        self.content_type = content_type
+        self.build = build
+        self.headers = headers or {}
+
+def make_etag(*parts) -> str:
+    """Strong ETag from source file stats and the request parameters"""
+    return '"' + hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20] + '"'
+
+def file_stat(path: Path) -> tuple:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise ApiError(404, f"{path.name} not found")
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+def int_param(query: dict, name: str, default: int = None) -> int:
+    value = query.get(name, [None])[0]
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+
+def pick_encoding(accept_encoding: str) -> str:
+    """Preferred content coding we support: br, then gzip, else identity"""
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+class StrategyAPI:
+    """Routes requests to metrics, lap-time and telemetry resources"""
+
+    def __init__(self, frames_dir: str, metrics_csv: str, lap_times_json: str):
+        self.store = TelemetryStore(frames_dir)
+        self.metrics_csv = Path(metrics_csv)
+        self.lap_times_json = Path(lap_times_json)
+        self.lock = threading.Lock()
+        self.bodies = OrderedDict()  # (etag, encoding) -> bytes, LRU
+        self.last_refresh = time.monotonic()
+
+    def refresh_store(self):
+        with self.lock:
+            if time.monotonic() - self.last_refresh >= REFRESH_INTERVAL:
+                self.store.refresh()
+                self.last_refresh = time.monotonic()
+
+    def resolve(self, path: str, query: dict) -> Resource:
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts[:1] != ['api']:
+            raise ApiError(404, f"Unknown path {path}")
+        parts = parts[1:]
+
+        if parts == ['health']:
+            return Resource(None, 'application/json', lambda: b'{"status": "ok"}')
+        if parts == ['metrics']:
+            return self.metrics(query)
+        if parts == ['lap-times']:
+            return self.lap_times(query)
+
+        self.refresh_store()
+        if parts == ['vehicles']:
+            vehicles = self.store.vehicles()
+            return Resource(make_etag('vehicles', vehicles), 'application/json',
+                            lambda: json.dumps({'vehicles': vehicles}).encode('utf-8'))
+        if len(parts) == 3 and parts[0] == 'telemetry' and parts[2] == 'laps':
+            return self.lap_offsets(parts[1])
+        if len(parts) == 3 and parts[0] == 'telemetry' and parts[2] == 'chart':
+            return self.chart(parts[1], query)
+        if len(parts) == 2 and parts[0] == 'telemetry':
+            return self.telemetry(parts[1], query)
+        raise ApiError(404, f"Unknown path {path}")
+
+    def metrics(self, query: dict) -> Resource:
+        """race_metrics.csv as JSON records (or the CSV itself with ?format=csv)"""
+        stat = file_stat(self.metrics_csv)
+        if query.get('format', ['json'])[0] == 'csv':
+            return Resource(make_etag('metrics.csv', stat), 'text/csv; charset=utf-8', self.metrics_csv.read_bytes)
+
+        def build():
+            records = pd.read_csv(self.metrics_csv).to_json(orient='records', double_precision=6)
+            return records.encode('utf-8')
+        return Resource(make_etag('metrics', stat), 'application/json', build)
+
+    def lap_times(self, query: dict) -> Resource:
+        """lap_times.json, optionally a single car's laps (?vehicle_number=N)"""
+        stat = file_stat(self.lap_times_json)
+        vehicle_number = int_param(query, 'vehicle_number')
+
+        def build():
+            with open(self.lap_times_json) as f:
+                lap_times = json.load(f)
+            if vehicle_number is not None:
+                lap_times = {str(vehicle_number): lap_times.get(str(vehicle_number), [])}
+            return json.dumps(lap_times).encode('utf-8')
+        return Resource(make_etag('lap_times', stat, vehicle_number), 'application/json', build)
+
+    def vehicle(self, vehicle_id: str) -> tuple:
+        """(stat, VehicleFrames): the ETag is built from the stat the frames were loaded against, not a fresh one"""
+        try:
+            return self.store.loaded(vehicle_id)
+        except KeyError:
+            raise ApiError(404, f"No telemetry for {vehicle_id}")
+
+    def lap_offsets(self, vehicle_id: str) -> Resource:
+        """Per-lap frame offsets, so clients can page a lap at a time"""
+        stat, vehicle = self.vehicle(vehicle_id)
+
+        def build():
+            offsets = vehicle.lap_offsets()
+            return offsets.to_json(orient='records').encode('utf-8')
+        return Resource(make_etag('laps', stat), 'application/json', build)
+
+    def chart(self, vehicle_id: str, query: dict) -> Resource:
+        """
+        Min/max/mean chart series sized for a plot ?width= pixels wide, from the vehicle's pyramid.
+        ?lap=&last_lap= or ?start=&end= zoom in; ?channels=throttle,rpm picks channels.
+        The coarsest level with at least width buckets is used, down to the raw frames.
+        """
+        stat, vehicle = self.vehicle(vehicle_id)
+        width = min(max(1, int_param(query, 'width', DEFAULT_CHART_WIDTH)), MAX_LIMIT)
+        lap, last_lap = int_param(query, 'lap'), int_param(query, 'last_lap')
+        start_ms, end_ms = int_param(query, 'start', -2**63), int_param(query, 'end', 2**63 - 1)
+        channels = [channel for channel in query.get('channels', [''])[0].split(',') if channel] or PYRAMID_CHANNELS
+        unknown = [channel for channel in channels if channel not in PYRAMID_CHANNELS]
+        if unknown:
+            raise ApiError(400, f"Unknown channels {', '.join(unknown)}")
+        etag = make_etag('chart', stat, width, lap, last_lap, start_ms, end_ms, channels)
+
+        def build():
+            nonlocal start_ms, end_ms
+            if lap is not None:
+                window = vehicle.laps(lap, last_lap)
+                if len(window) == 0:
+                    raise ApiError(404, f"No frames for lap {lap} of {vehicle_id}")
+                start_ms, end_ms = int(window['timestamp'].iloc[0]), int(window['timestamp'].iloc[-1]) + 1
+            pyramid_stat, pyramid = self.store.loaded_pyramid(vehicle_id)
+            if pyramid_stat != stat:
+                # The frame file changed since the ETag was made: stay consistent with the frames it names
+                pyramid = build_pyramid(vehicle_id, vehicle.frames)
+            level = pyramid.level_for(start_ms, end_ms, width)
+            if level >= 0:
+                series, factor = pyramid.window(level, start_ms, end_ms, channels), int(pyramid.factors[level])
+            else:
+                series, factor = frame_window(vehicle.time_range(start_ms, end_ms), channels), 1
+            return json.dumps({
+                'vehicle_id': vehicle_id,
+                'factor': factor,
+                'buckets': len(series),
+                'timestamp': series['timestamp'].tolist(),
+                'channels': {channel: {stat: series[f"{channel}_{stat}"].astype('float64').round(3).tolist() for stat in STATS}
+                             for channel in channels},
+            }, separators=(',', ':')).encode('utf-8')
+        return Resource(etag, 'application/json', build)
+
+    def telemetry(self, vehicle_id: str, query: dict) -> Resource:
+        """
+        A window of one vehicle's frames.
+        ?lap=&last_lap= or ?start=&end= (epoch ms) select the window; ?offset=&limit= page within it.
+        ?format=binary returns a frame file (see frame_format.py) instead of JSON.
+        """
+        stat, vehicle = self.vehicle(vehicle_id)
+        lap, last_lap = int_param(query, 'lap'), int_param(query, 'last_lap')
+        start_ms, end_ms = int_param(query, 'start'), int_param(query, 'end')
+        offset = max(0, int_param(query, 'offset', 0))
+        limit = min(max(1, int_param(query, 'limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        output_format = query.get('format', ['json'])[0]
+        if output_format not in ('json', 'binary'):
+            raise ApiError(400, "format must be json or binary")
+
+        if lap is not None:
+            window = vehicle.laps(lap, last_lap)
+        elif start_ms is not None or end_ms is not None:
+            window = vehicle.time_range(start_ms if start_ms is not None else -2**63,
+                                        end_ms if end_ms is not None else 2**63 - 1)
+        else:
+            window = vehicle.frames
+
+        total = len(window)
+        page = window.iloc[offset:offset + limit]
+        next_offset = offset + len(page) if offset + len(page) < total else None
+        headers = {'X-Total-Count': str(total)}
+        if next_offset is not None:
+            headers['X-Next-Offset'] = str(next_offset)
+        etag = make_etag('telemetry', stat, lap, last_lap, start_ms, end_ms, offset, limit, output_format)
+
+        if output_format == 'binary':
+            # Left uncompressed inside; HTTP content coding takes care of it
+            return Resource(etag, 'application/octet-stream',
+                            lambda: encode_frames(page, page['vehicle_id'].iloc[0] if len(page) else vehicle_id,
+                                                  compress=False)[0], headers)
+
+        def build():
+            frames = page.drop(columns=[column for column in ['vehicle_id'] if column in page])
+            return (f'{{"vehicle_id": {json.dumps(vehicle_id)}, "total": {total}, "offset": {offset}, '
+                    f'"limit": {limit}, "next_offset": {json.dumps(next_offset)}, "frames": '
+                    + frames.to_json(orient='records', double_precision=6) + '}').encode('utf-8')
+        return Resource(etag, 'application/json', build, headers)
+
+    def body(self, resource: Resource, encoding: str) -> bytes:
+        """Build (or reuse) a resource's body in the requested content coding"""
+        key = (resource.etag, encoding)
+        if resource.etag is not None:
+            with self.lock:
+                if key in self.bodies:
+                    self.bodies.move_to_end(key)
+                    return self.bodies[key]
+
+        body = resource.build() if encoding is None else self.body(resource, None)
+        if encoding == 'br':
+            body = brotli.compress(body, quality=5)
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+
+        if resource.etag is not None:
+            with self.lock:
+                self.bodies[key] = body
+                while len(self.bodies) > BODY_CACHE_SIZE:
+                    self.bodies.popitem(last=False)
+        return body
+
+    def respond(self, method: str, target: str, headers: dict) -> tuple:
+        """Handle one request; returns (status, response headers, body)"""
+        if method == 'OPTIONS':
+            return 204, {'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS'}, b''
+        if method not in ('GET', 'HEAD'):
+            raise ApiError(405, f"{method} not allowed")
+
+        url = urlsplit(target)
+        resource = self.resolve(url.path, parse_qs(url.query))
+        response_headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding', **resource.headers}
+        if resource.etag is not None:
+            response_headers['ETag'] = resource.etag
+            if resource.etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+                return 304, response_headers, b''
+
+        body = self.body(resource, None)
+        encoding = pick_encoding(headers.get('accept-encoding', '')) if len(body) >= MIN_COMPRESS_SIZE else None
+        if encoding:
+            body = self.body(resource, encoding)
+            response_headers['Content-Encoding'] = encoding
+        response_headers['Content-Type'] = resource.content_type
+        return 200, response_headers, body
+
+async def read_request(reader: asyncio.StreamReader):
+    """Parse a request line and headers; None when the client closed the connection"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ApiError(400, "Request headers too large")
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise ApiError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), target, version, headers
+
+def encode_response(status: int, headers: dict, body: bytes, head_only: bool, keep_alive: bool) -> bytes:
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    headers = {**CORS_HEADERS, **headers, 'Content-Length': str(len(body)),
+               'Connection': 'keep-alive' if keep_alive else 'close'}
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+    return payload if head_only or status == 304 else payload + body
+
+async def serve(api: StrategyAPI, host: str = '127.0.0.1', port: int = 8765):
+    loop = asyncio.get_running_loop()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers = request
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    # Body building (parsing, JSON, compression) runs off the event loop
+                    status, response_headers, body = await loop.run_in_executor(
+                        None, api.respond, method, target, headers)
+                except ApiError as error:
+                    method = 'GET'
+                    status, response_headers = error.status, {'Content-Type': 'application/json'}
+                    body = json.dumps({'error': str(error)}).encode('utf-8')
+                except Exception as error:
+                    method = 'GET'
+                    status, response_headers = 500, {'Content-Type': 'application/json'}
+                    body = json.dumps({'error': f"{type(error).__name__}: {error}"}).encode('utf-8')
+
+                writer.write(encode_response(status, response_headers, body, method == 'HEAD', keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port, limit=MAX_HEADER_BYTES)
+    print(f"🏁 Strategy API listening on http://{host}:{port}/api")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve metrics, lap times and telemetry windows over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--frames-dir", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber/telemetry")
+    parser.add_argument("--metrics", default="race_metrics.csv")
+    parser.add_argument("--lap-times", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber/lap_times.json")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("ℹ️  brotli not installed - serving gzip only (pip install brotli)")
+    api = StrategyAPI(args.frames_dir, args.metrics, args.lap_times)
+    try:
+        asyncio.run(serve(api, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n✅ Strategy API stopped")
@@ -0,0 +1,312 @@
+"""
+PitGPT - Strategy prompt broker
+Compresses each driver's race state into a one-line summary (deltas since the last update), answers repeated
+states from an LRU cache and batches the remaining drivers into one chat-completions request.
+`python3 strategy_broker.py stub` runs a local stand-in model server for testing without an API key.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import urllib.request
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+from lap_table import LapTable
+from strategy_api import ApiError, encode_response, read_request
+from telemetry_store import TelemetryStore
+
+OPENAI_URL = 'https://api.openai.com/v1/chat/completions'
+STUB_URL = 'http://127.0.0.1:8767/v1/chat/completions'
+MODEL = 'gpt-4o-mini'
+CACHE_SIZE = 512
+MAX_BATCH = 10            # drivers per request
+TOKENS_PER_DRIVER = 90    # max_tokens budget per driver in a batch
+REQUEST_TIMEOUT_S = 20
+STYLES = ['Aggressive', 'Balanced', 'Conservative']
+
+# Summary keys: tsi/risk 0-100 as in the dashboard, trend/last/best in seconds, thr/brk/latg from the latest lap
+STATE_KEYS = ['lap', 'tsi', 'risk', 'attack', 'fuel', 'trend', 'last', 'best', 'thr', 'brk', 'latg']
+STATE_ROUNDING = {'tsi': 0, 'risk': 0, 'trend': 1, 'last': 1, 'best': 1, 'thr': 0, 'brk': 0, 'latg': 1}
+
+SYSTEM_PROMPT = """You are a Toyota Racing Development race engineer for the GR Cup series.
+Each line is one driver: #<id> then key=value, with (+/-change) since the previous update for that driver.
+Keys: lap, tsi=tire stress 0-100, risk=overtake risk 0-100, attack=1 if the attack window is open,
+fuel=1 if fuel saving, trend=lap pace trend s (positive = slowing), last/best lap s,
+thr=mean throttle %, brk=peak brake bar, latg=peak lateral g.
+Rules: Aggressive when attack=1 and tsi<70; Conservative when tsi>70 or fuel=1; otherwise Balanced.
+Pit: trend>0.5 -> give a pit window; tsi>80 -> manage tires or pit early; else "Stay out - pace is stable".
+Respond ONLY with JSON: {"drivers": {"<id>": {"driverStyle": "Aggressive|Balanced|Conservative",
+"riskAlertSummary": "...", "suggestedAction": "...", "pitStrategy": "..."}}}"""
+
+def driver_state(metrics_row: dict, lap_table: LapTable = None, lap_frames: pd.DataFrame = None) -> dict:
+    """
+    Compact, rounded race state for one driver from a race_metrics.csv row, the lap table and the latest lap's frames.
+    Rounding makes states that differ only by noise hash the same.
+    """
+    number = int(metrics_row['vehicle_number'])
+    state = {
+        'lap': 0,
+        'tsi': min(100.0, float(metrics_row['tire_stress_index']) * 10),
+        'risk': float(metrics_row['overtake_risk']) * 100,
+        'attack': int(float(metrics_row['attack_window']) > 0.3),
+        'fuel': int(float(metrics_row['fuel_conservation_mode']) > 0.3),
+    }
+    car = lap_table.car(number) if lap_table is not None else None
+    if car is not None and len(car):
+        state['lap'] = int(car['lap_number'].iloc[-1]) if pd.notna(car['lap_number'].iloc[-1]) else len(car)
+        state.update(trend=car['slope'].iloc[-1], last=car['lap_time'].iloc[-1], best=car['lap_time'].min())
+    if lap_frames is not None and len(lap_frames):
+        state.update(thr=lap_frames['throttle'].mean(), brk=lap_frames['brake_f'].max(),
+                     latg=lap_frames['accy'].abs().max())
+    for key, digits in STATE_ROUNDING.items():
+        if key in state and pd.isna(state[key]):
+            del state[key]
+        elif key in state:
+            state[key] = round(float(state[key]), digits) if digits else int(round(float(state[key])))
+    return state
+
+def state_key(driver_id: str, state: dict) -> str:
+    """Cache key: the driver and their rounded state (the prompt's deltas don't change the answer)"""
+    canonical = json.dumps([driver_id, [state.get(key) for key in STATE_KEYS]], separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+def summary_line(driver_id: str, state: dict, previous: dict = None) -> str:
+    """#<id> key=value ... with (+change) for numeric values that moved since the previous call"""
+    parts = [f"#{driver_id}"]
+    for key in STATE_KEYS:
+        if key not in state:
+            continue
+        value, before = state[key], (previous or {}).get(key)
+        text = f"{key}={value:g}"
+        if before is not None and before != value and key != 'lap':
+            text += f"({value - before:+.{STATE_ROUNDING.get(key, 0)}f})"
+        parts.append(text)
+    return ' '.join(parts)
+
+def parse_summary_line(line: str) -> tuple:
+    """(driver_id, state) from a summary line (used by the stand-in server)"""
+    tokens = line.strip().split()
+    state = {}
+    for token in tokens[1:]:
+        key, _, value = token.partition('=')
+        state[key] = float(value.split('(')[0])
+    return tokens[0][1:], state
+
+def fallback_insight(state: dict) -> dict:
+    """Rule-based strategy, same rules as the dashboard's getFallbackStrategy"""
+    tsi, trend = state.get('tsi', 0), state.get('trend', 0)
+    style = 'Balanced'
+    if state.get('attack') and tsi < 70:
+        style = 'Aggressive'
+    elif tsi > 70 or state.get('fuel'):
+        style = 'Conservative'
+    if tsi > 70:
+        risk = f"High tire stress ({tsi:g}) - manage tire wear"
+    elif state.get('risk', 0) > 50:
+        risk = 'Overtake opportunity ahead - gap closing'
+    else:
+        risk = 'Conditions stable - maintain pace'
+    return {
+        'driverStyle': style,
+        'riskAlertSummary': risk,
+        'suggestedAction': 'Push through high-speed sections, attack Turn 3' if state.get('attack')
+                           else 'Maintain consistent pace, save tires',
+        'pitStrategy': 'Monitor pace trend - prepare for pit window in 2-3 laps' if trend > 0.5
+                       else 'Stay out - pace is stable',
+    }
+
+def validate_insight(parsed: dict) -> dict:
+    """Map a model answer onto the StrategyInsight fields, with the dashboard's defaults"""
+    parsed = parsed if isinstance(parsed, dict) else {}
+    return {
+        'driverStyle': parsed.get('driverStyle') if parsed.get('driverStyle') in STYLES else 'Balanced',
+        'riskAlertSummary': parsed.get('riskAlertSummary') or 'Monitoring race conditions',
+        'suggestedAction': parsed.get('suggestedAction') or 'Maintain current pace',
+        'pitStrategy': parsed.get('pitStrategy') or 'Stay out - monitoring',
+    }
+
+class StrategyBroker:
+    """
+    Strategy insights for many drivers per update: cached states are answered locally,
+    the rest go out in batches of MAX_BATCH drivers per request. Failed requests fall back to the rules.
+    """
+
+    def __init__(self, endpoint: str = OPENAI_URL, api_key: str = None, model: str = MODEL,
+                 cache_size: int = CACHE_SIZE, max_batch: int = MAX_BATCH):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.cache = OrderedDict()  # state_key -> insight, LRU
+        self.previous = {}          # driver_id -> state at the last update (cached or requested)
+        self.stats = {'drivers': 0, 'cache_hits': 0, 'requests': 0, 'failed': 0, 'prompt_chars': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0, 'request_s': 0.0}
+
+    def strategies(self, states: dict) -> dict:
+        """{driver_id: StrategyInsight dict} for {driver_id: driver_state(...)}"""
+        insights, pending = {}, {}
+        for driver_id, state in states.items():
+            key = state_key(driver_id, state)
+            self.stats['drivers'] += 1
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                insights[driver_id] = self.cache[key]
+                self.stats['cache_hits'] += 1
+                self.previous[driver_id] = state
+            else:
+                pending[driver_id] = (key, state)
+
+        batch_ids = list(pending)
+        for first in range(0, len(batch_ids), self.max_batch):
+            batch = {driver_id: pending[driver_id] for driver_id in batch_ids[first:first + self.max_batch]}
+            answers = self.request({driver_id: state for driver_id, (_, state) in batch.items()})
+            for driver_id, (key, state) in batch.items():
+                if driver_id in answers:
+                    insights[driver_id] = self.cache[key] = validate_insight(answers[driver_id])
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+                else:
+                    insights[driver_id] = fallback_insight(state)
+                self.previous[driver_id] = state
+        return insights
+
+    def prompt(self, states: dict) -> str:
+        lines = [summary_line(driver_id, state, self.previous.get(driver_id)) for driver_id, state in states.items()]
+        return '\n'.join(lines)
+
+    def request(self, states: dict) -> dict:
+        """One chat-completions call for a batch; {driver_id: raw answer}, empty on any failure"""
+        user_prompt = self.prompt(states)
+        body = json.dumps({
+            'model': self.model,
+            'messages': [{'role': 'system', 'content': SYSTEM_PROMPT}, {'role': 'user', 'content': user_prompt}],
+            'temperature': 0.7,
+            'max_tokens': TOKENS_PER_DRIVER * len(states),
+            'response_format': {'type': 'json_object'},
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        self.stats['requests'] += 1
+        self.stats['prompt_chars'] += len(SYSTEM_PROMPT) + len(user_prompt)
+        start = time.perf_counter()
+        try:
+            request = urllib.request.Request(self.endpoint, data=body, headers=headers, method='POST')
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_S) as response:
+                data = json.loads(response.read())
+            usage = data.get('usage', {})
+            self.stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            self.stats['completion_tokens'] += usage.get('completion_tokens', 0)
+            answers = json.loads(data['choices'][0]['message']['content']).get('drivers', {})
+            return {str(driver_id): answer for driver_id, answer in answers.items()}
+        except Exception as error:
+            self.stats['failed'] += 1
+            print(f"⚠️  Strategy request failed ({type(error).__name__}: {error}) - using rule-based fallback")
+            return {}
+        finally:
+            self.stats['request_s'] += time.perf_counter() - start
+
+def race_states(metrics_csv: str, lap_table: LapTable = None, frames_dir: str = None, drivers: list = None) -> dict:
+    """driver_state for every driver in race_metrics.csv (latest lap's frames when a frame store is given)"""
+    metrics = pd.read_csv(metrics_csv)
+    store = TelemetryStore(frames_dir) if frames_dir and Path(frames_dir).exists() else None
+    known = set(store.vehicles()) if store else set()
+    states = {}
+    for row in metrics.to_dict('records'):
+        if drivers and row['driver_id'] not in drivers:
+            continue
+        lap_frames = None
+        if row['driver_id'] in known:
+            frames = store.frames(row['driver_id'])
+            lap_frames = frames[frames['lap'] == frames['lap'].max()] if len(frames) else None
+        states[row['driver_id']] = driver_state(row, lap_table, lap_frames)
+    return states
+
+async def serve_stub(host: str = '127.0.0.1', port: int = 8767, latency_s: float = 0.3):
+    """
+    Stand-in for the chat-completions API: answers each driver line of the prompt with the rule-based strategy
+    after a fixed delay, and reports token usage at ~4 characters per token.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, target, version, headers = request
+            if method != 'POST' or not target.rstrip('/').endswith('/chat/completions'):
+                raise ApiError(404, f"Unknown endpoint {method} {target}")
+            payload = json.loads(await reader.readexactly(int(headers.get('content-length', 0))))
+            prompt = payload['messages'][-1]['content']
+            answers = dict(parse_summary_line(line) for line in prompt.splitlines() if line.startswith('#'))
+            content = json.dumps({'drivers': {driver_id: fallback_insight(state) for driver_id, state in answers.items()}})
+            await asyncio.sleep(latency_s)
+            prompt_chars = sum(len(message['content']) for message in payload['messages'])
+            body = json.dumps({
+                'model': payload.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_chars // 4, 'completion_tokens': len(content) // 4},
+            }).encode('utf-8')
+            writer.write(encode_response(200, {'Content-Type': 'application/json'}, body, False, False))
+        except ApiError as error:
+            body = json.dumps({'error': str(error)}).encode('utf-8')
+            writer.write(encode_response(error.status, {'Content-Type': 'application/json'}, body, False, False))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"🤖 Stand-in model server on http://{host}:{port}/v1/chat/completions ({latency_s:g}s latency)")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched, cached strategy prompts for the whole field")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ask = subparsers.add_parser("ask", help="Strategy insights for every driver in race_metrics.csv")
+    ask.add_argument("--metrics", default="race_metrics.csv")
+    ask.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    ask.add_argument("--frames-dir", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber/telemetry")
+    ask.add_argument("--drivers", nargs="*", help="driver_ids to ask about (default all)")
+    ask.add_argument("--endpoint", help=f"Chat-completions URL (default: OpenAI with OPENAI_API_KEY, else {STUB_URL})")
+    ask.add_argument("--model", default=MODEL)
+    ask.add_argument("--batch-size", type=int, default=MAX_BATCH)
+    ask.add_argument("--updates", type=int, default=2, help="Repeat the update this many times to show cache reuse")
+    ask.add_argument("--output", help="Write the insights as JSON to this file")
+    stub = subparsers.add_parser("stub", help="Run the local stand-in model server")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8767)
+    stub.add_argument("--latency", type=float, default=0.3, help="Seconds per response")
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        try:
+            asyncio.run(serve_stub(args.host, args.port, args.latency))
+        except KeyboardInterrupt:
+            print("\n✅ Stand-in model server stopped")
+    else:
+        api_key = os.environ.get('OPENAI_API_KEY')
+        endpoint = args.endpoint or (OPENAI_URL if api_key else STUB_URL)
+        if endpoint == OPENAI_URL and not api_key:
+            print("⚠️  OPENAI_API_KEY not set - requests will fail over to the rule-based strategy")
+        lap_table = LapTable.from_csv(args.lap_times_csv) if os.path.exists(args.lap_times_csv) else None
+        states = race_states(args.metrics, lap_table, args.frames_dir, args.drivers)
+        broker = StrategyBroker(endpoint, api_key, args.model, max_batch=args.batch_size)
+        for update in range(args.updates):
+            start = time.perf_counter()
+            insights = broker.strategies(states)
+            print(f"✓ Update {update + 1}: {len(insights)} drivers in {time.perf_counter() - start:.2f}s")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(insights, f, indent=2)
+        for driver_id, insight in list(insights.items())[:5]:
+            print(f"   {driver_id}: {insight['driverStyle']} - {insight['pitStrategy']}")
+        stats = broker.stats
+        print(f"\n✅ {stats['drivers']} driver updates: {stats['cache_hits']} from cache, {stats['requests']} requests "
+              f"({stats['failed']} failed), {stats['prompt_chars']:,} prompt chars, {stats['request_s']:.2f}s waiting")
@@ -0,0 +1,180 @@
+"""
+PitGPT - Monte Carlo race-strategy simulator
+Evaluates no-stop and pit-on-lap-N for every car across thousands of randomized scenarios (degradation
+noise, caution periods), vectorized over scenarios and sharded across processes.
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from lap_table import LapTable, find_column
+from tire_model import PIT_LOSS_S, TERMS, DegradationModel
+
+SCENARIOS = 4000
+DEG_NOISE = 0.15           # lognormal sigma of a car's degradation multiplier per scenario
+STRESS_ELASTICITY = 0.5    # degradation scales with (tire_stress_index / field median) ** this
+CAUTIONS_PER_LAP = 0.03    # chance a caution starts on any remaining lap
+CAUTION_LAPS = (2, 4)      # caution length range (inclusive)
+CAUTION_PIT_FACTOR = 0.4   # share of the pit loss paid when stopping under caution
+
+def seed_field(model: DegradationModel, tire_stress: dict = None) -> dict:
+    """
+    Per-car simulation inputs from a fitted DegradationModel.
+    Cars without a fit borrow the field median curve (and the leader's lap if they have no timed laps);
+    tire_stress_index scales every car's wear.
+    """
+    beta, covariance = model.coefficients()
+    fitted = ~np.isnan(beta[:, 0])
+    if fitted.any():
+        median_beta = np.median(beta[fitted], axis=0)
+        median_cov = np.median(covariance[fitted], axis=0)
+    else:
+        median_beta, median_cov = np.zeros(TERMS), np.eye(TERMS) * 1e-6
+    beta[~fitted] = median_beta
+    covariance[~fitted] = median_cov
+
+    numbers = list(model.cars)
+    stress = np.array([(tire_stress or {}).get(number, np.nan) for number in numbers], dtype='float64')
+    field_stress = np.nanmedian(stress) if not np.isnan(stress).all() else np.nan
+    stress_factor = np.where(np.isnan(stress) | ~(field_stress > 0), 1.0,
+                             np.clip(stress / field_stress, 0.1, 10) ** STRESS_ELASTICITY)
+
+    last_lap, stint_age = model.last_lap.copy(), model.stint_age.copy()
+    untimed = last_lap == 0
+    last_lap[untimed] = last_lap.max() if len(last_lap) else 0
+    stint_age[untimed] = last_lap[untimed]
+
+    symmetric = (covariance + covariance.transpose(0, 2, 1)) / 2
+    return {
+        'numbers': numbers,
+        'fitted': fitted,
+        'beta': beta,
+        'chol': np.linalg.cholesky(symmetric + np.eye(TERMS) * 1e-10),
+        'stress_factor': stress_factor,
+        'last_lap': last_lap,
+        'stint_age': stint_age,
+        'race_laps': model.race_laps,
+        'pit_loss': model.pit_loss,
+    }
+
+def caution_laps(rng: np.random.Generator, scenarios: int, race_laps: int, first_lap: int) -> np.ndarray:
+    """scenarios x race_laps mask of laps run under caution (shared by the whole field)"""
+    caution = np.zeros((scenarios, race_laps + 1), dtype=bool)
+    starts = np.argwhere(rng.random((scenarios, race_laps + 1)) < CAUTIONS_PER_LAP)
+    starts = starts[starts[:, 1] >= first_lap]
+    lengths = rng.integers(CAUTION_LAPS[0], CAUTION_LAPS[1] + 1, len(starts))
+    for offset in range(CAUTION_LAPS[1]):
+        active = offset < lengths
+        caution[starts[active, 0], np.minimum(starts[active, 1] + offset, race_laps)] = True
+    return caution[:, 1:]
+
+def simulate_shard(field: dict, scenarios: int, seed: int) -> np.ndarray:
+    """
+    Race time from the current lap to the flag, relative to a fresh-tire baseline, for every
+    car x scenario x option. Option 0 is no stop; option L (1..race_laps-1) pits at the end of lap L.
+    Invalid options (laps already run, or the last lap) are inf.
+    """
+    rng = np.random.default_rng(seed)
+    race_laps = field['race_laps']
+    cars = len(field['numbers'])
+    laps = np.arange(1, race_laps + 1)
+    last_lap = field['last_lap'][:, None, None]
+    green = ~caution_laps(rng, scenarios, race_laps, int(field['last_lap'].min()) + 1)  # scenarios x laps
+
+    # Degradation coefficients per car and scenario: parameter draws x wear noise x tire stress
+    draws = field['beta'][:, None, :] + np.einsum('nij,nsj->nsi', field['chol'], rng.standard_normal((cars, scenarios, TERMS)))
+    scale = field['stress_factor'][:, None] * rng.lognormal(0, DEG_NOISE, (cars, scenarios))
+    b = (draws[..., 1] * scale)[..., None]
+    c = (draws[..., 2] * scale)[..., None]
+
+    # Old tires: wear on every green lap after the current one, cumulative over laps
+    age = field['stint_age'][:, None, None] + (laps[None, None, :] - last_lap - 1)
+    run = (laps[None, None, :] > last_lap) & green[None, :, :]
+    old_wear = np.cumsum(np.where(run, b * age + c * age ** 2, 0.0), axis=-1)
+
+    # New tires after pitting at lap L: sum over green laps j > L of b(j-L-1) + c(j-L-1)^2, from suffix sums of j^k
+    weights = green * 1.0
+    suffix = [np.concatenate([np.cumsum((weights * laps ** k)[:, ::-1], axis=1)[:, ::-1][:, 1:],
+                              np.zeros((scenarios, 1))], axis=1) for k in range(3)]
+    m = laps + 1.0
+    new_wear = b * (suffix[1] - m * suffix[0]) + c * (suffix[2] - 2 * m * suffix[1] + m ** 2 * suffix[0])
+
+    pit_cost = field['pit_loss'] * np.where(green, 1.0, CAUTION_PIT_FACTOR)
+    stop = old_wear + new_wear + pit_cost[None, :, :]
+    valid = (laps[None, None, :] > last_lap) & (laps[None, None, :] < race_laps)
+    stop = np.where(valid, stop, np.inf)
+    no_stop = old_wear[..., -1:]
+    return np.concatenate([no_stop, stop[..., :-1]], axis=-1).astype('float32')
+
+def recommend(times: np.ndarray, field: dict) -> pd.DataFrame:
+    """Best option per car by mean race time, with how often it wins and its gain over not stopping"""
+    times = times.astype('float64')
+    mean_times = times.mean(axis=1)
+    best = mean_times.argmin(axis=1)
+    cars = np.arange(len(field['numbers']))
+    chosen = times[cars, :, best]
+    gain = times[:, :, 0] - chosen
+    wins = (times.argmin(axis=2) == best[:, None]).mean(axis=1)
+    return pd.DataFrame({
+        'vehicle_number': field['numbers'],
+        'fitted': field['fitted'],
+        'last_lap': field['last_lap'],
+        'stint_age': field['stint_age'],
+        'pit_lap': np.where(best > 0, best, np.nan),
+        'expected_gain_s': (mean_times[:, 0] - mean_times[cars, best]).round(2),
+        'gain_p10_s': np.percentile(gain, 10, axis=1).round(2),
+        'gain_p90_s': np.percentile(gain, 90, axis=1).round(2),
+        'best_share': wins.round(3),
+        'stress_factor': field['stress_factor'].round(3),
+    })
+
+def simulate_strategies(model: DegradationModel, tire_stress: dict = None, scenarios: int = SCENARIOS,
+                        workers: int = 1, seed: int = 0) -> pd.DataFrame:
+    """Pit-lap recommendation for every car; scenarios are split into one shard per worker"""
+    field = seed_field(model, tire_stress)
+    shards = np.array_split(np.arange(scenarios), max(1, workers))
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(simulate_shard, [field] * len(shards), [len(shard) for shard in shards], seeds))
+    else:
+        results = [simulate_shard(field, len(shard), shard_seed) for shard, shard_seed in zip(shards, seeds)]
+    return recommend(np.concatenate(results, axis=1), field)
+
+def read_tire_stress(metrics_csv: str) -> dict:
+    """vehicle_number -> tire_stress_index from race_metrics.csv"""
+    metrics = pd.read_csv(metrics_csv)
+    return dict(zip(metrics['vehicle_number'], metrics['tire_stress_index']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo pit-strategy what-ifs for the whole field")
+    parser.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    parser.add_argument("--metrics-csv", default="race_metrics.csv", help="tire_stress_index source (optional)")
+    parser.add_argument("--race-laps", type=int, help="Scheduled race length (default: most laps in the file)")
+    parser.add_argument("--at-lap", type=int, help="Simulate from this lap (replays the laps up to it)")
+    parser.add_argument("--pit-loss", type=float, default=PIT_LOSS_S)
+    parser.add_argument("--scenarios", type=int, default=SCENARIOS)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes for large --scenarios runs (the default run takes well under a second in one)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="strategy_recommendations.csv")
+    args = parser.parse_args()
+
+    start = time.time()
+    lap_times_df = pd.read_csv(args.lap_times_csv, sep=';')
+    lap_numbers = pd.to_numeric(lap_times_df[find_column(lap_times_df, 'LAP_NUMBER')], errors='coerce')
+    race_laps = args.race_laps or int(lap_numbers.max())
+    if args.at_lap:
+        lap_times_df = lap_times_df[lap_numbers <= args.at_lap]
+    model = DegradationModel(race_laps, args.pit_loss).fit(LapTable(lap_times_df))
+    tire_stress = read_tire_stress(args.metrics_csv) if os.path.exists(args.metrics_csv) else None
+    if tire_stress is None:
+        print(f"⚠️  {args.metrics_csv} not found - tire stress not applied")
+
+    recommendations = simulate_strategies(model, tire_stress, args.scenarios, args.workers, args.seed)
+    recommendations.to_csv(args.output, index=False)
+    print(recommendations.to_string(index=False))
+    print(f"\n✅ {args.scenarios:,} scenarios x {len(recommendations)} cars in {time.time() - start:.2f}s, saved to {args.output}")
@@ -0,0 +1,122 @@
+"""
+Deterministic synthetic race data in the Barber file formats
+Long-format telemetry CSV + semicolon lap-time file, at any multiple of race scale
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+TELEMETRY_FILE = "R1_barber_telemetry_data.csv"
+LAP_TIMES_FILE = "23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV"
+
+# 1x race scale
+BASE_CARS = 20
+BASE_LAPS = 25
+SAMPLE_HZ = 10
+LAP_SECONDS = 95.0
+RACE_START = pd.Timestamp('2025-09-06T18:40:00Z')
+
+CHANNELS = ['aps', 'pbrake_f', 'pbrake_r', 'Steering_Angle', 'accx_can', 'accy_can', 'gear', 'nmot', 'speed']
+DROP_RATE = 0.1  # fraction of channel samples missing at a tick, like the real logger
+SECTOR_SPLITS = [0.28, 0.39, 0.33]
+
+def car_ids(cars: int):
+    """(vehicle_id, vehicle_number) pairs in the GR86-<chassis>-<number> form"""
+    return [(f"GR86-{chassis:03d}-{number}", number)
+            for chassis, number in zip(range(2, 2 + 2 * cars, 2), range(1, cars + 1))]
+
+def car_lap_times(rng: np.random.Generator, laps: int) -> np.ndarray:
+    """Lap times in seconds: a fast first stint with slow tire degradation and traffic outliers"""
+    base = LAP_SECONDS + rng.normal(0, 0.8)
+    degradation = np.arange(laps) * rng.uniform(0.02, 0.08)
+    noise = rng.normal(0, 0.35, laps)
+    traffic = np.where(rng.random(laps) < 0.05, rng.uniform(1, 4, laps), 0.0)
+    times = base + degradation + noise + traffic
+    times[0] += 6.0  # standing start
+    return times
+
+def lap_channels(rng: np.random.Generator, ticks: int) -> dict:
+    """Channel values for one lap, driven by a smooth track-position phase"""
+    phase = np.linspace(0, 2 * np.pi * 7, ticks, endpoint=False)  # ~7 corners per lap
+    corner = np.clip(-np.sin(phase), 0, None)
+    throttle = np.clip(100 * (1 - 1.4 * corner) + rng.normal(0, 4, ticks), 0, 100)
+    brake_f = np.clip(120 * np.clip(np.sin(phase + 0.6), 0, None) ** 4 + rng.normal(0, 2, ticks), 0, None)
+    speed = 80 + 130 * (1 - corner) + rng.normal(0, 2, ticks)
+    gear = np.clip(np.round(speed / 45), 1, 6)
+    return {
+        'aps': throttle,
+        'pbrake_f': brake_f,
+        'pbrake_r': brake_f * 0.7,
+        'Steering_Angle': 90 * np.sin(phase) * corner + rng.normal(0, 2, ticks),
+        'accx_can': np.gradient(speed) * 0.3 + rng.normal(0, 0.05, ticks),
+        'accy_can': 1.4 * corner * np.sign(np.cos(phase)) + rng.normal(0, 0.05, ticks),
+        'gear': gear,
+        'nmot': np.clip(speed * 34 - gear * 400 + rng.normal(0, 60, ticks), 1500, 7800),
+        'speed': speed,
+    }
+
+def generate_race(output_dir: str, scale: float = 1.0, cars: int = BASE_CARS, seed: int = 0) -> dict:
+    """
+    Write a synthetic race to output_dir; returns row counts.
+    scale multiplies the race length (laps); the telemetry is written one car-lap at a time.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    laps = max(1, int(round(BASE_LAPS * scale)))
+    rng = np.random.default_rng(seed)
+
+    telemetry_file = output_path / TELEMETRY_FILE
+    telemetry_rows = 0
+    lap_rows = []
+    header = True
+
+    for vehicle_id, vehicle_number in car_ids(cars):
+        lap_times = car_lap_times(rng, laps)
+        lap_starts = RACE_START.value // 1_000_000 + np.concatenate([[0], np.cumsum(lap_times[:-1])]) * 1000
+
+        for lap, (lap_start, lap_time) in enumerate(zip(lap_starts, lap_times), start=1):
+            ticks = int(lap_time * SAMPLE_HZ)
+            timestamps = (lap_start + np.arange(ticks) * (1000 / SAMPLE_HZ) + rng.integers(0, 3, ticks)).astype('int64')
+            channels = lap_channels(rng, ticks)
+
+            names = np.repeat(CHANNELS, ticks)
+            values = np.concatenate([channels[name] for name in CHANNELS])
+            keep = rng.random(len(values)) >= DROP_RATE
+            stamps = pd.to_datetime(np.tile(timestamps, len(CHANNELS))[keep], unit='ms', utc=True)
+
+            pd.DataFrame({
+                'vehicle_id': vehicle_id,
+                'vehicle_number': vehicle_number,
+                'lap': lap,
+                'timestamp': stamps.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z',
+                'telemetry_name': names[keep],
+                'telemetry_value': np.round(values[keep], 3),
+            }).to_csv(telemetry_file, mode='w' if header else 'a', header=header, index=False)
+            header = False
+            telemetry_rows += int(keep.sum())
+
+            sectors = lap_time * np.array(SECTOR_SPLITS)
+            lap_rows.append({
+                'NUMBER': vehicle_number,
+                ' LAP_NUMBER': lap,
+                ' LAP_TIME': f"{int(lap_time // 60)}:{lap_time % 60:06.3f}",
+                ' S1': f"{sectors[0]:.3f}",
+                ' S2': f"{sectors[1]:.3f}",
+                ' S3': f"{sectors[2]:.3f}",
+            })
+
+    pd.DataFrame(lap_rows).to_csv(output_path / LAP_TIMES_FILE, sep=';', index=False)
+    return {'telemetry_rows': telemetry_rows, 'lap_rows': len(lap_rows), 'cars': cars, 'laps': laps}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic race in the Barber file formats")
+    parser.add_argument("output_dir")
+    parser.add_argument("--scale", type=float, default=1.0, help="Race length multiple (1 = 25 laps)")
+    parser.add_argument("--cars", type=int, default=BASE_CARS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate_race(args.output_dir, args.scale, args.cars, args.seed)
+    print(f"✅ Wrote {counts['telemetry_rows']:,} telemetry rows and {counts['lap_rows']} laps to {args.output_dir}")
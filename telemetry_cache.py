@@ -0,0 +1,316 @@
+"""
+Columnar binary cache of the raw telemetry CSV
+The CSV is parsed once into typed memory-mappable columns; later runs load those instead of text
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from pipeline_trace import memory_mark, stage, traced_chunks
+from telemetry_quality import QualityChecker, check_schema
+from telemetry_timestamps import TimestampDecoder
+
+CACHE_VERSION = 2
+CACHE_DIRNAME = '.telemetry_cache'
+
+# Columns kept in the cache and their on-disk dtypes
+CACHE_COLUMNS = {
+    'vehicle_id': 'int32',        # categorical code (-1 = missing)
+    'vehicle_number': 'float64',
+    'lap': 'float64',
+    'timestamp': 'int64',         # epoch ms, NaT sentinel for missing/unparseable
+    'telemetry_name': 'int32',    # categorical code (-1 = missing)
+    'telemetry_value': 'float64',
+}
+CATEGORICAL_COLUMNS = ['vehicle_id', 'telemetry_name']
+NUMERIC_COLUMNS = ['vehicle_number', 'lap', 'telemetry_value']
+NAT = np.iinfo('int64').min
+BUILD_CHUNK_SIZE = 1000000
+
+def cache_dir_for(csv_path: str) -> Path:
+    """Cache directory for a CSV: <csv dir>/.telemetry_cache/<csv stem>"""
+    csv_path = Path(csv_path)
+    return csv_path.parent / CACHE_DIRNAME / csv_path.stem
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_meta(cache_dir: Path) -> dict:
+    """Load a cache's meta.json (None if there is no complete cache)"""
+    meta_file = Path(cache_dir) / 'meta.json'
+    if not meta_file.exists():
+        return None
+    with open(meta_file) as f:
+        return json.load(f)
+
+def write_meta(cache_dir: Path, meta: dict):
+    with open(Path(cache_dir) / 'meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def is_cache_valid(csv_path: str, cache_dir: Path) -> bool:
+    """
+    True if the cache matches the source file.
+    A changed mtime/size triggers a hash check; if the content is unchanged the
+    new mtime is recorded and the cache is kept.
+    """
+    meta = read_meta(cache_dir)
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False
+
+    stat = os.stat(csv_path)
+    if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        return True
+    if meta['size'] != stat.st_size or meta['sha256'] != file_digest(csv_path):
+        return False
+
+    meta['mtime_ns'] = stat.st_mtime_ns
+    write_meta(cache_dir, meta)
+    return True
+
+def check_csv_schema(csv_path: str) -> dict:
+    """Header check before any parsing; a file missing a cache column is rejected up front"""
+    schema = check_schema(list(pd.read_csv(csv_path, nrows=0).columns), list(CACHE_COLUMNS))
+    if schema['missing']:
+        raise ValueError(f"{csv_path} is missing telemetry columns: {', '.join(schema['missing'])}")
+    return schema
+
+def read_telemetry_csv(csv_path: str, **kwargs):
+    """read_csv of just the cache columns; names padded with spaces still match and are stripped"""
+    result = pd.read_csv(csv_path, usecols=lambda column: column.strip() in CACHE_COLUMNS, **kwargs)
+    if isinstance(result, pd.DataFrame):
+        return result.rename(columns=str.strip)
+    return (chunk.rename(columns=str.strip) for chunk in result)
+
+def convert_chunk(chunk: pd.DataFrame, decoder: TimestampDecoder) -> pd.DataFrame:
+    """Convert a raw CSV chunk to the cache's typed columns (categoricals for names/ids)"""
+    with stage('parse_timestamps', rows=len(chunk)):
+        timestamps, valid = decoder.decode(chunk['timestamp'])
+    timestamps = np.where(valid, timestamps, NAT).view('datetime64[ms]')
+
+    columns = {
+        'vehicle_id': chunk['vehicle_id'].astype('category'),
+        'vehicle_number': pd.to_numeric(chunk['vehicle_number'], errors='coerce').astype('float64'),
+        'lap': pd.to_numeric(chunk['lap'], errors='coerce').astype('float64'),
+        'timestamp': pd.Series(timestamps, index=chunk.index).dt.tz_localize('UTC'),
+        'telemetry_name': chunk['telemetry_name'].astype('category'),
+        'telemetry_value': pd.to_numeric(chunk['telemetry_value'], errors='coerce').astype('float64'),
+    }
+    return pd.DataFrame(columns)
+
+def write_cache_chunk(typed: pd.DataFrame, files: dict, categories: dict):
+    """Append one converted chunk to the open column files"""
+    for name in CATEGORICAL_COLUMNS:
+        # Map this chunk's category codes onto the file-wide category list
+        known = categories[name]
+        local = typed[name].cat
+        remap = np.array([known.setdefault(str(value), len(known)) for value in local.categories] + [-1],
+                         dtype='int32')
+        remap[local.codes.to_numpy()].tofile(files[name])
+    for name in NUMERIC_COLUMNS:
+        typed[name].to_numpy(dtype='float64').tofile(files[name])
+    typed['timestamp'].dt.tz_localize(None).to_numpy().view('int64').tofile(files['timestamp'])
+
+def write_cache(csv_path: str, chunk_size: int = BUILD_CHUNK_SIZE) -> Path:
+    """Parse the CSV once and write one raw binary file per column"""
+    schema = check_csv_schema(csv_path)
+    cache_dir = cache_dir_for(csv_path)
+    build_dir = cache_dir.with_name(cache_dir.name + '.building')
+    shutil.rmtree(build_dir, ignore_errors=True)
+    build_dir.mkdir(parents=True)
+
+    print(f"Building telemetry cache for {csv_path}...")
+    stat = os.stat(csv_path)
+    decoder = TimestampDecoder()
+    checker = QualityChecker(schema)
+    categories = {name: {} for name in CATEGORICAL_COLUMNS}
+    files = {name: open(build_dir / f"{name}.bin", 'wb') for name in CACHE_COLUMNS}
+    rows = 0
+
+    try:
+        for chunk in traced_chunks(read_telemetry_csv(csv_path, chunksize=chunk_size)):
+            with stage('convert', rows=len(chunk)):
+                typed = convert_chunk(chunk, decoder)
+            with stage('validate', rows=len(typed)):
+                checker.check(chunk, typed)
+            with stage('write', rows=len(typed)):
+                write_cache_chunk(typed, files, categories)
+            rows += len(typed)
+            memory_mark()
+    finally:
+        for f in files.values():
+            f.close()
+
+    decoder.report()
+    checker.report()
+    with open(build_dir / 'quality.json', 'w') as f:
+        json.dump(checker.summary(decoder), f, indent=2, default=str)
+    write_meta(build_dir, {
+        'version': CACHE_VERSION,
+        'source': str(csv_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_digest(csv_path),
+        'rows': rows,
+        'timestamps': decoder.counts(),
+        'columns': CACHE_COLUMNS,
+        'categories': {name: list(known) for name, known in categories.items()},
+    })
+
+    # The row index is part of the cache, so readers never race to build it
+    vehicle_row_index(build_dir)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    build_dir.rename(cache_dir)
+    print(f"✓ Cached {rows} rows to {cache_dir}")
+    return cache_dir
+
+def read_quality_report(cache_dir: Path) -> dict:
+    """The data-quality report written with the cache (None for caches built before it existed)"""
+    quality_file = Path(cache_dir) / 'quality.json'
+    if not quality_file.exists():
+        return None
+    with open(quality_file) as f:
+        return json.load(f)
+
+def report_cached_timestamps(cache_dir: Path):
+    """Repeat the build's timestamp warning on cached loads, where NaT no longer says missing vs unparseable"""
+    counts = read_meta(cache_dir)['timestamps']
+    if counts['missing'] or counts['unparseable']:
+        print(f"Telemetry cache {cache_dir}, when built:")
+        TimestampDecoder.from_counts(counts).report()
+
+def ensure_cache(csv_path: str) -> Path:
+    """Return a valid cache directory for the CSV, building it if needed"""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    cache_dir = cache_dir_for(csv_path)
+    if is_cache_valid(csv_path, cache_dir):
+        report_cached_timestamps(cache_dir)
+        return cache_dir
+    return write_cache(csv_path)
+
+def column_memmap(cache_dir: Path, meta: dict, name: str) -> np.ndarray:
+    """Read-only memory map of one cached column"""
+    dtype = meta['columns'][name]
+    if meta['rows'] == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(Path(cache_dir) / f"{name}.bin", dtype=dtype, mode='r', shape=(meta['rows'],))
+
+def cached_frame(cache_dir: Path, meta: dict, columns: list, select, index: pd.Index) -> pd.DataFrame:
+    """Build a DataFrame from the rows select() picks out of each column"""
+    data = {}
+    for name in columns or list(CACHE_COLUMNS):
+        values = select(column_memmap(cache_dir, meta, name))
+        if name in CATEGORICAL_COLUMNS:
+            data[name] = pd.Series(pd.Categorical.from_codes(values, categories=meta['categories'][name]), index=index)
+        elif name == 'timestamp':
+            data[name] = pd.Series(values.view('datetime64[ms]'), index=index).dt.tz_localize('UTC')
+        else:
+            data[name] = pd.Series(values, index=index, copy=False)
+    return pd.DataFrame(data, index=index, copy=False)
+
+def open_cache(cache_dir: Path, columns: list = None, start: int = 0, stop: int = None) -> pd.DataFrame:
+    """Memory-map cached columns as a DataFrame (rows start:stop)"""
+    meta = read_meta(cache_dir)
+    stop = meta['rows'] if stop is None else min(stop, meta['rows'])
+    return cached_frame(cache_dir, meta, columns, lambda values: values[start:stop], pd.RangeIndex(start, stop))
+
+def open_cache_rows(cache_dir: Path, rows: np.ndarray, columns: list = None) -> pd.DataFrame:
+    """Gather specific (sorted) row positions from the cache; the index keeps the file positions"""
+    meta = read_meta(cache_dir)
+    return cached_frame(cache_dir, meta, columns, lambda values: values[rows], pd.Index(rows))
+
+def vehicle_row_index(cache_dir: Path):
+    """
+    Row positions grouped by vehicle, in file order within each vehicle.
+    Returns (order, spans) where order[start:stop] are the rows of one vehicle and
+    spans is a list of (vehicle_id, start, stop). Built once per cache and kept on disk.
+    """
+    cache_dir = Path(cache_dir)
+    meta = read_meta(cache_dir)
+    order_file = cache_dir / 'vehicle_order.bin'
+    spans_file = cache_dir / 'vehicle_spans.json'
+
+    if not spans_file.exists():
+        codes = np.asarray(column_memmap(cache_dir, meta, 'vehicle_id'))
+        order = np.argsort(codes, kind='stable').astype('int64')
+        counts = np.bincount(codes[codes >= 0], minlength=len(meta['categories']['vehicle_id']))
+        start = int((codes < 0).sum())  # rows without a vehicle_id sort first and are skipped
+        spans = []
+        for code, count in enumerate(counts):
+            if count:
+                spans.append((meta['categories']['vehicle_id'][code], start, start + int(count)))
+                start += int(count)
+        # Per-process temp names: concurrent readers of a fresh cache may all build the index at once,
+        # and spans_file (the "index is complete" marker) is replaced last
+        order_tmp = order_file.with_name(f"{order_file.name}.{os.getpid()}.tmp")
+        order.tofile(order_tmp)
+        os.replace(order_tmp, order_file)
+        spans_tmp = spans_file.with_name(f"{spans_file.name}.{os.getpid()}.tmp")
+        with open(spans_tmp, 'w') as f:
+            json.dump(spans, f)
+        os.replace(spans_tmp, spans_file)
+
+    with open(spans_file) as f:
+        spans = [tuple(span) for span in json.load(f)]
+    order = np.memmap(order_file, dtype='int64', mode='r') if meta['rows'] else np.empty(0, dtype='int64')
+    return order, spans
+
+def open_vehicle_rows(cache_dir: Path, start: int, stop: int, columns: list = None) -> pd.DataFrame:
+    """Rows of one vehicle span from vehicle_row_index, in file order"""
+    order, _ = vehicle_row_index(cache_dir)
+    return open_cache_rows(cache_dir, np.asarray(order[start:stop]), columns)
+
+def shard_spans(spans: list, workers: int) -> list:
+    """
+    Split vehicle spans into at most `workers` shards of similar row counts.
+    Greedy largest-first, so the assignment is deterministic.
+    """
+    shards = [[] for _ in range(max(1, min(workers, len(spans))))]
+    loads = [0] * len(shards)
+    for span in sorted(spans, key=lambda span: (span[1] - span[2], span[0])):
+        target = loads.index(min(loads))
+        shards[target].append(span)
+        loads[target] += span[2] - span[1]
+    return [shard for shard in shards if shard]
+
+def load_telemetry(csv_path: str, columns: list = None, nrows: int = None, build_cache: bool = True) -> pd.DataFrame:
+    """
+    Load the telemetry CSV as typed columns.
+    Uses (and by default builds) the binary cache; with build_cache=False a cold
+    cache falls back to parsing the text directly.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    cache_dir = cache_dir_for(csv_path)
+    if build_cache or is_cache_valid(csv_path, cache_dir):
+        return open_cache(ensure_cache(csv_path), columns, stop=nrows)
+
+    chunk = read_telemetry_csv(csv_path, nrows=nrows)
+    typed = convert_chunk(chunk, TimestampDecoder())
+    return typed[columns] if columns else typed
+
+def iter_telemetry_chunks(csv_path: str, chunk_size: int = 100000, columns: list = None, build_cache: bool = True):
+    """Yield typed telemetry chunks, from the cache when available"""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    cache_dir = cache_dir_for(csv_path)
+    if build_cache or is_cache_valid(csv_path, cache_dir):
+        cache_dir = ensure_cache(csv_path)
+        rows = read_meta(cache_dir)['rows']
+        for start in range(0, rows, chunk_size):
+            yield open_cache(cache_dir, columns, start, start + chunk_size)
+        return
+
+    decoder = TimestampDecoder()
+    for chunk in read_telemetry_csv(csv_path, chunksize=chunk_size):
+        typed = convert_chunk(chunk, decoder)
+        yield typed[columns] if columns else typed
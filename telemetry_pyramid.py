@@ -0,0 +1,185 @@
+"""
+PitGPT - Multi-resolution telemetry pyramid
+Per driver and channel, min/max/mean buckets at 4x, 16x, 64x, ... decimation of the frames, so a chart
+fetches the level that matches its pixel width: a race overview is a few hundred buckets, a zoomed-in
+corner falls through to the full-rate frames.
+"""
+
+import argparse
+import gzip
+import struct
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from frame_format import FRAME_COLUMNS
+
+MAGIC = b'PGTP'
+FORMAT_VERSION = 1
+FLAG_GZIP = 1
+PYRAMID_FACTOR = 4     # frames per bucket grows by this much per level
+MIN_BUCKETS = 128      # the coarsest level still has at least this many buckets
+PYRAMID_CHANNELS = [name for name, _ in FRAME_COLUMNS if name not in ('timestamp', 'lap')]
+STATS = ['min', 'max', 'mean']
+
+# magic, version, flags, level count, channel count, vehicle_id length (little-endian)
+HEADER = struct.Struct('<4sBBHHH')
+LEVEL = struct.Struct('<II')  # frames per bucket, bucket count
+
+class Pyramid:
+    """
+    One driver's decimation levels.
+    Level i (factors[i] frames per bucket) owns rows offsets[i]:offsets[i + 1] of timestamp, count and
+    every channel's min/max/mean arrays; a bucket covers timestamp[row] up to the next bucket's start.
+    """
+
+    def __init__(self, vehicle_id: str, factors: np.ndarray, offsets: np.ndarray, timestamp: np.ndarray,
+                 count: np.ndarray, stats: dict):
+        self.vehicle_id = vehicle_id
+        self.factors = factors
+        self.offsets = offsets
+        self.timestamp = timestamp
+        self.count = count
+        self.stats = stats  # (channel, stat) -> float32 array
+
+    def level_for(self, start_ms: int, end_ms: int, width: int) -> int:
+        """Coarsest level with at least `width` buckets in the window; -1 when only the raw frames are fine enough"""
+        for level in range(len(self.factors) - 1, -1, -1):
+            first, last = self.bounds(level, start_ms, end_ms)
+            if last - first >= width:
+                return level
+        return -1
+
+    def bounds(self, level: int, start_ms: int, end_ms: int) -> tuple:
+        """Row range of the level's buckets overlapping [start_ms, end_ms)"""
+        lo, hi = self.offsets[level], self.offsets[level + 1]
+        timestamps = self.timestamp[lo:hi]
+        first = max(int(np.searchsorted(timestamps, start_ms, side='right')) - 1, 0)
+        last = int(np.searchsorted(timestamps, end_ms, side='left'))
+        return lo + first, lo + max(last, first)
+
+    def window(self, level: int, start_ms: int, end_ms: int, channels: list = None) -> pd.DataFrame:
+        """A level's buckets in [start_ms, end_ms): timestamp, count and <channel>_min/_max/_mean"""
+        first, last = self.bounds(level, start_ms, end_ms)
+        window = pd.DataFrame({'timestamp': self.timestamp[first:last], 'count': self.count[first:last]})
+        for channel in channels or PYRAMID_CHANNELS:
+            for stat in STATS:
+                window[f"{channel}_{stat}"] = self.stats[channel, stat][first:last]
+        return window
+
+def frame_window(frames: pd.DataFrame, channels: list = None) -> pd.DataFrame:
+    """Raw frames in the same layout as Pyramid.window (each frame is a bucket of one)"""
+    window = pd.DataFrame({'timestamp': frames['timestamp'].to_numpy(dtype='int64'), 'count': 1})
+    for channel in channels or PYRAMID_CHANNELS:
+        values = frames[channel].to_numpy(dtype='float32')
+        for stat in STATS:
+            window[f"{channel}_{stat}"] = values
+    return window
+
+def build_pyramid(vehicle_id: str, frames: pd.DataFrame, factor: int = PYRAMID_FACTOR,
+                  min_buckets: int = MIN_BUCKETS) -> Pyramid:
+    """
+    Decimate sorted frames level by level: each level is reduced from the one below it
+    (min of mins, max of maxes, count-weighted mean), so the whole pyramid costs about n/3 bucket reductions
+    """
+    timestamp = frames['timestamp'].to_numpy(dtype='int64')
+    count = np.ones(len(timestamp), dtype='int64')
+    current = {(channel, stat): frames[channel].to_numpy(dtype='float64') for channel in PYRAMID_CHANNELS for stat in STATS}
+
+    factors, levels = [], []
+    frames_per_bucket = 1
+    while True:
+        starts = np.arange(0, len(timestamp), factor)
+        if len(timestamp) == 0 or (levels and len(starts) < min_buckets):
+            break
+        frames_per_bucket *= factor
+        bucket_count = np.add.reduceat(count, starts)
+        reduced = {}
+        for channel in PYRAMID_CHANNELS:
+            reduced[channel, 'min'] = np.minimum.reduceat(current[channel, 'min'], starts)
+            reduced[channel, 'max'] = np.maximum.reduceat(current[channel, 'max'], starts)
+            reduced[channel, 'mean'] = np.add.reduceat(current[channel, 'mean'] * count, starts) / bucket_count
+        timestamp, count, current = timestamp[starts], bucket_count, reduced
+        factors.append(frames_per_bucket)
+        levels.append((timestamp, count, current))
+
+    offsets = np.concatenate([[0], np.cumsum([len(level[0]) for level in levels], dtype='int64')])
+    stats = {key: np.concatenate([level[2][key] for level in levels]).astype('float32') if levels
+             else np.zeros(0, dtype='float32') for key in ((channel, stat) for channel in PYRAMID_CHANNELS for stat in STATS)}
+    return Pyramid(vehicle_id, np.array(factors, dtype='int64'), offsets,
+                   np.concatenate([level[0] for level in levels]) if levels else np.zeros(0, dtype='int64'),
+                   np.concatenate([level[1] for level in levels]) if levels else np.zeros(0, dtype='int64'), stats)
+
+def encode_pyramid(pyramid: Pyramid, compress: bool = True) -> bytes:
+    """Pyramid file bytes: header, vehicle_id, level table, then timestamp/count/channel stats columns"""
+    id_bytes = pyramid.vehicle_id.encode('utf-8')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_GZIP if compress else 0, len(pyramid.factors),
+                         len(PYRAMID_CHANNELS), len(id_bytes)) + id_bytes
+    header += b'\0' * (-len(header) % 8)
+    header += b''.join(LEVEL.pack(int(factor), int(stop - start)) for factor, start, stop
+                       in zip(pyramid.factors, pyramid.offsets[:-1], pyramid.offsets[1:]))
+
+    body = bytearray(pyramid.timestamp.astype('<i8').tobytes())
+    body += pyramid.count.astype('<u4').tobytes()
+    for channel in PYRAMID_CHANNELS:
+        for stat in STATS:
+            body += pyramid.stats[channel, stat].astype('<f4').tobytes()
+    if compress:
+        # mtime=0 keeps the output byte-identical for identical frames
+        return header + gzip.compress(bytes(body), compresslevel=6, mtime=0)
+    return header + bytes(body)
+
+def decode_pyramid(data: bytes) -> Pyramid:
+    magic, version, flags, level_count, channel_count, id_length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION or channel_count != len(PYRAMID_CHANNELS):
+        raise ValueError(f"Not a version {FORMAT_VERSION} PitGPT pyramid file")
+
+    offset = HEADER.size
+    vehicle_id = data[offset:offset + id_length].decode('utf-8')
+    offset += id_length
+    offset += -offset % 8
+    levels = [LEVEL.unpack_from(data, offset + i * LEVEL.size) for i in range(level_count)]
+    offset += level_count * LEVEL.size
+
+    body = data[offset:]
+    if flags & FLAG_GZIP:
+        body = gzip.decompress(body)
+    rows = sum(buckets for _, buckets in levels)
+    timestamp = np.frombuffer(body, dtype='<i8', count=rows)
+    position = rows * 8
+    count = np.frombuffer(body, dtype='<u4', count=rows, offset=position).astype('int64')
+    position += rows * 4
+    stats = {}
+    for channel in PYRAMID_CHANNELS:
+        for stat in STATS:
+            stats[channel, stat] = np.frombuffer(body, dtype='<f4', count=rows, offset=position)
+            position += rows * 4
+    offsets = np.concatenate([[0], np.cumsum([buckets for _, buckets in levels], dtype='int64')])
+    return Pyramid(vehicle_id, np.array([factor for factor, _ in levels], dtype='int64'), offsets, timestamp, count, stats)
+
+def pyramid_file_name(vehicle_id: str) -> str:
+    safe_id = vehicle_id.replace('/', '_').replace('\\', '_')
+    return f"{safe_id}_pyramid.bin"
+
+def encode_driver_pyramid(vehicle_id: str, vehicle_frames: pd.DataFrame, compress: bool = True) -> tuple:
+    """One driver's pyramid file in memory; returns (file name, file bytes)"""
+    return pyramid_file_name(vehicle_id), encode_pyramid(build_pyramid(vehicle_id, vehicle_frames), compress)
+
+def read_pyramid(input_file) -> Pyramid:
+    with open(input_file, 'rb') as f:
+        return decode_pyramid(f.read())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build pyramid files next to existing per-driver frame files")
+    parser.add_argument("--frames-dir", default="pitgpt---toyota-gr-cup-ai-engineer/public/barber/telemetry")
+    args = parser.parse_args()
+
+    from telemetry_store import TelemetryStore
+    store = TelemetryStore(args.frames_dir)
+    for vehicle_id in store.vehicles():
+        frames = store.frames(vehicle_id)
+        file_name, data = encode_driver_pyramid(vehicle_id, frames)
+        (Path(args.frames_dir) / file_name).write_bytes(data)
+        pyramid = decode_pyramid(data)
+        print(f"✓ {vehicle_id}: {len(frames):,} frames → levels {', '.join(f'{f}x' for f in pyramid.factors)} "
+              f"({len(data):,} bytes)")
+    print(f"\n✅ Pyramids for {len(store.vehicles())} drivers written to {args.frames_dir}")
@@ -0,0 +1,271 @@
+"""
+PitGPT - Telemetry data-quality checks
+Schema, per-channel value ranges, timestamp order, duplicate samples and lap-counter glitches, checked with
+vectorized ops on each chunk of the CSV read and counted into a JSON report instead of being silently
+coerced or dropped.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from lap_table import find_column, parse_lap_times
+
+# Plausible range per telemetry_name; values outside are counted, not changed
+CHANNEL_RANGES = {
+    'aps': (0, 100),                  # throttle %
+    'pbrake_f': (0, 200),             # bar
+    'pbrake_r': (0, 200),
+    'Steering_Angle': (-720, 720),    # degrees
+    'accx_can': (-5, 5),              # g
+    'accy_can': (-5, 5),
+    'gear': (0, 6),
+    'nmot': (0, 10000),               # rpm
+    'speed': (0, 350),                # km/h
+}
+NUMERIC_COLUMNS = ['vehicle_number', 'lap', 'telemetry_value']
+MAX_LAP = 1000    # lap counters above this are logger glitches (e.g. the 32768 sentinel)
+MAX_EXAMPLES = 5
+NAT = np.iinfo('int64').min
+
+def check_schema(columns: list, required: list) -> dict:
+    """Required columns (matched with surrounding spaces stripped), padded names and extra columns"""
+    stripped = [column.strip() for column in columns]
+    return {
+        'columns': list(columns),
+        'missing': [column for column in required if column not in stripped],
+        'padded': [column for column in columns if column != column.strip()],
+        'unexpected': [column for column in columns if column.strip() not in required],
+    }
+
+def sorted_lap_key(laps: np.ndarray) -> np.ndarray:
+    """
+    Non-decreasing int64 lap key for time-sorted samples.
+    Runs of out-of-range laps (NaN, negative, above MAX_LAP) or spikes more than one lap ahead take the
+    previous good lap before the running max, so one glitch can't swallow the rest of the race; a jump ahead
+    is kept when the lap after it doesn't fall back (the logger missed a lap).
+    """
+    laps = np.asarray(laps, dtype='float64')
+    if len(laps) == 0:
+        return np.empty(0, dtype='int64')
+    # Runs of equal laps: the loop below is per lap change, not per sample
+    firsts = np.flatnonzero(np.append(True, (laps[1:] != laps[:-1]) & ~(np.isnan(laps[1:]) & np.isnan(laps[:-1]))))
+    values = laps[firsts]
+    in_range = ~np.isnan(values) & (values >= 0) & (values <= MAX_LAP)
+    cleaned = np.full(len(values), np.nan)
+    previous = None
+    for i, value in enumerate(values):
+        if not in_range[i]:
+            continue
+        if previous is not None and value > previous + 1:
+            following = next((values[j] for j in range(i + 1, len(values)) if in_range[j]), None)
+            if following is None or following < value:
+                continue
+        cleaned[i] = previous = value if previous is None else max(previous, value)
+    cleaned = pd.Series(cleaned).ffill().bfill().fillna(0).to_numpy()
+    return np.repeat(cleaned, np.diff(np.append(firsts, len(laps)))).astype('int64')
+
+class QualityChecker:
+    """
+    Data-quality counts accumulated chunk by chunk, alongside TimestampDecoder's.
+    Ordering, duplicate and lap checks run per (vehicle, channel) sample stream in file order; each stream's
+    last timestamp and lap carry over to the next chunk, so chunk boundaries don't hide or invent problems.
+    """
+
+    def __init__(self, schema: dict = None):
+        self.schema = schema or {}
+        self.rows = 0
+        self.missing = {}
+        self.non_numeric = {name: 0 for name in NUMERIC_COLUMNS}
+        self.channels = {}   # telemetry_name -> counts and observed min/max
+        self.counts = {'backwards_timestamps': 0, 'duplicate_samples': 0, 'conflicting_duplicates': 0,
+                       'lap_backwards': 0, 'lap_jumps': 0, 'lap_out_of_range': 0}
+        self.examples = {}
+        self.last = {}       # (vehicle_id, telemetry_name) -> (timestamp ms, lap, value) of the stream's last sample
+        self.seconds = 0.0
+
+    def example(self, check: str, values):
+        examples = self.examples.setdefault(check, [])
+        for value in values:
+            if len(examples) >= MAX_EXAMPLES:
+                break
+            examples.append(value)
+
+    def check(self, raw: pd.DataFrame, typed: pd.DataFrame):
+        """Check one chunk: raw is the text read (for coercion counts), typed is convert_chunk's output"""
+        start = time.perf_counter()
+        self.rows += len(typed)
+        # Empty in the CSV; unparseable values are counted as non-numeric here and by the TimestampDecoder
+        for name in raw.columns:
+            self.missing[name] = self.missing.get(name, 0) + int(raw[name].isna().sum())
+        for name in NUMERIC_COLUMNS:
+            if not pd.api.types.is_numeric_dtype(raw[name]):
+                coerced = raw[name].notna().to_numpy() & typed[name].isna().to_numpy()
+                self.non_numeric[name] += int(coerced.sum())
+                if coerced.any():
+                    self.example(f"non_numeric_{name}", raw[name][coerced].astype(str).unique()[:MAX_EXAMPLES].tolist())
+
+        names = typed['telemetry_name'].cat
+        vehicles = typed['vehicle_id'].cat
+        name_codes = names.codes.to_numpy().astype('int64')
+        vehicle_codes = vehicles.codes.to_numpy().astype('int64')
+        values = typed['telemetry_value'].to_numpy(dtype='float64')
+        self.check_ranges(list(names.categories), name_codes, values)
+
+        # (vehicle, channel) streams in file order; rows without a vehicle, channel or timestamp are only counted above
+        timestamps = typed['timestamp'].dt.tz_localize(None).to_numpy().view('int64')
+        usable = (name_codes >= 0) & (vehicle_codes >= 0) & (timestamps != NAT)
+        stream = vehicle_codes * len(names.categories) + name_codes
+        order = np.flatnonzero(usable)[np.argsort(stream[usable], kind='stable')]
+        self.check_streams(stream[order], timestamps[order], typed['lap'].to_numpy(dtype='float64')[order],
+                           values[order], list(vehicles.categories), list(names.categories), len(names.categories))
+        self.seconds += time.perf_counter() - start
+
+    def check_ranges(self, categories: list, name_codes: np.ndarray, values: np.ndarray):
+        """Per-channel sample, missing and out-of-range counts and observed min/max"""
+        low = np.array([CHANNEL_RANGES.get(name, (-np.inf, np.inf))[0] for name in categories] + [-np.inf])
+        high = np.array([CHANNEL_RANGES.get(name, (-np.inf, np.inf))[1] for name in categories] + [np.inf])
+        size = len(categories) + 1
+        slots = np.where(name_codes < 0, size - 1, name_codes)  # no telemetry_name: the last slot, never reported
+        present = ~np.isnan(values)
+        outside = present & ((values < low[slots]) | (values > high[slots]))
+        samples = np.bincount(slots, minlength=size)
+        missing = np.bincount(slots[~present], minlength=size)
+        out_of_range = np.bincount(slots[outside], minlength=size)
+        extremes = pd.Series(values[present]).groupby(slots[present]).agg(['min', 'max'])
+        for code, name in enumerate(categories):
+            if samples[code] == 0:
+                continue
+            channel = self.channels.setdefault(name, {'samples': 0, 'missing': 0, 'out_of_range': 0,
+                                                      'min': None, 'max': None,
+                                                      'range': list(CHANNEL_RANGES[name]) if name in CHANNEL_RANGES else None})
+            channel['samples'] += int(samples[code])
+            channel['missing'] += int(missing[code])
+            channel['out_of_range'] += int(out_of_range[code])
+            if code in extremes.index:
+                low_seen, high_seen = float(extremes.at[code, 'min']), float(extremes.at[code, 'max'])
+                channel['min'] = low_seen if channel['min'] is None else min(channel['min'], low_seen)
+                channel['max'] = high_seen if channel['max'] is None else max(channel['max'], high_seen)
+            if out_of_range[code]:
+                self.example('out_of_range', [f"{name}={value:g}" for value in values[outside & (name_codes == code)][:2]])
+
+    def check_streams(self, stream: np.ndarray, timestamps: np.ndarray, laps: np.ndarray, values: np.ndarray,
+                      vehicles: list, names: list, name_count: int):
+        """Timestamp order, duplicates and lap-counter steps within each sorted (vehicle, channel) stream"""
+        if len(stream) == 0:
+            return
+        firsts = np.flatnonzero(np.append(True, stream[1:] != stream[:-1]))
+        lasts = np.append(firsts[1:] - 1, len(stream) - 1)
+        keys = [(vehicles[code // name_count], names[code % name_count]) for code in stream[firsts]]
+
+        # Previous sample of every row: the row before it in the stream, or the stream's carried-over last sample
+        previous_ts = np.concatenate([[0], timestamps[:-1]])
+        previous_lap = np.concatenate([[np.nan], laps[:-1]])
+        previous_value = np.concatenate([[np.nan], values[:-1]])
+        has_previous = np.ones(len(stream), dtype=bool)
+        for first, key in zip(firsts, keys):
+            carried = self.last.get(key)
+            has_previous[first] = carried is not None
+            if carried is not None:
+                previous_ts[first], previous_lap[first], previous_value[first] = carried
+
+        backwards = has_previous & (timestamps < previous_ts)
+        duplicate = has_previous & (timestamps == previous_ts)
+        conflicting = duplicate & ~((values == previous_value) | (np.isnan(values) & np.isnan(previous_value)))
+        lap_invalid = (laps < 0) | (laps > MAX_LAP)
+        lap_steps = has_previous & ~np.isnan(laps) & ~np.isnan(previous_lap) & ~lap_invalid & \
+            (previous_lap >= 0) & (previous_lap <= MAX_LAP)
+        lap_backwards = lap_steps & (laps < previous_lap)
+        lap_jumps = lap_steps & (laps > previous_lap + 1)
+
+        for check, mask in (('backwards_timestamps', backwards), ('duplicate_samples', duplicate),
+                            ('conflicting_duplicates', conflicting), ('lap_backwards', lap_backwards),
+                            ('lap_jumps', lap_jumps), ('lap_out_of_range', lap_invalid)):
+            self.counts[check] += int(mask.sum())
+            if mask.any() and len(self.examples.get(check, [])) < MAX_EXAMPLES:
+                rows = np.flatnonzero(mask)[:MAX_EXAMPLES]
+                stream_of = np.searchsorted(firsts, rows, side='right') - 1
+                self.example(check, [f"{keys[i][0]} {keys[i][1]} @ {pd.Timestamp(timestamps[row], unit='ms').isoformat()}"
+                                     f" lap {laps[row]:g}" for row, i in zip(rows, stream_of)])
+
+        for key, last in zip(keys, lasts):
+            self.last[key] = (timestamps[last], laps[last], values[last])
+
+    def summary(self, decoder=None) -> dict:
+        """The data-quality report (timestamp parse counts come from the chunk read's TimestampDecoder)"""
+        return {
+            'rows': self.rows,
+            'schema': self.schema,
+            'missing': self.missing,
+            'non_numeric': self.non_numeric,
+            'timestamps': decoder.counts() if decoder is not None else None,
+            'channels': self.channels,
+            'streams': len(self.last),
+            **self.counts,
+            'examples': self.examples,
+            'check_seconds': round(self.seconds, 3),
+        }
+
+    def report(self):
+        """Print a summary of what the checks found"""
+        problems = {name: count for name, count in self.counts.items() if count}
+        problems.update({f"missing {name}": count for name, count in self.missing.items() if count})
+        problems.update({f"non-numeric {name}": count for name, count in self.non_numeric.items() if count})
+        problems.update({f"{name} out of range": channel['out_of_range'] for name, channel in self.channels.items()
+                         if channel['out_of_range']})
+        if self.schema.get('padded'):
+            problems['padded column names'] = len(self.schema['padded'])
+        if not problems:
+            print(f"✓ Data quality: {self.rows} rows, {len(self.last)} channel streams, no issues")
+            return
+        print(f"⚠️  Data quality: {self.rows} rows, {len(problems)} kinds of issue")
+        for name, count in sorted(problems.items(), key=lambda item: -item[1]):
+            print(f"   {name}: {count}")
+
+def check_lap_times(lap_times_df: pd.DataFrame) -> dict:
+    """Lap-time file checks: padded column names, rows without a car number and unparseable lap times"""
+    time_column, lap_column = find_column(lap_times_df, 'LAP_TIME'), find_column(lap_times_df, 'LAP_NUMBER')
+    numbers = pd.to_numeric(lap_times_df['NUMBER'], errors='coerce') if 'NUMBER' in lap_times_df else None
+    times = parse_lap_times(lap_times_df[time_column]) if time_column else None
+    unparseable = (lap_times_df[time_column].notna() & times.isna()) if time_column else None
+    return {
+        'rows': len(lap_times_df),
+        'padded': [column for column in lap_times_df.columns if column != column.strip()],
+        'missing_columns': [name for name, column in (('NUMBER', 'NUMBER' if numbers is not None else None),
+                                                      ('LAP_TIME', time_column), ('LAP_NUMBER', lap_column)) if column is None],
+        'missing_number': int(numbers.isna().sum()) if numbers is not None else None,
+        'unparseable_lap_times': int(unparseable.sum()) if unparseable is not None else None,
+        'unparseable_examples': lap_times_df[time_column][unparseable].astype(str).unique()[:MAX_EXAMPLES].tolist()
+                                if unparseable is not None else [],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Data-quality report for a telemetry CSV (and its lap-time file)")
+    parser.add_argument("--telemetry-csv", default="barber/R1_barber_telemetry_data.csv")
+    parser.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    parser.add_argument("--chunk-size", type=int, default=1000000)
+    parser.add_argument("--output", default="data_quality.json")
+    args = parser.parse_args()
+
+    from telemetry_cache import CACHE_COLUMNS, convert_chunk, read_telemetry_csv
+    from telemetry_timestamps import TimestampDecoder
+
+    schema = check_schema(list(pd.read_csv(args.telemetry_csv, nrows=0).columns), list(CACHE_COLUMNS))
+    checker, decoder = QualityChecker(schema), TimestampDecoder()
+    start = time.perf_counter()
+    for chunk in read_telemetry_csv(args.telemetry_csv, chunksize=args.chunk_size):
+        checker.check(chunk, convert_chunk(chunk, decoder))
+    elapsed = time.perf_counter() - start
+    decoder.report()
+    checker.report()
+
+    report = {'telemetry_csv': args.telemetry_csv, **checker.summary(decoder)}
+    try:
+        report['lap_times'] = check_lap_times(pd.read_csv(args.lap_times_csv, sep=';'))
+    except FileNotFoundError:
+        print(f"⚠️  Lap times CSV not found: {args.lap_times_csv}")
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n✅ Report saved to {args.output} (checks took {checker.seconds:.2f}s of {elapsed:.2f}s, "
+          f"{100 * checker.seconds / max(elapsed - checker.seconds, 1e-9):.1f}% over parsing)")
@@ -0,0 +1,159 @@
+"""
+Time- and lap-indexed telemetry store over the preprocess_telemetry output
+Per-vehicle frames stay sorted by timestamp; lap and time range queries are a binary search plus a slice
+"""
+
+import json
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from frame_format import read_frames_binary
+from telemetry_pyramid import Pyramid, build_pyramid, pyramid_file_name, read_pyramid
+from telemetry_quality import sorted_lap_key
+
+FRAME_SUFFIXES = ['_telemetry.bin', '_telemetry.json']
+
+def safe_vehicle_id(vehicle_id: str) -> str:
+    """Filename form of a vehicle_id (same cleaning as preprocess_telemetry)"""
+    return vehicle_id.replace('/', '_').replace('\\', '_')
+
+class VehicleFrames:
+    """One vehicle's frames with its timestamp and lap search keys"""
+
+    def __init__(self, frames: pd.DataFrame):
+        self.frames = frames.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        self.timestamps = self.frames['timestamp'].to_numpy(dtype='int64')
+        # Sorted even if the lap counter briefly goes backwards or glitches (e.g. the 32768 sentinel)
+        self.lap_key = sorted_lap_key(self.frames['lap'].to_numpy())
+
+    def lap_bounds(self, first_lap: int, last_lap: int) -> tuple:
+        """Row range [start, stop) covering laps first_lap..last_lap inclusive"""
+        return (int(np.searchsorted(self.lap_key, first_lap, side='left')),
+                int(np.searchsorted(self.lap_key, last_lap, side='right')))
+
+    def time_bounds(self, start_ms: int, end_ms: int) -> tuple:
+        """Row range [start, stop) with start_ms <= timestamp < end_ms"""
+        return (int(np.searchsorted(self.timestamps, start_ms, side='left')),
+                int(np.searchsorted(self.timestamps, end_ms, side='left')))
+
+    def laps(self, first_lap: int, last_lap: int = None) -> pd.DataFrame:
+        start, stop = self.lap_bounds(first_lap, first_lap if last_lap is None else last_lap)
+        return self.frames.iloc[start:stop]
+
+    def time_range(self, start_ms: int, end_ms: int) -> pd.DataFrame:
+        start, stop = self.time_bounds(start_ms, end_ms)
+        return self.frames.iloc[start:stop]
+
+    def lap_offsets(self) -> pd.DataFrame:
+        """Lap boundary table: one row per lap with its [start, stop) offsets"""
+        laps, starts = np.unique(self.lap_key, return_index=True)
+        stops = np.append(starts[1:], len(self.lap_key))
+        return pd.DataFrame({'lap': laps, 'start': starts, 'stop': stops})
+
+class TelemetryStore:
+    """
+    Range queries over a directory of per-driver frame files (binary or JSON).
+    Vehicles are loaded lazily on first query and kept in memory; every lookup re-checks the file's stat, so a
+    rewritten file is reloaded. Safe to share between threads.
+    """
+
+    def __init__(self, frames_dir: str):
+        self.frames_dir = Path(frames_dir)
+        self.files = {}
+        self._vehicles = {}
+        self._loaded_stats = {}
+        self._pyramids = {}  # key -> (frame file stat it was loaded against, Pyramid)
+        self.lock = threading.RLock()
+        self.refresh()
+
+    def refresh(self):
+        """Rescan the directory and drop loaded vehicles whose frame file has changed"""
+        files = {}
+        for suffix in reversed(FRAME_SUFFIXES):  # binary wins when both exist
+            for path in sorted(self.frames_dir.glob(f"*{suffix}")):
+                files[path.name[:-len(suffix)]] = path
+        with self.lock:
+            self.files = files
+            for key in list(self._vehicles):
+                if key not in files or self.current_stat(key) != self._loaded_stats.get(key):
+                    self._vehicles.pop(key, None)
+            for key in list(self._pyramids):
+                if key not in files or self.current_stat(key) != self._pyramids[key][0]:
+                    self._pyramids.pop(key, None)
+
+    def file_stat(self, vehicle_id: str) -> tuple:
+        """(path, mtime_ns, size) of a vehicle's frame file, for change detection"""
+        path = self.files[safe_vehicle_id(vehicle_id)]
+        stat = path.stat()
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    def current_stat(self, key: str) -> tuple:
+        """file_stat, or None once the file is gone"""
+        try:
+            return self.file_stat(key)
+        except (KeyError, FileNotFoundError):
+            return None
+
+    def vehicles(self) -> list:
+        """Vehicle ids (filename form) available in the store"""
+        return sorted(self.files)
+
+    def loaded(self, vehicle_id: str) -> tuple:
+        """(frame file stat, VehicleFrames) with the frames loaded from exactly that version of the file"""
+        key = safe_vehicle_id(vehicle_id)
+        with self.lock:
+            stat = self.current_stat(key)
+            if stat is None:
+                raise KeyError(f"No frames for {vehicle_id} in {self.frames_dir}")
+            if key not in self._vehicles or self._loaded_stats.get(key) != stat:
+                path = self.files[key]
+                if path.suffix == '.bin':
+                    _, frames = read_frames_binary(path)
+                else:
+                    with open(path) as f:
+                        frames = pd.DataFrame(json.load(f))
+                self._vehicles[key] = VehicleFrames(frames)
+                self._loaded_stats[key] = stat
+            return self._loaded_stats[key], self._vehicles[key]
+
+    def vehicle(self, vehicle_id: str) -> VehicleFrames:
+        return self.loaded(vehicle_id)[1]
+
+    def frames(self, vehicle_id: str) -> pd.DataFrame:
+        """All frames for a vehicle, sorted by timestamp"""
+        return self.vehicle(vehicle_id).frames
+
+    def laps(self, vehicle_id: str, first_lap: int, last_lap: int = None) -> pd.DataFrame:
+        """Frames for laps first_lap..last_lap (inclusive)"""
+        return self.vehicle(vehicle_id).laps(first_lap, last_lap)
+
+    def time_range(self, vehicle_id: str, start_ms: int, end_ms: int) -> pd.DataFrame:
+        """Frames for a vehicle with start_ms <= timestamp < end_ms"""
+        return self.vehicle(vehicle_id).time_range(start_ms, end_ms)
+
+    def all_cars_time_range(self, start_ms: int, end_ms: int) -> pd.DataFrame:
+        """Frames for every vehicle in [start_ms, end_ms), ordered by vehicle then timestamp"""
+        windows = [self.time_range(vehicle_id, start_ms, end_ms) for vehicle_id in self.vehicles()]
+        windows = [window for window in windows if len(window)]
+        if not windows:
+            return pd.DataFrame()
+        return pd.concat(windows, ignore_index=True)
+
+    def lap_offsets(self, vehicle_id: str) -> pd.DataFrame:
+        """Lap boundary offsets for a vehicle"""
+        return self.vehicle(vehicle_id).lap_offsets()
+
+    def loaded_pyramid(self, vehicle_id: str) -> tuple:
+        """(frame file stat, Pyramid): its preprocessed _pyramid.bin, or built from the frames when there is none"""
+        key = safe_vehicle_id(vehicle_id)
+        with self.lock:
+            stat, vehicle = self.loaded(vehicle_id)
+            if key not in self._pyramids or self._pyramids[key][0] != stat:
+                path = self.frames_dir / pyramid_file_name(key)
+                pyramid = read_pyramid(path) if path.exists() else build_pyramid(key, vehicle.frames)
+                self._pyramids[key] = (stat, pyramid)
+            return self._pyramids[key]
+
+    def pyramid(self, vehicle_id: str) -> Pyramid:
+        return self.loaded_pyramid(vehicle_id)[1]
@@ -0,0 +1,128 @@
+"""
+Bulk timestamp decoding for telemetry CSV chunks
+Detects the fixed ISO format once, then converts whole columns to epoch milliseconds
+"""
+
+import numpy as np
+import pandas as pd
+
+# Tried in order against a sample of the column
+CANDIDATE_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%dT%H:%M:%SZ',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S',
+]
+DETECT_SAMPLE_SIZE = 1000
+MAX_EXAMPLES = 5
+
+def detect_timestamp_format(timestamps: pd.Series) -> str:
+    """Return the candidate format that parses the most sampled values ('ISO8601' if none match)"""
+    sample = timestamps.dropna().astype(str).str.strip().head(DETECT_SAMPLE_SIZE)
+    if len(sample) == 0:
+        return None
+    best_fmt, best_count = 'ISO8601', 0
+    for fmt in CANDIDATE_FORMATS:
+        count = pd.to_datetime(sample, format=fmt, utc=True, errors='coerce').notna().sum()
+        if count > best_count:
+            best_fmt, best_count = fmt, count
+        if count == len(sample):
+            break
+    return best_fmt
+
+def to_epoch_ms(datetimes: pd.Series) -> np.ndarray:
+    """Convert tz-aware datetimes to int64 epoch milliseconds (NaT -> 0)"""
+    epoch = pd.Timestamp(0, tz='UTC')
+    ms = (datetimes - epoch) // pd.Timedelta(milliseconds=1)
+    return ms.fillna(0).to_numpy(dtype='int64')
+
+class TimestampDecoder:
+    """
+    Decodes timestamp columns chunk by chunk.
+    The format is detected on the first chunk and reused; values that don't match it
+    get one ISO8601 retry, and whatever still fails is counted instead of silently dropped.
+    Naive timestamps are treated as UTC.
+    """
+
+    def __init__(self, fmt: str = None):
+        self.fmt = fmt
+        self.rows = 0
+        self.missing = 0
+        self.invalid = 0
+        self.invalid_examples = []
+        self.cached_empty = 0  # NaT in already-typed input: the CSV value was missing or unparseable
+
+    @classmethod
+    def from_counts(cls, counts: dict) -> 'TimestampDecoder':
+        """A decoder holding saved counts (e.g. the cache build's, from meta.json), for report()"""
+        decoder = cls(counts.get('format'))
+        decoder.rows = counts.get('rows', 0)
+        decoder.missing = counts.get('missing', 0)
+        decoder.invalid = counts.get('unparseable', 0)
+        decoder.invalid_examples = list(counts.get('examples', []))
+        return decoder
+
+    def counts(self) -> dict:
+        return {'rows': self.rows, 'missing': self.missing, 'unparseable': self.invalid,
+                'cached_empty': self.cached_empty, 'format': self.fmt, 'examples': self.invalid_examples}
+
+    def decode(self, timestamps: pd.Series):
+        """Decode a column; returns (int64 epoch-ms array, boolean valid mask)"""
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            return self.decode_datetimes(timestamps)
+
+        if self.fmt is None:
+            self.fmt = detect_timestamp_format(timestamps)
+
+        present = timestamps.notna().to_numpy()
+        text = timestamps.astype(str).str.strip()
+
+        if self.fmt is None:
+            datetimes = pd.Series(pd.NaT, index=timestamps.index, dtype='datetime64[ns, UTC]')
+        else:
+            datetimes = pd.to_datetime(text, format=self.fmt, utc=True, errors='coerce')
+            retry = datetimes.isna().to_numpy() & present
+            if retry.any() and self.fmt != 'ISO8601':
+                datetimes[retry] = pd.to_datetime(text[retry], format='ISO8601', utc=True, errors='coerce')
+
+        valid = datetimes.notna().to_numpy() & present
+        invalid = present & ~valid
+
+        self.rows += len(timestamps)
+        self.missing += int((~present).sum())
+        self.invalid += int(invalid.sum())
+        if invalid.any() and len(self.invalid_examples) < MAX_EXAMPLES:
+            needed = MAX_EXAMPLES - len(self.invalid_examples)
+            self.invalid_examples.extend(text[invalid].unique()[:needed].tolist())
+
+        return to_epoch_ms(datetimes), valid
+
+    def decode_datetimes(self, datetimes: pd.Series):
+        """
+        Already-typed column (e.g. from the binary cache). NaT can't say whether the CSV value was missing or
+        unparseable, so it is counted separately; the cache build's report has the split.
+        """
+        if self.fmt is None:
+            self.fmt = 'datetime64'
+        if datetimes.dt.tz is None:
+            datetimes = datetimes.dt.tz_localize('UTC')
+        valid = datetimes.notna().to_numpy()
+        self.rows += len(datetimes)
+        self.cached_empty += int((~valid).sum())
+        return to_epoch_ms(datetimes), valid
+
+    def report(self):
+        """Print a summary of skipped timestamps"""
+        skipped = self.missing + self.invalid + self.cached_empty
+        if skipped == 0:
+            print(f"✓ Parsed {self.rows} timestamps (format: {self.fmt})")
+            return
+        if self.cached_empty:
+            detail = f"{self.cached_empty} empty in the cache - missing or unparseable in the CSV"
+        else:
+            detail = f"{self.missing} missing, {self.invalid} unparseable"
+        print(f"⚠️  Skipped {skipped} of {self.rows} timestamps ({detail}, format: {self.fmt})")
+        if self.invalid_examples:
+            print(f"   Unparseable examples: {self.invalid_examples}")
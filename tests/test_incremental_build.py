@@ -0,0 +1,33 @@
+import pandas as pd
+from incremental_build import preprocess_incremental
+from synthetic_telemetry import TELEMETRY_FILE, generate_race
+
+def test_vehicles_dropped_from_the_input_are_removed(tmp_path):
+    generate_race(str(tmp_path), scale=0.04, cars=3, seed=2)
+    telemetry_csv = tmp_path / TELEMETRY_FILE
+    output_dir = tmp_path / 'telemetry'
+    preprocess_incremental(str(telemetry_csv), str(output_dir))
+    (output_dir / 'GR86-999-9_telemetry.json').write_text('[]')  # left over from an old JSON build
+    files = sorted(path.name for path in output_dir.iterdir())
+
+    telemetry = pd.read_csv(telemetry_csv)
+    dropped = telemetry['vehicle_id'].iloc[0]
+    telemetry[telemetry['vehicle_id'] != dropped].to_csv(telemetry_csv, index=False)
+    result = preprocess_incremental(str(telemetry_csv), str(output_dir))
+
+    remaining = sorted(path.name for path in output_dir.iterdir())
+    assert result['removed'] == 3 and result['built'] == 0
+    assert remaining == [name for name in files if not name.startswith((dropped, 'GR86-999-9'))]
+
+def test_new_channel_on_one_car_rebuilds_only_that_car(tmp_path):
+    generate_race(str(tmp_path), scale=0.04, cars=3, seed=2)
+    telemetry_csv = tmp_path / TELEMETRY_FILE
+    output_dir = tmp_path / 'telemetry'
+    preprocess_incremental(str(telemetry_csv), str(output_dir))
+
+    telemetry = pd.read_csv(telemetry_csv)
+    extra = telemetry.iloc[[0]].assign(telemetry_name='new_channel', telemetry_value=1.0)
+    pd.concat([telemetry, extra]).to_csv(telemetry_csv, index=False)
+    result = preprocess_incremental(str(telemetry_csv), str(output_dir))
+
+    assert result['built'] == 1 and result['reused'] == 2
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from lap_resample import MAX_LAP_MS, resample_vehicle
+
+def long_rows(laps: list, step_ms: int = 100) -> pd.DataFrame:
+    """One speed sample per lap entry, step_ms apart"""
+    timestamps = pd.Timestamp('2025-09-06T18:00:00Z') + pd.to_timedelta(np.arange(len(laps)) * step_ms, unit='ms')
+    return pd.DataFrame({
+        'vehicle_id': 'GR86-002-2',
+        'lap': laps,
+        'timestamp': timestamps.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z',
+        'telemetry_name': 'speed',
+        'telemetry_value': np.arange(len(laps), dtype='float64'),
+    })
+
+def test_lap_sentinel_does_not_merge_later_laps():
+    resampled = resample_vehicle(long_rows([1] * 5 + [2] * 5 + [32768] + [2] * 4 + [3] * 5), hz=10)
+    assert resampled.laps.tolist() == [1, 2, 3]
+    assert np.diff(resampled.offsets).tolist() == [5, 10, 5]
+
+def test_outlier_timestamp_grid_is_capped():
+    rows = long_rows([1] * 5 + [2] * 5)
+    rows.loc[9, 'timestamp'] = '2035-01-01T00:00:00.000Z'
+    resampled = resample_vehicle(rows, hz=10)
+    assert resampled.offsets[-1] <= 5 + MAX_LAP_MS // 100
+    assert np.diff(resampled.offsets)[0] == 5
+
+def test_mapped_channels_on_the_grid():
+    # (ms, telemetry_name, value); aps and gear both go silent from 400/300 ms to 2000 ms
+    samples = [(0, 'aps', 0.0), (400, 'aps', 40.0), (2000, 'aps', 80.0), (2400, 'aps', 100.0),
+               (0, 'gear', 2.0), (300, 'gear', 3.0), (2000, 'gear', 4.0), (2600, 'gear', 4.0)]
+    ms, names, values = zip(*samples[::-1])  # raw rows need not be in time order
+    rows = long_rows([1] * len(samples)).assign(telemetry_name=names, telemetry_value=values)
+    rows['timestamp'] = (pd.Timestamp('2025-09-06T18:00:00Z') + pd.to_timedelta(ms, unit='ms')) \
+        .strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z'
+    resampled = resample_vehicle(rows, hz=10, method='linear')
+
+    grid_ms = (resampled.timestamp - resampled.timestamp[0]).tolist()
+    assert grid_ms == list(range(0, 2700, 100))
+    at = {t: i for i, t in enumerate(grid_ms)}
+    throttle, gear = resampled.channels['throttle'], resampled.channels['gear']
+
+    # Linear between samples; a gap up to MAX_GAP_MS (1000) still interpolates, past it is NaN
+    assert throttle[[at[0], at[200], at[400], at[1400], at[2200], at[2600]]].tolist() == [0, 20, 40, 65, 90, 100]
+    assert np.isnan(throttle[at[1500]:at[2000]]).all()
+    # Gear is forward-filled, never interpolated, with the same gap rule
+    assert gear[[at[0], at[200], at[300], at[1300], at[2000], at[2500]]].tolist() == [2, 2, 3, 3, 4, 4]
+    assert np.isnan(gear[at[1400]:at[2000]]).all()
+    assert np.isnan(resampled.channels['rpm']).all()
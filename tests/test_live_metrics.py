@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+from compute_metrics import compute_metrics_table
+from live_metrics import LiveRaceMetrics
+from synthetic_telemetry import LAP_TIMES_FILE, TELEMETRY_FILE, generate_race
+
+@pytest.fixture(scope='module')
+def race(tmp_path_factory):
+    race_dir = tmp_path_factory.mktemp('race')
+    generate_race(str(race_dir), scale=0.12, cars=3, seed=1)
+    return pd.read_csv(race_dir / TELEMETRY_FILE), pd.read_csv(race_dir / LAP_TIMES_FILE, sep=';')
+
+@pytest.mark.parametrize('seed', range(4))
+def test_random_splits_match_batch(race, seed):
+    telemetry, lap_times = race
+    rng = np.random.default_rng(seed)
+    telemetry_parts = np.split(np.arange(len(telemetry)), np.sort(rng.choice(len(telemetry), rng.integers(1, 30), replace=False)))
+    lap_parts = np.split(np.arange(len(lap_times)), np.sort(rng.choice(len(lap_times), rng.integers(1, 6), replace=False)))
+
+    # Lap rows and telemetry rows arrive interleaved, as in a live session
+    live = LiveRaceMetrics()
+    for i in range(max(len(telemetry_parts), len(lap_parts))):
+        if i < len(telemetry_parts):
+            live.add_telemetry(telemetry.iloc[telemetry_parts[i]])
+        if i < len(lap_parts):
+            live.add_lap_times(lap_times.iloc[lap_parts[i]])
+
+    expected = compute_metrics_table(telemetry, lap_times).sort_values('driver_id').reset_index(drop=True)
+    actual = live.snapshot().sort_values('driver_id').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
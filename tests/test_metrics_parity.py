@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from compute_metrics import compute_metrics_table
+from synthetic_telemetry import LAP_TIMES_FILE, TELEMETRY_FILE, generate_race
+
+def parse_lap_time(time_str) -> float:
+    if pd.isna(time_str) or time_str == '':
+        return np.nan
+    parts = time_str.split(':')
+    if len(parts) == 2:
+        return float(parts[0]) * 60 + float(parts[1])
+    return float(time_str)
+
+def channel(driver_data: pd.DataFrame, name: str) -> pd.Series:
+    return driver_data[driver_data['telemetry_name'] == name]['telemetry_value'].astype(float)
+
+def reference_metrics(telemetry_df: pd.DataFrame, lap_times_df: pd.DataFrame) -> pd.DataFrame:
+    """The original per-driver formulas (before compute_metrics_table), one driver at a time"""
+    results = []
+    for _, row in telemetry_df[['vehicle_id', 'vehicle_number']].drop_duplicates().iterrows():
+        if pd.isna(row['vehicle_number']):
+            continue
+        driver_id, vehicle_number = row['vehicle_id'], int(row['vehicle_number'])
+        driver_data = telemetry_df[telemetry_df['vehicle_id'] == driver_id]
+        driver_laps = lap_times_df[lap_times_df['NUMBER'] == vehicle_number]
+        lap_times = driver_laps[' LAP_TIME'].apply(parse_lap_time).dropna().sort_index()
+        throttle = channel(driver_data, 'aps')
+
+        # Tire stress (the brake sum is index-aligned across channels)
+        brake_total = (channel(driver_data, 'pbrake_f').fillna(0) + channel(driver_data, 'pbrake_r').fillna(0)).mean()
+        steering = channel(driver_data, 'Steering_Angle').abs().mean()
+        lateral_g = channel(driver_data, 'accy_can').abs().max()
+        tire_stress = sum(0 if pd.isna(value) else value * weight
+                          for value, weight in [(brake_total, 0.4), (steering, 0.3), (lateral_g, 0.3)])
+
+        # Attack window
+        attack_window = 0.0
+        if len(driver_laps) >= 2 and len(lap_times) >= 2 and len(throttle):
+            improving_ratio = (lap_times.diff() < 0).sum() / (len(lap_times) - 1)
+            attack_window = min(improving_ratio * (throttle > 70).sum() / len(throttle), 1.0)
+
+        # Fuel conservation and overtake risk
+        fuel_conservation = (throttle < 30).sum() / len(throttle) if len(throttle) else 0.0
+        steering_max = channel(driver_data, 'Steering_Angle').abs().max()
+        overtake_risk = min((0 if pd.isna(steering_max) else steering_max) / 180.0, 1.0)
+
+        # Ideal pit window
+        pit_window = 0.0
+        last5 = lap_times.tail(5)
+        if len(last5) >= 2:
+            lap_time_slope = (last5.iloc[-1] - last5.iloc[0]) / len(last5)
+            brake_f = channel(driver_data, 'pbrake_f').dropna().tail(100)
+            tire_stress_slope = 0
+            if len(brake_f) >= 10:
+                mid = len(brake_f) // 2
+                tire_stress_slope = (brake_f[mid:].mean() - brake_f[:mid].mean()) / mid
+            normalized_lap_slope = min(lap_time_slope / 10.0, 1.0) if lap_time_slope > 0 else 0
+            normalized_stress_slope = min(tire_stress_slope / 100.0, 1.0) if tire_stress_slope > 0 else 0
+            pit_window = min(normalized_stress_slope * 0.5 + normalized_lap_slope * 0.5, 1.0)
+
+        results.append({
+            'driver_id': driver_id,
+            'vehicle_number': vehicle_number,
+            'tire_stress_index': round(tire_stress, 3),
+            'attack_window': round(attack_window, 3),
+            'fuel_conservation_mode': round(fuel_conservation, 3),
+            'overtake_risk': round(overtake_risk, 3),
+            'ideal_pit_window': round(pit_window, 3),
+        })
+    return pd.DataFrame(results)
+
+def test_metrics_table_matches_per_driver_formulas(tmp_path):
+    generate_race(str(tmp_path), scale=0.3, cars=4, seed=5)
+    telemetry_df = pd.read_csv(tmp_path / TELEMETRY_FILE)
+    lap_times_df = pd.read_csv(tmp_path / LAP_TIMES_FILE, sep=';')
+    lap_times_df = lap_times_df[~((lap_times_df['NUMBER'] == 2) & (lap_times_df[' LAP_NUMBER'] > 1))]  # one timed lap
+    telemetry_df = telemetry_df[~((telemetry_df['vehicle_number'] == 3) & (telemetry_df['telemetry_name'] == 'aps'))]
+
+    expected = reference_metrics(telemetry_df, lap_times_df)
+    actual = compute_metrics_table(telemetry_df, lap_times_df)
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
@@ -0,0 +1,83 @@
+import json
+import numpy as np
+import pandas as pd
+from dateutil import parser as date_parser
+from preprocess_telemetry import preprocess_telemetry
+
+CHANNELS = ['aps', 'pbrake_f', 'pbrake_r', 'Steering_Angle', 'accx_can', 'accy_can', 'gear', 'nmot', 'speed']
+
+def baseline_frames(input_csv: str, chunk_size: int = 100000) -> dict:
+    """The original per-row loop (before the vectorized pivot), returning vehicle_id -> sorted frames"""
+    all_frames = {}
+    for chunk in pd.read_csv(input_csv, chunksize=chunk_size):
+        for _, row in chunk.iterrows():
+            vehicle_id = str(row.get('vehicle_id', '')).strip()
+            if not vehicle_id or pd.isna(vehicle_id):
+                continue
+            timestamp_str = str(row.get('timestamp', ''))
+            if pd.isna(timestamp_str) or timestamp_str == '':
+                continue
+            try:
+                timestamp = int(date_parser.parse(timestamp_str).timestamp() * 1000)
+            except Exception:
+                continue
+
+            lap = int(row.get('lap', 0)) if pd.notna(row.get('lap')) else 0
+            telemetry_name = str(row.get('telemetry_name', '')).strip()
+            telemetry_value = row.get('telemetry_value', 0)
+            frames = all_frames.setdefault(vehicle_id, {})
+            frame = frames.setdefault(str(timestamp), {
+                'timestamp': timestamp, 'vehicle_id': vehicle_id, 'lap': lap, 'throttle': 0, 'brake_f': 0,
+                'brake_r': 0, 'steering': 0, 'accx': 0, 'accy': 0, 'gear': 0, 'rpm': 0,
+            })
+            value = float(telemetry_value) if pd.notna(telemetry_value) else 0
+
+            if telemetry_name == 'aps':
+                frame['throttle'] = min(100, max(0, value))
+            elif telemetry_name == 'pbrake_f':
+                frame['brake_f'] = value
+            elif telemetry_name == 'pbrake_r':
+                frame['brake_r'] = value
+            elif telemetry_name == 'Steering_Angle':
+                frame['steering'] = abs(value)
+            elif telemetry_name == 'accx_can':
+                frame['accx'] = value
+            elif telemetry_name == 'accy_can':
+                frame['accy'] = abs(value)
+            elif telemetry_name == 'gear':
+                frame['gear'] = int(value) if pd.notna(value) else 0
+            elif telemetry_name == 'nmot':
+                frame['rpm'] = int(value) if pd.notna(value) else 0
+    return {vehicle_id: sorted(frames.values(), key=lambda frame: frame['timestamp'])
+            for vehicle_id, frames in all_frames.items()}
+
+def shuffled_fixture(rows: int = 400, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2025-09-06T18:00:00Z')
+    timestamps = start + pd.to_timedelta(rng.integers(0, 40, rows) * 100, unit='ms')
+    fixture = pd.DataFrame({
+        'lap': rng.integers(1, 4, rows).astype('float64'),
+        'telemetry_name': rng.choice(CHANNELS, rows),  # 'speed' has no frame field
+        'telemetry_value': rng.normal(40, 60, rows).round(3),  # aps spills outside 0..100
+        'timestamp': timestamps.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z',
+        'vehicle_id': rng.choice(['GR86-002-2', 'GR86-004-78', 'GR86-010-16'], rows),
+        'vehicle_number': 2,
+    })
+    fixture.loc[rng.choice(rows, 20, replace=False), 'telemetry_value'] = np.nan
+    fixture.loc[rng.choice(rows, 10, replace=False), 'lap'] = np.nan
+    fixture.loc[7, 'timestamp'] = 'not a timestamp'
+    fixture.loc[11, ['telemetry_name', 'telemetry_value']] = ['aps', 150.0]
+    return fixture
+
+def test_vectorized_pivot_matches_row_loop(tmp_path):
+    input_csv = tmp_path / 'R1_test_telemetry_data.csv'
+    shuffled_fixture().to_csv(input_csv, index=False)
+    expected = baseline_frames(str(input_csv))
+
+    preprocess_telemetry(str(input_csv), str(tmp_path / 'out'), chunk_size=37, output_format='json')
+    assert sorted(path.name for path in (tmp_path / 'out').glob('*_telemetry.json')) == \
+        sorted(f"{vehicle_id}_telemetry.json" for vehicle_id in expected)
+    for vehicle_id, frames in expected.items():
+        actual = json.loads((tmp_path / 'out' / f"{vehicle_id}_telemetry.json").read_text())
+        # Values match; untouched channels are now 0.0 where the row loop wrote 0
+        assert actual == frames
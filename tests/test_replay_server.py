@@ -0,0 +1,48 @@
+import asyncio
+import numpy as np
+import pandas as pd
+from replay_server import REPLAY_COLUMNS, ReplayServer, ReplayTimeline
+
+def timeline(rows: int = 50) -> ReplayTimeline:
+    frames = pd.DataFrame({name: np.zeros(rows) for name in REPLAY_COLUMNS})
+    frames['timestamp'] = np.arange(rows) * 100
+    frames['vehicle_id'] = 'GR86-002-2'
+    return ReplayTimeline(frames)
+
+async def open_stream(port: int, speed: float):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET /replay/sse?speed={speed} HTTP/1.1\r\nHost: test\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    while b'"hello"' not in await reader.readline():
+        pass
+    return reader, writer
+
+async def wait_for(condition, timeout_s: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout_s
+    while not condition() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+def test_channels_are_dropped_with_their_last_subscriber():
+    async def scenario():
+        server = ReplayServer(timeline())
+        tcp_server = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        async with tcp_server:
+            clients = [await open_stream(port, speed) for speed in (1, 1, 2, 3)]
+            assert sorted(speed for speed, _ in server.channels) == [1, 2, 3]
+
+            clients.pop(0)[1].close()  # speed 1 still has a subscriber
+            assert not await wait_for(lambda: len(server.channels) < 3, timeout_s=0.3)
+            for _, writer in clients:
+                writer.close()
+            assert await wait_for(lambda: not server.channels)
+
+            # A speed that is refused never leaves a channel behind
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b"GET /replay/ws?speed=1 HTTP/1.1\r\nHost: test\r\nUpgrade: websocket\r\n\r\n")
+            assert b'400' in await reader.readline()
+            writer.close()
+            assert await wait_for(lambda: not server.channels)
+
+    asyncio.run(scenario())
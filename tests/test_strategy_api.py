@@ -0,0 +1,34 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from frame_format import FRAME_COLUMNS, encode_frames
+from strategy_api import StrategyAPI
+
+def write_frames(path, rows: int, laps: int):
+    frames = pd.DataFrame({name: np.zeros(rows) for name, _ in FRAME_COLUMNS})
+    frames['timestamp'] = np.arange(rows) * 100
+    frames['lap'] = np.repeat(np.arange(1, laps + 1), -(-rows // laps))[:rows]
+    path.write_bytes(encode_frames(frames, 'GR86-002-2')[0])
+
+def get(api: StrategyAPI, target: str) -> tuple:
+    status, headers, body = api.respond('GET', target, {})
+    return headers['ETag'], json.loads(body)
+
+def test_rewritten_frame_file_is_served_before_the_next_refresh(tmp_path):
+    frame_file = tmp_path / 'GR86-002-2_telemetry.bin'
+    write_frames(frame_file, 10, 1)
+    api = StrategyAPI(str(tmp_path), str(tmp_path / 'race_metrics.csv'), str(tmp_path / 'lap_times.json'))
+    before = {target: get(api, target) for target in
+              ['/api/telemetry/GR86-002-2', '/api/telemetry/GR86-002-2/laps', '/api/telemetry/GR86-002-2/chart?width=4']}
+    assert before['/api/telemetry/GR86-002-2'][1]['total'] == 10
+
+    write_frames(frame_file, 20, 2)
+    os.utime(frame_file, ns=(frame_file.stat().st_atime_ns, frame_file.stat().st_mtime_ns + 10**9))
+    for _ in range(2):  # the second pass comes from the body cache
+        etag, telemetry = get(api, '/api/telemetry/GR86-002-2')
+        assert etag != before['/api/telemetry/GR86-002-2'][0] and telemetry['total'] == 20
+        etag, laps = get(api, '/api/telemetry/GR86-002-2/laps')
+        assert etag != before['/api/telemetry/GR86-002-2/laps'][0] and [lap['lap'] for lap in laps] == [1, 2]
+        etag, chart = get(api, '/api/telemetry/GR86-002-2/chart?width=4')
+        assert etag != before['/api/telemetry/GR86-002-2/chart?width=4'][0] and chart['timestamp'][-1] >= 1000
@@ -0,0 +1,30 @@
+import pandas as pd
+from strategy_broker import StrategyBroker, driver_state
+
+METRICS_ROW = {'vehicle_number': 2, 'tire_stress_index': 4.0, 'overtake_risk': 0.2, 'attack_window': 0.5,
+               'fuel_conservation_mode': 0.1}
+
+class RecordingBroker(StrategyBroker):
+    """Answers every driver locally and keeps the prompts it would have sent"""
+
+    def __init__(self):
+        super().__init__(api_key='test')
+        self.prompts = []
+
+    def request(self, states: dict) -> dict:
+        self.prompts.append(self.prompt(states))
+        return {driver_id: {'drivingStyle': 'Balanced'} for driver_id in states}
+
+def test_lateral_g_is_the_largest_magnitude():
+    frames = pd.DataFrame({'throttle': [50.0, 60.0], 'brake_f': [10.0, 20.0], 'accy': [0.8, -1.6]})
+    assert driver_state(METRICS_ROW, lap_frames=frames)['latg'] == 1.6
+
+def test_deltas_are_relative_to_the_previous_update_even_when_cached():
+    broker = RecordingBroker()
+    first, second = driver_state(METRICS_ROW), driver_state({**METRICS_ROW, 'tire_stress_index': 6.0})
+    broker.strategies({'GR86-002-2': first})
+    broker.strategies({'GR86-002-2': second})
+    broker.strategies({'GR86-002-2': first})   # cache hit
+    broker.strategies({'GR86-002-2': {**second, 'risk': 30}})
+    assert broker.stats['cache_hits'] == 1
+    assert broker.prompts[-1] == '#GR86-002-2 lap=0 tsi=60(+20) risk=30(+10) attack=1 fuel=0'
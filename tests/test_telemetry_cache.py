@@ -0,0 +1,21 @@
+import pandas as pd
+from telemetry_cache import ensure_cache, load_telemetry, read_meta
+
+def test_cached_loads_keep_unparseable_timestamp_counts(tmp_path, capsys):
+    csv_path = tmp_path / 'R1_test_telemetry_data.csv'
+    pd.DataFrame({
+        'lap': [1, 1, 1],
+        'telemetry_name': ['aps', 'aps', 'aps'],
+        'telemetry_value': [10.0, 20.0, 30.0],
+        'timestamp': ['2025-09-06T18:00:00.000Z', 'garbage', None],
+        'vehicle_id': ['GR86-002-2'] * 3,
+        'vehicle_number': [2] * 3,
+    }).to_csv(csv_path, index=False)
+
+    cache_dir = ensure_cache(str(csv_path))
+    counts = read_meta(cache_dir)['timestamps']
+    assert (counts['missing'], counts['unparseable'], counts['examples']) == (1, 1, ['garbage'])
+
+    capsys.readouterr()
+    assert load_telemetry(str(csv_path))['timestamp'].isna().sum() == 2
+    assert "1 missing, 1 unparseable" in capsys.readouterr().out
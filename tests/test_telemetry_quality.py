@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+from telemetry_cache import convert_chunk, read_telemetry_csv
+from telemetry_quality import QualityChecker
+from telemetry_timestamps import TimestampDecoder
+
+def corrupted_csv(path) -> str:
+    start = pd.Timestamp('2025-09-06T18:00:00Z')
+    rows = [{'lap': 1 + i // 5, 'telemetry_name': name, 'telemetry_value': float(i * 10),
+             'timestamp': (start + pd.Timedelta(milliseconds=100 * i)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+             'vehicle_id': vehicle_id, 'vehicle_number': 2}
+            for vehicle_id in ['GR86-002-2', 'GR86-004-78'] for name in ['speed', 'aps'] for i in range(10)]
+    rows = pd.DataFrame(rows).astype({'telemetry_value': object, 'lap': object})
+    rows.loc[3, 'telemetry_value'] = 999               # speed out of range
+    rows.loc[5, 'timestamp'] = rows.loc[4, 'timestamp']  # duplicate timestamp with a different value
+    rows.loc[7, 'lap'] = 32768                         # lap out of range
+    rows.loc[25, 'timestamp'] = rows.loc[22, 'timestamp']  # backwards
+    rows.loc[33, 'lap'] = 5                            # lap jump, then back
+    rows.loc[35, 'telemetry_value'] = 'abc'
+    rows.loc[36, 'telemetry_name'] = None
+    rows.to_csv(path, index=False)
+    return str(path)
+
+@pytest.mark.parametrize('chunk_size', [7, 1000])
+def test_each_check_fires_once_at_any_chunk_size(tmp_path, chunk_size):
+    csv_path = corrupted_csv(tmp_path / 'telemetry.csv')
+    checker, decoder = QualityChecker(), TimestampDecoder()
+    for chunk in read_telemetry_csv(csv_path, chunksize=chunk_size):
+        checker.check(chunk, convert_chunk(chunk, decoder))
+
+    assert checker.counts == {'backwards_timestamps': 1, 'duplicate_samples': 1, 'conflicting_duplicates': 1,
+                              'lap_backwards': 1, 'lap_jumps': 1, 'lap_out_of_range': 1}
+    assert checker.non_numeric['telemetry_value'] == 1
+    assert checker.missing['telemetry_name'] == 1
+    assert checker.channels['speed']['out_of_range'] == 1
+    assert checker.channels['speed']['max'] == 999
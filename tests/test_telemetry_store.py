@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+from telemetry_quality import MAX_LAP, sorted_lap_key
+from telemetry_store import VehicleFrames
+
+def frames_with_laps(laps: list) -> pd.DataFrame:
+    return pd.DataFrame({'timestamp': np.arange(len(laps), dtype='int64') * 100, 'lap': laps})
+
+def test_lap_sentinel_does_not_swallow_later_laps():
+    vehicle = VehicleFrames(frames_with_laps([1] * 5 + [2] * 5 + [32768] + [2] * 4 + [3] * 5))
+    assert vehicle.lap_bounds(3, 3) == (15, 20)
+    assert vehicle.lap_bounds(2, 2) == (5, 15)
+    offsets = vehicle.lap_offsets()
+    assert offsets['lap'].tolist() == [1, 2, 3]
+    assert offsets['start'].tolist() == [0, 5, 15]
+    assert offsets['stop'].tolist() == [5, 15, 20]
+
+def test_sorted_lap_key_spikes_and_gaps():
+    # A one-lap spike below MAX_LAP falls back to the previous lap
+    assert sorted_lap_key([1, 1, 2, 90, 2, 3]).tolist() == [1, 1, 2, 2, 2, 3]
+    # A jump the following laps confirm (a lap with no samples) is kept
+    assert sorted_lap_key([1, 1, 3, 3, 4]).tolist() == [1, 1, 3, 3, 4]
+    # Backwards steps, NaN and out-of-range leading laps
+    assert sorted_lap_key([MAX_LAP + 1, np.nan, 1, 2, 1, 2, 3]).tolist() == [1, 1, 1, 2, 2, 2, 3]
+    assert sorted_lap_key([]).tolist() == []
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from lap_table import LapTable
+from track_segments import segment_vehicle
+
+def speed_rows(laps: list, kmh: float = 120.0) -> pd.DataFrame:
+    """One constant speed sample per lap entry, 100 ms apart"""
+    timestamps = pd.Timestamp('2025-09-06T18:00:00Z') + pd.to_timedelta(np.arange(len(laps)) * 100, unit='ms')
+    return pd.DataFrame({
+        'vehicle_id': 'GR86-002-2',
+        'vehicle_number': 2,
+        'lap': laps,
+        'timestamp': timestamps.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z',
+        'telemetry_name': 'speed',
+        'telemetry_value': kmh,
+    })
+
+def test_lap_sentinel_keeps_later_sectors_on_their_laps():
+    segments = segment_vehicle(speed_rows([1] * 30 + [2] * 30 + [32768] + [2] * 9 + [3] * 30))
+    assert sorted({lap for lap, _ in segments.bounds}) == [1, 2, 3]
+    assert sum(stop - start for (lap, _), (start, stop) in segments.bounds.items() if lap == 2) == 40
+    assert sum(stop - start for (lap, _), (start, stop) in segments.bounds.items() if lap == 3) == 30
+
+def test_sectors_from_lap_file_times():
+    # 10 s laps at 10 m/s; laps 1 and 2 are timed (S1/S2/S3 = 2/3/5 s and 3/3/4 s), lap 3 is not
+    lap_table = LapTable(pd.DataFrame({
+        'NUMBER': [2, 2],
+        ' LAP_NUMBER': [1, 2],
+        ' LAP_TIME': ['0:10.000', '0:10.000'],
+        ' S1': ['2.000', '3.000'],
+        ' S2': ['3.000', '3.000'],
+        ' S3': ['5.000', '4.000'],
+    }))
+    segments = segment_vehicle(speed_rows([1] * 100 + [2] * 100 + [3] * 100, kmh=36.0), lap_table)
+
+    sizes = {key: stop - start for key, (start, stop) in segments.bounds.items()}
+    assert sizes == {(1, 1): 20, (1, 2): 30, (1, 3): 50,
+                     (2, 1): 30, (2, 2): 30, (2, 3): 40,
+                     # Untimed lap: median boundary fractions (0.25, 0.55) of the lap's distance (99 m)
+                     (3, 1): 25, (3, 2): 30, (3, 3): 45}
+    distances = segments.sector_table().set_index(['lap', 'sector'])['distance_m']
+    # First to last sample of each sector, 1 m per 100 ms sample
+    assert np.allclose(distances.loc[1].tolist(), [19, 29, 49])
+    assert np.allclose(distances.loc[3].tolist(), [24, 29, 44])
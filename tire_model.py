@@ -0,0 +1,193 @@
+"""
+PitGPT - Tire degradation and pit-window prediction
+Fits every car's lap time vs. stint age curve (fuel-corrected, slow laps rejected) as one batched
+least-squares solve, and predicts the pit lap that minimises remaining race time with a confidence band.
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from lap_table import LapTable, find_column
+
+PIT_LOSS_S = 30.0       # time lost driving through the pit lane and stopping
+FUEL_EFFECT_S = 0.03    # lap time gained per lap of fuel burned (added back before fitting)
+PIT_FACTOR = 1.25       # laps this much slower than the car's median are pit/incident laps and end the stint
+OUTLIER_MADS = 3.0      # traffic outliers: slower than median + this many scaled MADs
+MIN_LAPS = 4            # clean laps needed before a car gets a prediction
+DRAWS = 200             # parameter draws for the confidence band
+TERMS = 3               # lap_time = a + b * age + c * age^2
+
+class DegradationModel:
+    """
+    Per-car quadratic degradation curves kept as least-squares sufficient statistics
+    (X'X, X'y, y'y per car): a new lap only re-screens its own car, and a refit is one stacked 3x3 solve for the field.
+    """
+
+    def __init__(self, race_laps: int, pit_loss: float = PIT_LOSS_S, fuel_effect: float = FUEL_EFFECT_S,
+                 seed: int = 0):
+        self.race_laps = race_laps
+        self.pit_loss = pit_loss
+        self.fuel_effect = fuel_effect
+        self.rng = np.random.default_rng(seed)
+        self._reset()
+
+    def _reset(self):
+        self.cars = {}        # vehicle_number -> row in the stats arrays
+        self.history = []     # per car: [lap numbers, lap times] seen so far
+        self.xtx = np.zeros((0, TERMS, TERMS))
+        self.xty = np.zeros((0, TERMS))
+        self.yty = np.zeros(0)
+        self.clean = np.zeros(0, dtype='int64')
+        self.last_lap = np.zeros(0, dtype='int64')
+        self.stint_age = np.zeros(0, dtype='int64')  # age of the tires on the car's next lap
+
+    def _car(self, vehicle_number) -> int:
+        if vehicle_number not in self.cars:
+            self.cars[vehicle_number] = len(self.cars)
+            self.history.append([[], []])
+            self.xtx = np.concatenate([self.xtx, np.zeros((1, TERMS, TERMS))])
+            self.xty = np.concatenate([self.xty, np.zeros((1, TERMS))])
+            self.yty = np.append(self.yty, 0.0)
+            self.clean = np.append(self.clean, 0)
+            self.last_lap = np.append(self.last_lap, 0)
+            self.stint_age = np.append(self.stint_age, 0)
+        return self.cars[vehicle_number]
+
+    def fit(self, lap_table: LapTable) -> 'DegradationModel':
+        """Fit every car from a lap table in one vectorized pass (replaces any laps added so far)"""
+        self._reset()
+        for number in lap_table.numbers:
+            self._car(number)
+        rows = np.array([self.cars[number] for number in lap_table.numbers], dtype='int64')[lap_table.car_codes]
+        position = np.arange(len(rows)) - lap_table.offsets[lap_table.car_codes] + 1
+        laps = np.where(np.isnan(lap_table.lap_numbers), position, lap_table.lap_numbers).astype('int64')
+        self._fit_rows(rows, laps, lap_table.times)
+        for car in range(len(self.cars)):
+            car_rows = rows == car
+            self.history[car] = [laps[car_rows].tolist(), lap_table.times[car_rows].tolist()]
+        return self
+
+    def add_lap(self, vehicle_number, lap_number: int, lap_time: float):
+        """
+        Fold one completed lap in (the live path): only this car's few dozen laps are re-screened,
+        with the same rules as fit(), so the curve matches a full refit
+        """
+        car = self._car(vehicle_number)
+        laps, times = self.history[car]
+        laps.append(lap_number)
+        times.append(lap_time)
+        self.xtx[car], self.xty[car], self.yty[car], self.clean[car] = 0, 0, 0, 0
+        self._fit_rows(np.full(len(laps), car), np.asarray(laps, dtype='int64'), np.asarray(times, dtype='float64'))
+
+    def _fit_rows(self, rows: np.ndarray, laps: np.ndarray, times: np.ndarray):
+        """Screen laps (rows grouped by car, in race order) and fold the clean ones into the stats"""
+        # Per-car median and scaled MAD set the pit-lap and traffic thresholds
+        frame = pd.DataFrame({'car': rows, 'time': times})
+        median = frame.groupby('car')['time'].transform('median').to_numpy()
+        mad = (frame['time'] - median).abs().groupby(frame['car']).transform('median').to_numpy() * 1.4826
+        pit = times > median * PIT_FACTOR
+        clean = ~pit & (times <= median + OUTLIER_MADS * np.maximum(mad, 0.05))
+
+        # Stint age: laps since the car's first lap or its last pit lap
+        stint = pd.Series(pit).groupby(rows).cumsum().to_numpy() - pit
+        age = pd.Series(np.ones(len(times), dtype='int64')).groupby([rows, stint]).cumsum().to_numpy() - 1
+
+        corrected = times + self.fuel_effect * (laps - 1)
+        x = np.stack([np.ones(len(age)), age, age.astype('float64') ** 2], axis=1)[clean]
+        np.add.at(self.xtx, rows[clean], x[:, :, None] * x[:, None, :])
+        np.add.at(self.xty, rows[clean], x * corrected[clean][:, None])
+        np.add.at(self.yty, rows[clean], corrected[clean] ** 2)
+        np.add.at(self.clean, rows[clean], 1)
+
+        # Each car's last lap sets where the prediction starts from
+        last = np.append(rows[1:] != rows[:-1], True) if len(rows) else np.zeros(0, dtype=bool)
+        self.last_lap[rows[last]] = laps[last]
+        self.stint_age[rows[last]] = np.where(pit[last], 0, age[last] + 1)
+
+    def coefficients(self) -> tuple:
+        """(beta, covariance) per car from one batched solve; NaN for cars with too few clean laps"""
+        ridge = np.eye(TERMS) * 1e-9
+        beta = np.full((len(self.cars), TERMS), np.nan)
+        covariance = np.full((len(self.cars), TERMS, TERMS), np.nan)
+        ready = self.clean >= MIN_LAPS
+        if ready.any():
+            inverse = np.linalg.inv(self.xtx[ready] + ridge)
+            beta[ready] = np.einsum('nij,nj->ni', inverse, self.xty[ready])
+            residual = self.yty[ready] - np.einsum('ni,ni->n', beta[ready], self.xty[ready])
+            sigma2 = np.maximum(residual, 0) / np.maximum(self.clean[ready] - TERMS, 1)
+            covariance[ready] = inverse * sigma2[:, None, None]
+        return beta, covariance
+
+    def best_pit_lap(self, b: np.ndarray, c: np.ndarray, cars: np.ndarray) -> np.ndarray:
+        """
+        Pit lap minimising the remaining race time for degradation rates b, c (shape cars x draws) of the selected cars.
+        NaN where no stop beats running to the flag on the current tires.
+        """
+        remaining = np.maximum(self.race_laps - self.last_lap[cars], 0)[:, None, None]
+        age_now = self.stint_age[cars][:, None, None]
+        k = np.arange(self.race_laps + 1)[None, None, :]  # laps run on the current tires; the stop is at the end of the k-th
+        b, c = b[..., None], c[..., None]
+
+        def wear(n):  # total degradation over tire ages 0..n-1
+            return b * n * (n - 1) / 2 + c * (n - 1) * n * (2 * n - 1) / 6
+
+        stop = wear(age_now + k) - wear(age_now) + self.pit_loss + wear(remaining - k)
+        stop = np.where((k >= 1) & (k < remaining), stop, np.inf)
+        no_stop = (wear(age_now + remaining) - wear(age_now))[..., 0]
+        best = stop.argmin(axis=-1)
+        pit_lap = (self.last_lap[cars][:, None] + best).astype('float64')
+        return np.where(stop.min(axis=-1) < no_stop, pit_lap, np.nan)
+
+    def predict(self, band: tuple = (10, 90)) -> pd.DataFrame:
+        """Per car: degradation rate, predicted pit lap and its band from parameter draws"""
+        beta, covariance = self.coefficients()
+        ready = ~np.isnan(beta[:, 0])
+        pit_lap = np.full(len(self.cars), np.nan)
+        low, high, probability = pit_lap.copy(), pit_lap.copy(), pit_lap.copy()
+        if ready.any():
+            pit_lap[ready] = self.best_pit_lap(beta[ready, 1:2], beta[ready, 2:3], ready)[:, 0]
+            noise = self.rng.standard_normal((ready.sum(), DRAWS, TERMS))
+            symmetric = (covariance[ready] + covariance[ready].transpose(0, 2, 1)) / 2
+            chol = np.linalg.cholesky(symmetric + np.eye(TERMS) * 1e-10)
+            draws = beta[ready][:, None, :] + np.einsum('nij,ndj->ndi', chol, noise)
+            draw_laps = self.best_pit_lap(draws[..., 1], draws[..., 2], ready)
+            probability[ready] = (~np.isnan(draw_laps)).mean(axis=1)
+            # No-stop draws rank after every pit lap, so a likely no-stop pushes the band's top to NaN
+            stops = np.where(np.isnan(draw_laps), self.race_laps + 1, draw_laps)
+            low[ready], high[ready] = np.percentile(stops, band, axis=1)
+            low[low > self.race_laps] = np.nan
+            high[high > self.race_laps] = np.nan
+
+        age = self.stint_age.astype('float64')
+        return pd.DataFrame({
+            'vehicle_number': list(self.cars),
+            'clean_laps': self.clean,
+            'last_lap': self.last_lap,
+            'stint_age': self.stint_age,
+            'base_lap_s': beta[:, 0].round(3),
+            'deg_per_lap_s': (beta[:, 1] + beta[:, 2] * (2 * age + 1)).round(4),
+            'pit_lap': pit_lap,
+            'pit_lap_low': low,
+            'pit_lap_high': high,
+            'stop_probability': probability.round(3),
+        })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit tire degradation for every car and predict pit windows")
+    parser.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    parser.add_argument("--race-laps", type=int, help="Scheduled race length (default: most laps in the file)")
+    parser.add_argument("--at-lap", type=int, help="Predict as of this lap (replays the laps up to it)")
+    parser.add_argument("--pit-loss", type=float, default=PIT_LOSS_S)
+    parser.add_argument("--output", default="pit_windows.csv")
+    args = parser.parse_args()
+
+    lap_times_df = pd.read_csv(args.lap_times_csv, sep=';')
+    lap_numbers = pd.to_numeric(lap_times_df[find_column(lap_times_df, 'LAP_NUMBER')], errors='coerce')
+    race_laps = args.race_laps or int(lap_numbers.max())
+    if args.at_lap:
+        lap_times_df = lap_times_df[lap_numbers <= args.at_lap]
+    lap_table = LapTable(lap_times_df)
+    predictions = DegradationModel(race_laps, args.pit_loss).fit(lap_table).predict()
+    predictions.to_csv(args.output, index=False)
+    print(predictions.to_string(index=False))
+    print(f"\n✅ Pit windows for {len(predictions)} cars ({race_laps}-lap race) saved to {args.output}")
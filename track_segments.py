@@ -0,0 +1,185 @@
+"""
+PitGPT - Distance and sector segmentation
+Every telemetry sample gets a lap-distance coordinate (integrated speed) and a sector ID (from the lap file's
+sector times), and a (vehicle, lap, sector) index maps straight to that segment's sample range.
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from compute_metrics import vehicle_number_from_id
+from lap_table import LapTable
+from pipeline_trace import enable as enable_trace, stage
+from telemetry_cache import ensure_cache, open_vehicle_rows, vehicle_row_index
+from telemetry_quality import sorted_lap_key
+from telemetry_timestamps import TimestampDecoder
+
+SPEED_CHANNEL = 'speed'  # km/h
+DEFAULT_SECTORS = 3
+SECTOR_STRIDE = 1000     # index key = lap * SECTOR_STRIDE + sector
+
+def sector_stats(rows: pd.DataFrame) -> dict:
+    """Per-corner metrics for one segment's samples"""
+    names = rows['telemetry_name'].to_numpy()
+    values = rows['telemetry_value'].to_numpy(dtype='float64')
+
+    def channel(name):
+        selected = values[names == name]
+        return selected[~np.isnan(selected)]
+
+    brake_f, brake_r = channel('pbrake_f'), channel('pbrake_r')
+    lateral_g, throttle, speed = np.abs(channel('accy_can')), channel('aps'), channel(SPEED_CHANNEL)
+    timestamps, distance = rows['timestamp'].to_numpy(), rows['distance_m'].to_numpy()
+    return {
+        'samples': len(rows),
+        'duration_s': (timestamps[-1] - timestamps[0]) / 1000 if len(rows) else 0.0,
+        'distance_m': np.nanmax(distance) - np.nanmin(distance) if len(rows) and not np.isnan(distance).all() else np.nan,
+        'braking_stress': (brake_f.mean() if len(brake_f) else 0.0) + (brake_r.mean() if len(brake_r) else 0.0),
+        'max_lateral_g': lateral_g.max() if len(lateral_g) else np.nan,
+        'throttle_mean': throttle.mean() if len(throttle) else np.nan,
+        'min_speed': speed.min() if len(speed) else np.nan,
+    }
+
+class VehicleSegments:
+    """
+    One vehicle's samples in time order with lap, distance_m and sector columns.
+    Laps are contiguous in time and sectors within a lap, so every (lap, sector) is one row range.
+    """
+
+    def __init__(self, vehicle_id: str, samples: pd.DataFrame):
+        self.vehicle_id = vehicle_id
+        self.samples = samples.reset_index(drop=True)
+        key = np.maximum.accumulate(self.samples['lap'].to_numpy() * SECTOR_STRIDE + self.samples['sector'].to_numpy())
+        keys, starts = np.unique(key, return_index=True)
+        stops = np.append(starts[1:], len(key))
+        self.bounds = {(int(k // SECTOR_STRIDE), int(k % SECTOR_STRIDE)): (int(start), int(stop))
+                       for k, start, stop in zip(keys, starts, stops)}
+
+    def rows(self, lap: int, sector: int) -> pd.DataFrame:
+        """Samples of one lap sector (a slice, no scan)"""
+        start, stop = self.bounds.get((lap, sector), (0, 0))
+        return self.samples.iloc[start:stop]
+
+    def sector_metrics(self, lap: int, sector: int) -> dict:
+        return sector_stats(self.rows(lap, sector))
+
+    def sector_table(self) -> pd.DataFrame:
+        """sector_metrics for every (lap, sector) of this vehicle"""
+        return pd.DataFrame([{'vehicle_id': self.vehicle_id, 'lap': lap, 'sector': sector,
+                              **self.sector_metrics(lap, sector)} for lap, sector in self.bounds])
+
+def lap_distance(timestamps: np.ndarray, names: np.ndarray, values: np.ndarray, lap_first_row: np.ndarray) -> np.ndarray:
+    """
+    Metres since the lap's first sample (lap_first_row[i] is sample i's), integrating speed (trapezoid)
+    at every sample time; NaN without a speed channel
+    """
+    is_speed = (names == SPEED_CHANNEL) & ~np.isnan(values)
+    if not is_speed.any():
+        return np.full(len(timestamps), np.nan)
+    speed = np.interp(timestamps, timestamps[is_speed], values[is_speed]) / 3.6
+    steps = (speed[1:] + speed[:-1]) / 2 * np.diff(timestamps) / 1000
+    travelled = np.concatenate([[0.0], np.cumsum(steps)])
+    return travelled - travelled[lap_first_row]
+
+def sector_boundaries(car_laps: pd.DataFrame, sector_names: list) -> tuple:
+    """
+    ({lap: sector boundary offsets in ms}, median boundary fractions) from a car's sector times.
+    The fractions place sectors on laps without timing; equal splits if no lap has any.
+    """
+    if not sector_names:
+        return {}, np.arange(1, DEFAULT_SECTORS) / DEFAULT_SECTORS
+    times = car_laps[sector_names].to_numpy(dtype='float64')
+    complete = ~np.isnan(times).any(axis=1) & car_laps['lap_number'].notna().to_numpy()
+    cumulative = np.cumsum(times[complete], axis=1)
+    boundaries = {int(lap): row[:-1] * 1000 for lap, row in zip(car_laps['lap_number'][complete], cumulative)}
+    if len(cumulative):
+        fractions = np.median(cumulative[:, :-1] / cumulative[:, -1:], axis=0)
+    else:
+        fractions = np.arange(1, len(sector_names)) / len(sector_names)
+    return boundaries, fractions
+
+def segment_vehicle(rows: pd.DataFrame, lap_table: LapTable = None, vehicle_number: int = None,
+                    decoder: TimestampDecoder = None) -> VehicleSegments:
+    """Distance and sector for one vehicle's long-format rows"""
+    decoder = decoder or TimestampDecoder()
+    vehicle_id = str(rows['vehicle_id'].iloc[0]).strip() if len(rows) else ''
+    timestamps, valid = decoder.decode(rows['timestamp'])
+    samples = pd.DataFrame({
+        'timestamp': timestamps,
+        'lap': pd.to_numeric(rows['lap'], errors='coerce').to_numpy(dtype='float64'),
+        'telemetry_name': rows['telemetry_name'].astype(str).str.strip().to_numpy(),
+        'telemetry_value': pd.to_numeric(rows['telemetry_value'], errors='coerce').to_numpy(dtype='float64'),
+    })[valid].sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    # Laps stay contiguous if the lap counter briefly goes backwards or glitches
+    samples['lap'] = sorted_lap_key(samples['lap'].to_numpy())
+    timestamps = samples['timestamp'].to_numpy()
+    laps, lap_starts = np.unique(samples['lap'].to_numpy(), return_index=True)
+    lap_ends = np.append(lap_starts[1:], len(samples))
+    samples['distance_m'] = lap_distance(timestamps, samples['telemetry_name'].to_numpy(), samples['telemetry_value'].to_numpy(),
+                                         np.repeat(lap_starts, lap_ends - lap_starts)) if len(samples) else []
+
+    if vehicle_number is None and len(rows):
+        numbers = pd.to_numeric(rows['vehicle_number'], errors='coerce').dropna() if 'vehicle_number' in rows else []
+        vehicle_number = int(numbers.iloc[0]) if len(numbers) else vehicle_number_from_id(vehicle_id)
+    car_laps = lap_table.car(vehicle_number) if lap_table is not None else pd.DataFrame({'lap_number': []})
+    boundaries, fractions = sector_boundaries(car_laps, lap_table.sector_names if lap_table is not None else [])
+
+    sectors = np.zeros(len(samples), dtype='int64')
+    distance = samples['distance_m'].to_numpy()
+    for lap, start, stop in zip(laps, lap_starts, lap_ends):
+        elapsed = timestamps[start:stop] - timestamps[start]
+        if lap in boundaries:
+            sectors[start:stop] = np.searchsorted(boundaries[lap], elapsed, side='right')
+        else:
+            lap_distance_m = distance[start:stop]
+            if not np.isnan(lap_distance_m).all() and np.nanmax(lap_distance_m) > 0:
+                progress = lap_distance_m / np.nanmax(lap_distance_m)
+            else:
+                progress = elapsed / max(elapsed[-1], 1)
+            sectors[start:stop] = np.searchsorted(fractions, progress, side='right')
+    samples['sector'] = np.minimum(sectors, len(fractions)) + 1
+    return VehicleSegments(vehicle_id, samples)
+
+class TrackIndex:
+    """(vehicle, lap, sector) -> sample range for a whole race"""
+
+    def __init__(self, telemetry_csv: str, lap_times_csv: str = None, vehicles: list = None):
+        self.lap_table = LapTable.from_csv(lap_times_csv) if lap_times_csv else None
+        cache_dir = ensure_cache(telemetry_csv)
+        _, spans = vehicle_row_index(cache_dir)
+        decoder = TimestampDecoder()
+        self.vehicles = {}
+        for vehicle_id, start, stop in spans:
+            if vehicles and vehicle_id not in vehicles:
+                continue
+            with stage('segment', vehicle_id=vehicle_id, rows=stop - start):
+                self.vehicles[vehicle_id] = segment_vehicle(open_vehicle_rows(cache_dir, start, stop),
+                                                            self.lap_table, decoder=decoder)
+        decoder.report()
+
+    def rows(self, vehicle_id: str, lap: int, sector: int) -> pd.DataFrame:
+        return self.vehicles[vehicle_id].rows(lap, sector)
+
+    def sector_metrics(self, vehicle_id: str, lap: int, sector: int) -> dict:
+        return self.vehicles[vehicle_id].sector_metrics(lap, sector)
+
+    def sector_table(self) -> pd.DataFrame:
+        """Per-corner metrics for every vehicle, lap and sector"""
+        tables = [segments.sector_table() for segments in self.vehicles.values()]
+        return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-sector metrics from distance and sector segmentation")
+    parser.add_argument("--telemetry-csv", default="barber/R1_barber_telemetry_data.csv")
+    parser.add_argument("--lap-times-csv", default="barber/23_AnalysisEnduranceWithSections_Race 1_Anonymized.CSV")
+    parser.add_argument("--output", default="sector_metrics.csv")
+    parser.add_argument("--drivers", nargs="*", help="vehicle_ids to index (default all)")
+    parser.add_argument("--trace", help="Write a stage timing trace (Chrome trace JSON) to this file")
+    args = parser.parse_args()
+    enable_trace(args.trace)
+
+    index = TrackIndex(args.telemetry_csv, args.lap_times_csv, args.drivers)
+    table = index.sector_table()
+    table.round(3).to_csv(args.output, index=False)
+    print(f"\n✅ {len(table)} sector segments for {len(index.vehicles)} drivers saved to {args.output}")